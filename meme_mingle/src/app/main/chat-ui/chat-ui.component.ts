@@ -285,7 +285,7 @@ initializeConversation(): void {
         else if (response.message && typeof response.message.message === 'string')
           aiMessage = response.message.message;
         
-        const audioUrl = response.audio_url || response.audioUrl ||
+        const audioUrl = response.avatar_audio_url || response.audio_url || response.audioUrl ||
                         (response.message && (response.message.audio_url || response.message.audioUrl));
         
         const avatarAudio = response.avatar_audio || response.avatarAudio ||
@@ -342,7 +342,7 @@ processUserInput(transcript: string, file?: File): void {
         console.log('Process User Input Response:', response);
 
         const aiMessage = response.message;
-        const audioUrl = response.audio_url;
+        const audioUrl = response.avatar_audio_url || response.audio_url;
         // Fix: Use a known working animation 
         const animation = response.animation || "Talking_1";
         // Fix: Use a string for facial expression, not an object
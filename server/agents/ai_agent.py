@@ -173,8 +173,8 @@ class AIAgent:
         }
 
         community_tools = []
-        for tool_name, tool_val in target_tools.get("community").items():
-            community_tools.append(tool_val)
+        for tool_name, tool_factory in target_tools.get("community").items():
+            community_tools.append(tool_factory())
 
         custom_tools = []
         for tool_name, tool_dict in target_tools.get("custom", {}).items():
@@ -27,12 +27,14 @@ from langchain_core.messages.system import SystemMessage
 from .ai_agent import AIAgent
 from services.azure_mongodb import MongoDBClient
 from services.azure_form_recognizer import extract_text_from_file
-from services.text_to_speech_service import text_to_speech
+from services.document_index import format_document_context, get_session_document_index
+from services.extraction_cache import content_sha256
+from services.tts_cache import get_tts_cache
+from services.progressive_tts import start_progressive_tts
 from models.user import User
 from services.db.user import get_user_profile_by_user_id
 # Constants
-from utils.consts import SYSTEM_MESSAGE
-from pydub import AudioSegment
+from utils.consts import SYSTEM_MESSAGE, TTS_DEFAULT_AUDIO_FORMAT
 import base64
 import subprocess
 
@@ -245,17 +247,19 @@ class MemeMingleAIAgent(AIAgent):
         return most_recent_chat_summary.get("chat_id")
 
 
-    def run(self, message: str, file_content: bytes = None, file_mime_type: str = None, with_history:bool =True, user_id: str=None, chat_id:int=None, turn_id:int=None) -> str:
+    def run(self, message: str, file_content: bytes = None, file_mime_type: str = None, with_history:bool =True, user_id: str=None, chat_id:int=None, turn_id:int=None, progressive_audio: bool = False) -> str:
         """
         Runs the agent with the given message and context.
 
         Args:
             message (str): The message to be processed by the agent.
-            file_content (bytes): The content of the uploaded file.
+            file_content (bytes | file-like): The uploaded file, e.g. the spooled upload of the request.
             with_history (bool): A flag indicating whether to use history in the conversation.
             user_id (str): A unique identifier for the user.
             chat_id (int): A unique identifier for the conversation.
             turn_id (int): A unique identifier for the evaluated turn in the conversation.
+            progressive_audio (bool): Synthesize the answer sentence by sentence and return a playlist
+                instead of waiting for the whole audio file.
         """
 
 
@@ -274,26 +278,32 @@ class MemeMingleAIAgent(AIAgent):
         past_summaries = list(past_summaries_cursor)
         summaries_text = "\n".join([summary.get("summary_text", "") for summary in past_summaries])
 
-       # Process the uploaded file if provided
-        extracted_text = ""
+       # Process the uploaded file if provided: it joins the documents of this chat session
+        document_index = get_session_document_index()
         if file_content and file_mime_type:
             extracted_text = extract_text_from_file(file_content, file_mime_type)
             logging.info(f"Extracted text from file: {extracted_text[:500]}")
+            if extracted_text:
+                document_index.add_document(session_id, content_sha256(file_content), extracted_text)
+
+        # Only the parts of the session's documents relevant to this message go in the prompt
+        document_context = format_document_context(document_index.search(session_id, message))
 
         # Prepare the input for the agent
         agent_input = {
             "input": message,
             "user_id": user_id,
             "past_summaries": summaries_text,
+            "document_context": document_context,
             "agent_scratchpad": [],
         }
 
         # Dynamically build the prompt messages
         prompt_messages = self.base_prompt_messages.copy()
 
-        if extracted_text:
-            # Include the extracted text in the prompt with clear instruction
-            prompt_messages.insert(2, ("system", f"The user has provided a document with the following content:\n\n{extracted_text}\n\nPlease use this content to assist the user."))
+        if document_context:
+            # Passed as a variable, so braces in the document are not read as template fields
+            prompt_messages.insert(2, ("system", "{document_context}"))
 
         # Create a ChatPromptTemplate with the prompt messages
         prompt = ChatPromptTemplate.from_messages(prompt_messages)
@@ -328,15 +338,18 @@ class MemeMingleAIAgent(AIAgent):
                 logging.error("Tool 'fetch_meme' not found.")
                 meme_url = None
 
-            # Convert AI text response to speech
-            audio_url = self.convert_text_to_speech(ai_text_response, user_id, chat_id, turn_id)
-                 
             # Structure the response to include both text and meme/GIF
             response = {
                 "message": ai_text_response,
                 "meme_url": meme_url,
-                "audio_url": audio_url,
-            }   
+            }
+
+            # Convert AI text response to speech
+            if progressive_audio:
+                response["audio_url"] = None
+                response.update(self.start_progressive_speech(ai_text_response, user_id))
+            else:
+                response["audio_url"] = self.convert_text_to_speech(ai_text_response, user_id, chat_id, turn_id)
             return response
         except Exception as e:
             logging.error(f"Error during agent execution: {e}", exc_info=True)
@@ -553,7 +566,36 @@ Explain that you are here to provide personalized tutoring, mentorship, and care
                 return tool
         return None
 
-    def convert_text_to_speech(self, text: str, user_id: str, chat_id: int, turn_id: int) -> tuple:
+    def start_progressive_speech(self, text: str, user_id: str) -> dict:
+        """
+        Starts synthesizing the given text sentence by sentence.
+
+        Chunks are pushed as `audio_chunk` Socket.IO events to clients that joined the playlist
+        (`join_audio_playlist`) and can also be polled from the playlist endpoint.
+
+        Args:
+            text (str): The text to convert to speech.
+            user_id (str): The unique identifier for the user.
+
+        Returns:
+            dict: "audio_playlist_id" and "audio_playlist_url", or an empty dict on failure.
+        """
+        try:
+            user = User.find_by_id(user_id)
+            preferred_language = (user.preferredLanguage if user else None) or 'en'
+
+            playlist = start_progressive_tts(text, preferred_language=preferred_language)
+
+            backend_base_url = os.getenv('BACKEND_BASE_URL', 'http://localhost:8000')
+            return {
+                "audio_playlist_id": playlist.playlist_id,
+                "audio_playlist_url": f"{backend_base_url}/ai_mentor/audio_playlist/{playlist.playlist_id}",
+            }
+        except Exception as e:
+            logging.error(f"Progressive text-to-speech failed to start: {e}")
+            return {}
+
+    def convert_text_to_speech(self, text: str, user_id: str, chat_id: int, turn_id: int, audio_format: str = TTS_DEFAULT_AUDIO_FORMAT) -> tuple:
         """
         Converts the given text to speech and returns the URL of the audio file and the filename.
         
@@ -562,6 +604,7 @@ Explain that you are here to provide personalized tutoring, mentorship, and care
             user_id (str): The unique identifier for the user.
             chat_id (int): The unique identifier for the chat.
             turn_id (int): The turn number in the chat.
+            audio_format (str): "mp3", "ogg" or "wav", requested directly from the synthesizer.
         
         Returns:
             tuple: (audio_url, filename)
@@ -576,16 +619,11 @@ Explain that you are here to provide personalized tutoring, mentorship, and care
 
             # Get the preferred language, default to 'en' if not set
             preferred_language = user.preferredLanguage or 'en'
-            audio_data = text_to_speech(text, preferred_language=preferred_language)
-            if not audio_data:
+
+            # Repeated utterances share one content-addressed file, so they are only synthesized once
+            filename = get_tts_cache().get_or_synthesize(text, preferred_language=preferred_language, audio_format=audio_format)
+            if not filename:
                 raise ValueError("Text-to-speech conversion returned no audio data.")
-            # Define a unique filename
-            filename = f"{user_id}_{chat_id}_{turn_id}.wav"
-            file_path = os.path.join(self.generated_audio_dir, filename)
-            
-            # Save the audio file
-            with open(file_path, 'wb') as f:
-                f.write(audio_data)
             
             backend_base_url = os.getenv('BACKEND_BASE_URL', 'http://localhost:8000')  # Ensure this environment variable is set
             audio_url = f"{backend_base_url}/ai_mentor/download_audio/{filename}"
@@ -27,13 +27,17 @@ from langchain_core.messages.system import SystemMessage
 from .ai_agent import AIAgent
 from services.azure_mongodb import MongoDBClient
 from services.azure_form_recognizer import extract_text_from_file
-from services.text_to_speech_service import text_to_speech
+from services.document_index import format_document_context, get_session_document_index
+from services.extraction_cache import content_sha256
+from services.tts_cache import get_tts_cache
+from services.lipsync import empty_lipsync, get_lipsync_engine, rhubarb_lipsync, text_lipsync
+from services.text_to_speech_service import clean_text
+from services.expression_classifier import ANIMATIONS, FACIAL_EXPRESSIONS, classify_expression
 from models.user import User
 # Constants
-from utils.consts import SYSTEM_MESSAGE
-from pydub import AudioSegment
+from utils.consts import SYSTEM_MESSAGE, TTS_DEFAULT_AUDIO_FORMAT, EXPRESSION_MIN_CONFIDENCE
+from utils.task_graph import run_task_graph
 import base64
-import subprocess
 
 
 
@@ -243,17 +247,19 @@ class MemeMingleAIAgent(AIAgent):
         return most_recent_chat_summary.get("chat_id")
 
 
-    def run(self, message: str, file_content: bytes = None, file_mime_type: str = None, with_history:bool =True, user_id: str=None, chat_id:int=None, turn_id:int=None) -> str:
+    def run(self, message: str, file_content: bytes = None, file_mime_type: str = None, with_history:bool =True, user_id: str=None, chat_id:int=None, turn_id:int=None, inline_audio: bool = False) -> str:
         """
         Runs the agent with the given message and context.
 
         Args:
             message (str): The message to be processed by the agent.
-            file_content (bytes): The content of the uploaded file.
+            file_content (bytes | file-like): The uploaded file, e.g. the spooled upload of the request.
             with_history (bool): A flag indicating whether to use history in the conversation.
             user_id (str): A unique identifier for the user.
             chat_id (int): A unique identifier for the conversation.
             turn_id (int): A unique identifier for the evaluated turn in the conversation.
+            inline_audio (bool): Also embed the MP3 as base64 in "avatar_audio". Otherwise clients
+                stream it from "avatar_audio_url".
         """
 
 
@@ -272,26 +278,32 @@ class MemeMingleAIAgent(AIAgent):
         past_summaries = list(past_summaries_cursor)
         summaries_text = "\n".join([summary.get("summary_text", "") for summary in past_summaries])
 
-       # Process the uploaded file if provided
-        extracted_text = ""
+       # Process the uploaded file if provided: it joins the documents of this chat session
+        document_index = get_session_document_index()
         if file_content and file_mime_type:
             extracted_text = extract_text_from_file(file_content, file_mime_type)
             logging.info(f"Extracted text from file: {extracted_text[:500]}")
+            if extracted_text:
+                document_index.add_document(session_id, content_sha256(file_content), extracted_text)
+
+        # Only the parts of the session's documents relevant to this message go in the prompt
+        document_context = format_document_context(document_index.search(session_id, message))
 
         # Prepare the input for the agent
         agent_input = {
             "input": message,
             "user_id": user_id,
             "past_summaries": summaries_text,
+            "document_context": document_context,
             "agent_scratchpad": [],
         }
 
         # Dynamically build the prompt messages
         prompt_messages = self.base_prompt_messages.copy()
 
-        if extracted_text:
-            # Include the extracted text in the prompt with clear instruction
-            prompt_messages.insert(2, ("system", f"The user has provided a document with the following content:\n\n{extracted_text}\n\nPlease use this content to assist the user."))
+        if document_context:
+            # Passed as a variable, so braces in the document are not read as template fields
+            prompt_messages.insert(2, ("system", "{document_context}"))
 
         # Create a ChatPromptTemplate with the prompt messages
         prompt = ChatPromptTemplate.from_messages(prompt_messages)
@@ -311,27 +323,39 @@ class MemeMingleAIAgent(AIAgent):
 
             ai_text_response = invocation["output"]
 
-            # Convert AI text response to speech
-            audio_url, filename = self.convert_text_to_speech(ai_text_response, user_id, chat_id, turn_id)
-            
-             # 4) Determine Facial Expression & Animation
-            fa_data = self.determine_facial_expression_and_animation(ai_text_response)
-            facial_expression = fa_data["facial_expression"]
-            animation = fa_data["animation"]
-            ##convert wav to mp3 and do base64 encoding
-            avatar_audio = self.convert_and_encode_audio(filename)
-
-            ##lipsync data
-            lip_sync_data = self.generate_lipsync_data(filename)
-            
+            # Post-process the answer as a task graph: the expression call starts right away,
+            # and encoding and lip-sync follow the file they need. The speech is synthesized
+            # once: Rhubarb needs a WAV, which the MP3 is then encoded from while lip-sync runs;
+            # the text engine times its cues on an MP3 synthesized directly
+            tasks = {
+                "expression": (lambda: self.determine_facial_expression_and_animation(ai_text_response), ()),
+                # The MP3 is streamed from avatar_audio_url; base64 only when asked for
+                "encode": (lambda mp3: self.encode_audio(mp3[1]) if inline_audio and mp3[1] else "", ("mp3",)),
+            }
+            if get_lipsync_engine() == "rhubarb":
+                tasks["wav"] = (lambda: self.convert_text_to_speech(ai_text_response, user_id, chat_id, turn_id, audio_format="wav") or ("", ""), ())
+                tasks["mp3"] = (lambda wav: self.convert_audio_file(wav, "mp3"), ("wav",))
+                tasks["lip_sync"] = (lambda wav: self.generate_lipsync_data(wav[1]), ("wav",))
+            else:
+                tasks["mp3"] = (lambda: self.convert_text_to_speech(ai_text_response, user_id, chat_id, turn_id, audio_format="mp3") or ("", ""), ())
+                tasks["lip_sync"] = (lambda mp3: self.generate_lipsync_data(mp3[1], ai_text_response), ("mp3",))
+            results, timings = run_task_graph(tasks)
+            logging.info(f"Avatar post-processing timings (ms): {timings}")
+
+            audio_url, filename = results["mp3"]
+            facial_expression = results["expression"]["facial_expression"]
+            animation = results["expression"]["animation"]
+
             # Structure the response to include both text and meme/GIF
             response = {
                 "message": ai_text_response,
                 "audio_url": audio_url,
                 "facial_expression": facial_expression,
                 "animation": animation,
-                "avatar_audio": avatar_audio,
-                "lip_sync_data": lip_sync_data
+                "avatar_audio": results["encode"],
+                "avatar_audio_url": self.get_avatar_audio_url(filename),
+                "lip_sync_data": results["lip_sync"],
+                "timings": timings
             }   
             return response
         except Exception as e:
@@ -339,32 +363,55 @@ class MemeMingleAIAgent(AIAgent):
             raise   
 
    
-    def convert_and_encode_audio(self, wav_file_name):
+    def convert_audio_file(self, audio: tuple, audio_format: str) -> tuple:
+        """
+        Encodes synthesized speech to another format in memory, without synthesizing it again.
+
+        Args:
+            audio (tuple): (audio_url, filename) from `convert_text_to_speech`.
+            audio_format (str): The format wanted, e.g. "mp3".
+
+        Returns:
+            tuple: (audio_url, filename) of the encoded file; `audio` itself if encoding failed,
+                   so the turn still has playable audio.
         """
-        Converts a WAV file to MP3 and encodes it in Base64.
+        if not audio[1]:
+            return audio
+        filename = get_tts_cache().get_or_transcode(audio[1], audio_format)
+        if not filename:
+            logging.warning(f"Could not encode {audio[1]} as {audio_format}; serving it as is.")
+            return audio
+        backend_base_url = os.getenv('BACKEND_BASE_URL', 'http://localhost:8000')
+        return f"{backend_base_url}/ai_mentor/download_audio/{filename}", filename
+
+    def get_avatar_audio_url(self, audio_file_name):
+        """
+        Returns the URL that streams a generated audio file for inline playback.
+        """
+        if not audio_file_name:
+            return ""
+        backend_base_url = os.getenv('BACKEND_BASE_URL', 'http://localhost:8000')
+        return f"{backend_base_url}/ai_mentor_avtar/audio/{audio_file_name}"
+
+    def encode_audio(self, audio_file_name):
+        """
+        Encodes a generated audio file in Base64. The MP3 is already on disk (synthesized, or
+        encoded from the WAV), so no transcoding is needed here.
         
         Args:
-            wav_file_name (str): The name of the WAV file to convert.
+            audio_file_name (str): The name of the audio file in generated_audio.
         
         Returns:
-            str: Base64 encoded MP3 audio.
+            str: Base64 encoded audio.
         """
         try:
-            wav_file_path = os.path.join(self.generated_audio_dir, wav_file_name)
-            
-            if not os.path.isfile(wav_file_path):
-                raise FileNotFoundError(f"The file {wav_file_path} does not exist.")
+            audio_file_path = os.path.join(self.generated_audio_dir, audio_file_name)
             
-            # Define the MP3 file path
-            mp3_file_path = os.path.splitext(wav_file_path)[0] + ".mp3"
+            if not os.path.isfile(audio_file_path):
+                raise FileNotFoundError(f"The file {audio_file_path} does not exist.")
             
-            # Convert WAV to MP3
-            audio = AudioSegment.from_wav(wav_file_path)
-            audio.export(mp3_file_path, format="mp3")
-            
-            # Read the MP3 file and encode it as Base64
-            with open(mp3_file_path, "rb") as mp3_file:
-                encoded_audio = base64.b64encode(mp3_file.read()).decode("utf-8")
+            with open(audio_file_path, "rb") as audio_file:
+                encoded_audio = base64.b64encode(audio_file.read()).decode("utf-8")
             
             return encoded_audio
         except Exception as e:
@@ -373,89 +420,32 @@ class MemeMingleAIAgent(AIAgent):
 
 
 
-    def generate_lipsync_data(self, wav_file_name):
+    def generate_lipsync_data(self, audio_file_name, text=None):
         """
-        Generates lip-sync data using Rhubarb and ensures a consistent return structure.
-        
+        Generates lip-sync data with the configured engine (LIPSYNC_ENGINE) and ensures a consistent return structure.
+
+        The "text" engine estimates mouth cues in-process from the spoken text and the audio duration;
+        "rhubarb" analyses a WAV file with the Rhubarb binary.
+
         Args:
-            wav_file_name (str): The name of the WAV file to process.
-        
+            audio_file_name (str): The name of the audio file in generated_audio (a WAV file for Rhubarb).
+            text (str, optional): The spoken text. Required by the text engine.
+
         Returns:
             dict: Lip-sync data with "METADATA" and "MOUTH_CUES".
         """
-        # Define the output JSON file path
-        wav_file_path = os.path.join(self.generated_audio_dir, wav_file_name)
-        json_file_path = os.path.splitext(wav_file_path)[0] + ".json"
-
-        # Define Rhubarb path
-        RHUBARB_PATH = os.getenv('RHUBARB_PATH')
-        if not RHUBARB_PATH:
-            # Fallback to a relative path if environment variable not set
-            RHUBARB_PATH = os.path.join(
-                os.path.dirname(os.path.abspath(__file__)),
-                '..', 'rhubarb', 'Rhubarb-Lip-Sync-1.13.0-Windows', 'rhubarb'
-            )
-            # On Windows, append .exe if necessary
-            if os.name == 'nt' and not RHUBARB_PATH.endswith('.exe'):
-                RHUBARB_PATH += '.exe'
-
-        # Use Rhubarb to generate lip-sync data
-        command = [
-            RHUBARB_PATH,
-            "-f", "json",
-            "-o", json_file_path,
-            wav_file_path,
-            "-r", "phonetic"  # Faster but less accurate; remove for better accuracy
-        ]
-
-        try:
-            # Check if WAV file exists
-            if not os.path.isfile(wav_file_path):
-                raise FileNotFoundError(f"The WAV file {wav_file_path} does not exist.")
-
-            # Run the Rhubarb command
-            subprocess.run(command, check=True)
-            logging.info(f"Rhubarb successfully processed {wav_file_path}")
-
-            # Read and return the lip-sync data from the JSON file
-            if not os.path.isfile(json_file_path):
-                raise FileNotFoundError(f"The JSON file {json_file_path} was not created by Rhubarb.")
-
-            with open(json_file_path, "r") as json_file:
-                lip_sync_data = json.load(json_file)
-
-            # Validate the structure of lip_sync_data
-            if "metadata" not in lip_sync_data or "mouthCues" not in lip_sync_data:
-                logging.warning(f"Unexpected lip-sync data structure in {json_file_path}. Using default structure.")
-                return {
-                    "METADATA": {},
-                    "MOUTH_CUES": {}
-                }
-
-            # Normalize keys to uppercase as per requirement
-            normalized_data = {
-                "METADATA": lip_sync_data.get("metadata", {}),
-                "MOUTH_CUES": lip_sync_data.get("mouthCues", {})
-            }
+        if not audio_file_name:
+            return empty_lipsync()
+        audio_file_path = os.path.join(self.generated_audio_dir, audio_file_name)
 
-            return normalized_data
+        if get_lipsync_engine() == "rhubarb":
+            return rhubarb_lipsync(audio_file_path)
 
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Rhubarb failed with error: {e}")
-        except FileNotFoundError as e:
-            logging.error(e)
-        except json.JSONDecodeError as e:
-            logging.error(f"JSON decoding failed for {json_file_path}: {e}")
+        try:
+            return text_lipsync(clean_text(text or ""), audio_file_path)
         except Exception as e:
             logging.error(f"Unexpected error during lip-sync data generation: {e}")
-
-        # Return default structure in case of any errors
-        return {
-            "METADATA": {},
-            "MOUTH_CUES": {}
-        }
-
-
+            return empty_lipsync()
 
         
         
@@ -624,7 +614,7 @@ Explain that you are here to provide personalized tutoring, mentorship, and care
                 return tool
         return None
 
-    def convert_text_to_speech(self, text: str, user_id: str, chat_id: int, turn_id: int) -> tuple:
+    def convert_text_to_speech(self, text: str, user_id: str, chat_id: int, turn_id: int, audio_format: str = TTS_DEFAULT_AUDIO_FORMAT) -> tuple:
         """
         Converts the given text to speech and returns the URL of the audio file and the filename.
         
@@ -633,6 +623,7 @@ Explain that you are here to provide personalized tutoring, mentorship, and care
             user_id (str): The unique identifier for the user.
             chat_id (int): The unique identifier for the chat.
             turn_id (int): The turn number in the chat.
+            audio_format (str): "mp3", "ogg" or "wav", requested directly from the synthesizer.
         
         Returns:
             tuple: (audio_url, filename)
@@ -647,16 +638,11 @@ Explain that you are here to provide personalized tutoring, mentorship, and care
 
             # Get the preferred language, default to 'en' if not set
             preferred_language = user.preferredLanguage or 'en'
-            audio_data = text_to_speech(text, preferred_language=preferred_language)
-            if not audio_data:
+
+            # Repeated utterances share one content-addressed file, so they are only synthesized once
+            filename = get_tts_cache().get_or_synthesize(text, preferred_language=preferred_language, audio_format=audio_format)
+            if not filename:
                 raise ValueError("Text-to-speech conversion returned no audio data.")
-            # Define a unique filename
-            filename = f"{user_id}_{chat_id}_{turn_id}.wav"
-            file_path = os.path.join(self.generated_audio_dir, filename)
-            
-            # Save the audio file
-            with open(file_path, 'wb') as f:
-                f.write(audio_data)
             
             backend_base_url = os.getenv('BACKEND_BASE_URL', 'http://localhost:8000')  # Ensure this environment variable is set
             audio_url = f"{backend_base_url}/ai_mentor/download_audio/{filename}"
@@ -670,31 +656,30 @@ Explain that you are here to provide personalized tutoring, mentorship, and care
         """
         Determines a suitable facial expression and animation based on the AI's message.
 
+        The local classifier answers in well under a millisecond. When its confidence is below
+        EXPRESSION_MIN_CONFIDENCE and EXPRESSION_LLM_FALLBACK is enabled, the LLM decides instead.
+
         Returns:
             dict: A dictionary with keys 'facial_expression' and 'animation'.
         """
+        prediction = classify_expression(ai_response)
+        if prediction.confidence >= EXPRESSION_MIN_CONFIDENCE or os.getenv("EXPRESSION_LLM_FALLBACK", "false").lower() != "true":
+            return prediction.to_dict()
 
-        # The available options you want the LLM to choose from
-        facial_expressions_list = [
-            "smile", 
-            "sad", 
-            "angry", 
-            "surprised", 
-            "funnyFace", 
-            "default"
-        ]
+        logging.info(f"Expression classifier unsure ({prediction.mood}, {prediction.confidence}); asking the LLM.")
+        return self.determine_facial_expression_and_animation_with_llm(ai_response)
 
-        animations_list = [
-            "Talking_0", 
-            "Talking_1", 
-            "Talking_2", 
-            "Crying", 
-            "Laughing", 
-            "Rumba", 
-            "Idle", 
-            "Terrified", 
-            "Angry"
-        ]
+    def determine_facial_expression_and_animation_with_llm(self, ai_response: str) -> dict:
+        """
+        Asks the LLM to choose a facial expression and animation for the AI's message.
+
+        Returns:
+            dict: A dictionary with keys 'facial_expression' and 'animation'.
+        """
+
+        # The available options you want the LLM to choose from
+        facial_expressions_list = FACIAL_EXPRESSIONS
+        animations_list = ANIMATIONS
 
         prompt = f"""
 You are given a list of possible facial expressions and animations. Based on the content and sentiment of the AI's response, choose the best matching facial expression and animation.
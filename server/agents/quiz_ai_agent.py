@@ -2,150 +2,319 @@
 
 from services.azure_open_ai import get_azure_openai_llm
 from services.azure_mongodb import MongoDBClient
+from services.question_bank import bucket_key, get_question_bank
 from models.quiz import Quiz, Question
 from bson import ObjectId
 import datetime
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from services.azure_form_recognizer import extract_text_from_file
-from utils.consts import language_mapping
-def generate_questions(user_id, topic=None, sub_topic=None, file_content=None, file_mime_type=None, num_questions=5, level='medium', language='en'):
+from utils.consts import (
+    language_mapping,
+    QUIZ_DUPLICATE_SIMILARITY,
+    QUIZ_GENERATION_MAX_CONCURRENCY,
+    QUIZ_GENERATION_QUESTIONS_PER_CALL,
+    QUIZ_GENERATION_SHARED_TEXT_CHARS,
+    QUIZ_MAX_QUESTIONS,
+)
+from utils.similar_answer import is_similar
+
+logger = logging.getLogger(__name__)
+
+
+def build_question_prompt(num_questions, level, language_name, topic=None, sub_topic=None, extracted_text=None):
+    """
+    Builds the prompt asking for `num_questions` questions in the line format parsed by `parse_question_line`.
+    """
+    # Prepare the base prompt
+    base_prompt = ""
+
+    if extracted_text:
+        base_prompt += f"Use the following content to generate quiz questions:\n\n{extracted_text}\n\n"
+
+    if topic:
+        base_prompt += f"Generate {num_questions} {level.lower()} level questions about {topic} in {language_name}. "
+    else:
+        base_prompt += f"Generate {num_questions} {level.lower()} level questions in {language_name}. "
+
+    if sub_topic:
+        base_prompt += f"Focus also on the subtopic: {sub_topic}. "
+
+    # Example prompt structure for generating questions
+    return (
+        f"{base_prompt}"
+        f"Each question should be either multiple-choice (MC) with four answer choices or a short answer (SA). "
+        f"For MC questions, **exactly one** answer choice must be marked as correct by appending an asterisk (*) immediately after the answer text, without any spaces. "
+        f"Format each question-answer pair on a separate line. Do not prepend numbers or bullets before each question. Do not include any commentary or extra lines. "
+        f"Separate the question and options using [&&]. "
+        f"For MC, use the format: MC[&&]Question?[&&]Answer1[&&]Answer2[&&]Answer3[&&]Answer4. "
+        f"For SA, use the format: SA[%%]Question?[&&]Answer."
+    )
+
+
+def parse_question_line(line):
+    """
+    Parses one line of a generated quiz.
+
+    Returns:
+        Question | None: The question, or None for an empty or unrecognized line.
+    """
+    line = line.strip()
+    if line.startswith("MC[&&]"):  # Handle multiple-choice questions
+        parts = line[6:].split("[&&]")
+        question = parts[0].strip()
+        options = []
+        correct_answer = None
+        for opt in parts[1:5]:  # Four options
+            opt = opt.strip()
+            if opt.endswith('*'):
+                opt = opt[:-1].strip()  # Remove the asterisk
+                correct_answer = opt
+            options.append(opt)
+
+        if not correct_answer:
+            # Fallback if no correct answer is marked
+            correct_answer = options[0] if options else ""
+
+        return Question(
+            question_id=str(ObjectId()),
+            question=question,
+            options=options,
+            correct_answer=correct_answer,
+            question_type='MC'
+        )
+    if line.startswith("SA[%%]"):  # Handle short-answer questions
+        parts = line[6:].split("[&&]")
+        question = parts[0].strip()
+        correct_answer = parts[1].strip() if len(parts) > 1 else ""  # Second part is the answer
+        return Question(
+            question_id=str(ObjectId()),
+            question=question,
+            correct_answer=correct_answer,
+            question_type='SA'
+        )
+    return None
+
+
+def iter_streamed_questions(llm, prompt):
+    """
+    Streams a completion and yields each question as soon as its line is complete.
+    """
+    buffer = ""
+    for chunk in llm.stream(prompt):
+        buffer += chunk.content or ""
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            question = parse_question_line(line)
+            if question:
+                yield question
+    question = parse_question_line(buffer)
+    if question:
+        yield question
+
+
+@lru_cache(maxsize=None)
+def _get_generation_executor():
+    return ThreadPoolExecutor(max_workers=QUIZ_GENERATION_MAX_CONCURRENCY, thread_name_prefix="quiz-generation")
+
+
+def _is_duplicate(question, other):
+    # Near-identical wording; questions that differ in their numbers (e.g. "What is 3 + 4?") are kept
+    return re.findall(r"\d+", question) == re.findall(r"\d+", other) and is_similar(question, other, QUIZ_DUPLICATE_SIMILARITY)
+
+
+def _shard_sizes(num_questions):
+    # Near-equal parts of at most QUIZ_GENERATION_QUESTIONS_PER_CALL questions each
+    shards = max(1, -(-num_questions // QUIZ_GENERATION_QUESTIONS_PER_CALL))
+    return [num_questions // shards + (1 if i < num_questions % shards else 0) for i in range(shards)]
+
+
+def _text_sections(text, parts):
+    # Short texts go whole to every call; longer ones are cut into contiguous sections at line breaks
+    if not text or parts == 1 or len(text) <= QUIZ_GENERATION_SHARED_TEXT_CHARS:
+        return [text] * parts
+    sections, start = [], 0
+    for i in range(1, parts):
+        target = len(text) * i // parts
+        cut = text.rfind("\n", start, target) + 1
+        cut = cut if cut > start else target
+        sections.append(text[start:cut])
+        start = cut
+    sections.append(text[start:])
+    return sections
+
+
+def generate_question_list(llm, num_questions, level, language_name, topic=None, sub_topic=None, extracted_text=None, on_question=None, executor=None):
+    """
+    Asks the LLM for `num_questions` questions and parses them from the streamed completions.
+
+    Large requests are split into calls of at most QUIZ_GENERATION_QUESTIONS_PER_CALL questions that
+    run concurrently, so no completion runs into `max_tokens` and the latency stays that of one small
+    call. A long `extracted_text` is divided between the calls, each asking about its own section,
+    so the document is sent once rather than once per call. Questions nearly identical to one
+    already accepted (from any call) are dropped.
+
+    Args:
+        llm: The chat model.
+        num_questions (int): The number of questions wanted.
+        on_question (callable, optional): Called with each accepted question as soon as it is parsed,
+            e.g. to push it to the client before the rest are generated.
+        executor (Executor, optional): Where the calls run. Defaults to a small shared pool.
+
+    Returns:
+        list[Question]: At most `num_questions` questions (fewer if the LLM returned fewer).
+    """
+    sizes = _shard_sizes(num_questions)
+    sections = _text_sections(extracted_text, len(sizes))
+    accepted = []
+    lock = threading.Lock()
+
+    def run(index, size):
+        # With several calls, each asks for one spare question to make up for duplicates across calls
+        prompt = build_question_prompt(size + (len(sizes) > 1), level, language_name, topic, sub_topic, sections[index])
+        if len(sizes) > 1:
+            prompt += f" This is set {index + 1} of {len(sizes)}: cover aspects of the subject that the other sets are less likely to."
+        for question in iter_streamed_questions(llm, prompt):
+            with lock:
+                if len(accepted) >= num_questions or any(_is_duplicate(question.question, other.question) for other in accepted):
+                    continue
+                accepted.append(question)
+            if on_question:
+                on_question(question)
+
+    if len(sizes) == 1:
+        run(0, sizes[0])
+        return accepted
+
+    executor = executor or _get_generation_executor()
+    futures = [executor.submit(run, index, size) for index, size in enumerate(sizes)]
+    errors = []
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Failed to generate a set of questions: {e}")
+            errors.append(e)
+    if errors and not accepted:
+        raise errors[0]
+    return accepted
+
+
+def public_question(question):
+    """
+    Returns a question as shown to the user: without its correct answer.
+    """
+    q_dict = {
+        "question_id": question.question_id,
+        "question": question.question,
+        "question_type": question.question_type
+    }
+    if question.question_type == 'MC':
+        q_dict["options"] = question.options
+    return q_dict
+
+
+def _save_quiz(user_id, topic, sub_topic, level, questions):
+    """
+    Stores a quiz and returns its id with the questions, without their correct answers, for the user.
+    """
+    # Create a Quiz instance
+    quiz = Quiz(
+        user_id=user_id,
+        topic=topic if topic else "File-Based Quiz",
+        sub_topic=sub_topic,
+        questions=questions,
+        level=level.lower(),
+        created_at=datetime.datetime.utcnow().isoformat()
+    )
+
+    # Save the quiz to the database
+    db_client = MongoDBClient.get_client()
+    db = db_client[MongoDBClient.get_db_name()]
+    quiz_dict = quiz.dict()
+    result = db.quizzes.insert_one(quiz_dict)
+    quiz_id = str(result.inserted_id)
+
+    # Prepare questions without correct answers for the user
+    user_questions = [public_question(q) for q in questions]
+
+    return {"quiz_id": quiz_id, "questions": user_questions}
+
+
+def generate_questions(user_id, topic=None, sub_topic=None, file_content=None, file_mime_type=None, num_questions=5, level='medium', language='en', on_question=None):
     """
     Generates questions based on a given topic and stores them in the database.
 
+    Topic quizzes are served from the question bank when it holds enough questions the user has not
+    seen; otherwise the questions are generated and added to the bank for later requests.
+
     Args:
         user_id (str): The ID of the user requesting the quiz.
         topic (str): The topic for which to generate questions.
-        num_questions (int): The number of questions to generate.
+        num_questions (int): The number of questions to generate, at most QUIZ_MAX_QUESTIONS.
         level (str): Difficulty level of the questions.
         language (str): Language code (e.g., 'en' for English, 'gu' for Gujarati).
-    
+        on_question (callable, optional): Called with each question (a Question, with its answer) as
+            soon as it is available, before the quiz is saved. Use `public_question` before sending it on.
+
     Returns:
         dict: A dictionary containing the quiz ID and the questions without correct answers.
     """
-    
+
     language_name = language_mapping.get(language, 'English')  # Default to English if code not found
     # Validate the level
     valid_levels = ['easy', 'medium', 'hard']
     if level.lower() not in valid_levels:
         return {"error": f"Invalid level '{level}'. Valid options are: {', '.join(valid_levels)}."}
-    
-    questions = []
-    llm = get_azure_openai_llm()  # Get the Azure language model
 
-    # Prepare the base prompt
-    base_prompt = ""
+    if not topic and not file_content:
+        return {"error": "Either a topic or a file must be provided to generate questions."}
+
+    # Each QUIZ_GENERATION_QUESTIONS_PER_CALL questions are one concurrent LLM call
+    if not 1 <= num_questions <= QUIZ_MAX_QUESTIONS:
+        return {"error": f"The number of questions must be between 1 and {QUIZ_MAX_QUESTIONS}."}
 
+    extracted_text = None
     if file_content:
         # Extract text from the file using Azure Form Recognizer
         extracted_text = extract_text_from_file(file_content, file_mime_type)
         if not extracted_text:
             return {"error": "Failed to extract text from the uploaded file."}
-        base_prompt += f"Use the following content to generate quiz questions:\n\n{extracted_text}\n\n"
 
-    if topic:
-        base_prompt += f"Generate {num_questions} {level.lower()} level questions about {topic} in {language_name}. "
-    else:
-        base_prompt += f"Generate {num_questions} {level.lower()} level questions in {language_name}. "
+    try:
+        # Questions about an uploaded file are specific to it, so only topic quizzes use the bank
+        bank = get_question_bank() if not file_content else None
+        bucket = bucket_key(topic, sub_topic, level, language) if bank else None
 
-    if sub_topic:
-        base_prompt += f"Focus also on the subtopic: {sub_topic}. "
+        if bank:
+            def refill(count):
+                return generate_question_list(get_azure_openai_llm(), count, level, language_name, topic, sub_topic)
 
-    if not topic and not file_content:
-        return {"error": "Either a topic or a file must be provided to generate questions."}
+            try:
+                questions = bank.sample(user_id, bucket, num_questions, refill=refill)
+            except Exception as e:
+                logger.warning(f"Question bank unavailable, generating instead: {e}")
+                bank, questions = None, None
+            if questions:
+                if on_question:
+                    for question in questions:
+                        on_question(question)
+                return _save_quiz(user_id, topic, sub_topic, level, questions)
 
-    # Example prompt structure for generating questions
-    prompt = (
-        f"{base_prompt}"
-        f"Each question should be either multiple-choice (MC) with four answer choices or a short answer (SA). "
-        f"For MC questions, **exactly one** answer choice must be marked as correct by appending an asterisk (*) immediately after the answer text, without any spaces. "
-        f"Format each question-answer pair on a separate line. Do not prepend numbers or bullets before each question. Do not include any commentary or extra lines. "
-        f"Separate the question and options using [&&]. "
-        f"For MC, use the format: MC[&&]Question?[&&]Answer1[&&]Answer2[&&]Answer3[&&]Answer4. "
-        f"For SA, use the format: SA[%%]Question?[&&]Answer."
-    )
+        llm = get_azure_openai_llm()  # Get the Azure language model
+        questions = generate_question_list(llm, num_questions, level, language_name, topic, sub_topic, extracted_text, on_question=on_question)
 
-    
-    try:
-        response = llm.invoke(prompt)  # Call the Azure LLM with the prompt
-        
-        # 2. If your library returns text in response.content, confirm the shape
-        generated_text = response.content.strip()
-        
-        
-        # -- proceed with parsing --
-        for line in generated_text.splitlines():
-
-            if not line.strip():
-                continue  # Skip empty lines
-
-            if line.startswith("MC[&&]"):  # Handle multiple-choice questions
-                parts = line[6:].split("[&&]")
-                question = parts[0].strip()
-                options = []
-                correct_answer = None
-                for opt in parts[1:5]:  # Four options
-                    opt = opt.strip()
-                    if opt.endswith('*'):
-                        opt = opt[:-1].strip()  # Remove the asterisk
-                        correct_answer = opt
-                    options.append(opt)
-                
-                if not correct_answer:
-                    # Fallback if no correct answer is marked
-                    correct_answer = options[0]  # Or handle as an error
-                    
-                
-                question_id = str(ObjectId())
-                questions.append(Question(
-                    question_id=question_id,
-                    question=question,
-                    options=options,
-                    correct_answer=correct_answer,
-                    question_type='MC'
-                ))
-            elif line.startswith("SA[%%]"):  # Handle short-answer questions
-                parts = line[6:].split("[&&]")
-                question = parts[0].strip()
-                correct_answer = parts[1].strip() if len(parts) > 1 else ""  # Second part is the answer
-                question_id = str(ObjectId())
-                questions.append(Question(
-                    question_id=question_id,
-                    question=question,
-                    correct_answer=correct_answer,
-                    question_type='SA'
-                ))
-
-        # Create a Quiz instance
-        quiz = Quiz(
-            user_id=user_id,
-            topic=topic if topic else "File-Based Quiz",
-            sub_topic=sub_topic,
-            questions=questions,
-            level=level.lower(),
-            created_at=datetime.datetime.utcnow().isoformat()
-        )
+        if bank and questions:
+            try:
+                bank.add(bucket, questions, user_id=user_id)
+            except Exception as e:
+                logger.warning(f"Failed to add questions to the bank: {e}")
 
-        # Save the quiz to the database
-        db_client = MongoDBClient.get_client()
-        db = db_client[MongoDBClient.get_db_name()]
-        quiz_dict = quiz.dict()
-        result = db.quizzes.insert_one(quiz_dict)
-        quiz_id = str(result.inserted_id)
-
-        # Prepare questions without correct answers for the user
-        user_questions = []
-        for q in questions:
-            q_dict = {
-                "question_id": q.question_id,
-                "question": q.question,
-                "question_type": q.question_type
-            }
-            if q.question_type == 'MC':
-                q_dict["options"] = q.options
-            user_questions.append(q_dict)
-
-        return {"quiz_id": quiz_id, "questions": user_questions}
+        return _save_quiz(user_id, topic, sub_topic, level, questions)
 
     except Exception as e:
         print(f"Failed to generate questions: {e}")
         return {"error": str(e)}
-
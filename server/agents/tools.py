@@ -1,12 +1,11 @@
 """This module contains the tools used by the agents to interact with the user and the environment."""
 
 """Step 1: Import necessary modules"""
-from langchain_community.tools.tavily_search import TavilySearchResults
+from functools import lru_cache
 from services.db.user import get_user_profile_by_user_id
 from services.db.user_journey import get_user_journey_by_user_id
 from langchain.tools import Tool
 from utils.agents import generate_ai_image,fetch_meme,get_job_listings,get_bing_search_results,get_gutendex_domain_textbooks, get_public_domain_textbooks, generate_suggestions, generate_document
-from langchain_google_community import GooglePlacesTool
 from .tool_schemas import (
     GenerateDocumentInput,
     UserProfileRetrievalInput,
@@ -22,11 +21,25 @@ from .tool_schemas import (
 
 
 
-"""Step 2: Define the toolbox"""
+"""Step 2: Define the community tool factories"""
+# Community tools validate their API keys (and Google Places opens a client) when
+# constructed, so they are built on first use instead of when this module is imported.
+@lru_cache(maxsize=1)
+def get_tavily_search_tool():
+    from langchain_community.tools.tavily_search import TavilySearchResults
+    return TavilySearchResults()
+
+@lru_cache(maxsize=1)
+def get_google_places_tool():
+    from langchain_google_community import GooglePlacesTool
+    return GooglePlacesTool()
+
+
+"""Step 3: Define the toolbox"""
 toolbox = {
     "community": {
-        "web_search_tavily": TavilySearchResults(),
-        "location_search_gplaces": GooglePlacesTool(),
+        "web_search_tavily": get_tavily_search_tool,
+        "location_search_gplaces": get_google_places_tool,
     },
     "custom": {
         "fetch_meme": {
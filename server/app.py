@@ -2,8 +2,14 @@
 This module is the entry point of the application. It initializes the Flask app, registers the routes, and starts the server.
 """
 
+""" Step 0: Optional start-up profile (python app.py --profile-startup) """
+import sys
+if __name__ == '__main__' and '--profile-startup' in sys.argv:
+    from utils.startup_profile import profile_startup
+    sys.exit(profile_startup("app"))
+
 """ Step 1: Import required libraries """
-from utils.socketIo import socketio
+from utils.socketIo import socketio, get_socketio_options
 from dotenv import load_dotenv
 from utils.extensions import oauth, mail
 import os
@@ -13,14 +19,22 @@ from config.config import Config
 from flask_jwt_extended import JWTManager
 from routes import register_blueprints
 from services.db.agent_facts import load_agent_facts_to_db
+from services.speech_synthesizer_pool import warm_up_speech_synthesizers
 from flask_apscheduler import APScheduler
-from utils.delete_generated_doc import delete_old_files_job
+from utils.delete_generated_doc import delete_old_files_job, reconcile_artifact_stores
 import logging  
 
 """ Load environment variables """
 load_dotenv()
 
 """ Step 2: Define the run_app function """
+def is_primary_worker():
+    """
+    Whether this process runs the once-per-deployment work (scheduled jobs, DB pre-load).
+    """
+    return os.getenv("PRIMARY_WORKER", "true").lower() != "false"
+
+
 def run_app():
     
     app = Flask(__name__)
@@ -71,22 +85,27 @@ def run_app():
         return {"status": "ready"}
     
     
-    # Initialize APScheduler
-    scheduler = APScheduler()
-    scheduler.init_app(app)
-
-    # Schedule the delete_old_files_job function
-    scheduler.add_job(
-        id='Delete Old Files',
-        func=delete_old_files_job,
-        trigger='cron',
-        hour=0, minute=0  # Run daily at midnight
-    )
-
-    scheduler.start()
-
-    # **Initialize SocketIO** after the app is created
-    socketio.init_app(app)
+    # Initialize APScheduler. With several workers (see serve.py) only the primary
+    # worker runs the scheduled jobs; the others start with PRIMARY_WORKER=false.
+    if is_primary_worker():
+        scheduler = APScheduler()
+        scheduler.init_app(app)
+
+        # Schedule the delete_old_files_job function
+        scheduler.add_job(
+            id='Delete Old Files',
+            func=delete_old_files_job,
+            trigger='cron',
+            hour=0, minute=0  # Run daily at midnight
+        )
+        # Index files generated before the artifact index existed (runs once, in the background)
+        scheduler.add_job(id='Index Generated Files', func=reconcile_artifact_stores, trigger='date')
+
+        scheduler.start()
+
+    # **Initialize SocketIO** after the app is created, attached to the shared
+    # message queue when SOCKETIO_MESSAGE_QUEUE is set
+    socketio.init_app(app, **get_socketio_options())
 
     return app, jwt, mail
 
@@ -100,5 +119,8 @@ if __name__ == '__main__':
     PORT = os.getenv("FLASK_RUN_PORT") or 8000
     # DB pre-load
     load_agent_facts_to_db()
+    # Connect the common text-to-speech voices in the background
+    warm_up_speech_synthesizers()
     # **Run using socketio.run instead of app.run**
-    socketio.run(app, host=HOST, port=PORT, debug=True)
+    # Development server; see wsgi.py / serve.py for the production entry points.
+    socketio.run(app, host=HOST, port=PORT, debug=os.getenv("FLASK_DEBUG", "true").lower() == "true")
@@ -10,6 +10,19 @@ def create_indexes():
     # Create a compound index on user_id and quiz_id
     db.user_responses.create_index([("user_id", 1), ("quiz_id", 1)])
     print("Created compound index on user_id and quiz_id in user_responses collection.")
+    # Documents shared in a chat are looked up by session and removed by MongoDB once they expire
+    db.session_documents.create_index([("session_id", 1)])
+    db.session_documents.create_index([("expires_at", 1)], expireAfterSeconds=0)
+    print("Created session and TTL indexes in session_documents collection.")
+    # Cached quiz feedback is removed by MongoDB once it expires
+    db.feedback_cache.create_index([("expires_at", 1)], expireAfterSeconds=0)
+    print("Created TTL index in feedback_cache collection.")
+    # Topic quizzes are sampled from a bucket of the question bank, without repeating questions per user
+    db.question_bank.create_index([("bucket", 1), ("fingerprint", 1)], unique=True)
+    print("Created bucket index in question_bank collection.")
+    # Progressive speech playlists are removed by MongoDB once they expire
+    db.audio_playlists.create_index([("expires_at", 1)], expireAfterSeconds=0)
+    print("Created TTL index in audio_playlists collection.")
 
 if __name__ == "__main__":
     create_indexes()
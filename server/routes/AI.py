@@ -2,14 +2,21 @@
 
 """Step 1: Import necessary modules"""
 import logging
-from flask import jsonify, Blueprint, request, send_file, send_from_directory
+from flask import jsonify, Blueprint, request, send_file, send_from_directory, make_response
 import json
 from services.speech_service import speech_to_text
+from services.speech_stream import StreamingRecognition, open_session, get_session, close_session
 from agents.meme_mingle_agent import MemeMingleAIAgent
 from services.azure_mongodb import MongoDBClient
 import io
-from services.text_to_speech_service import text_to_speech
+from services.text_to_speech_service import text_to_speech, AUDIO_MIME_TYPES
+from services.artifact_store import touch_artifact
+from services.progressive_tts import get_playlist, audio_file_url, emit_audio_chunk, playlist_room
+from flask_socketio import join_room
+from utils.socketIo import socketio
 import filetype
+from utils.consts import UPLOAD_MAX_BYTES
+from utils.uploads import UPLOAD_TOO_LARGE_ERROR, read_upload_form, upload_head, upload_size
 from services.azure_form_recognizer import ALLOWED_MIME_TYPES
 import os
 
@@ -62,15 +69,51 @@ def get_mental_health_agent_welcome(user_id):
 
 
 
+def get_chat_agent(user_id, chat_id):
+    """
+    Builds the chat agent with the role chosen for this chat.
+    """
+    # Retrieve desired_role from the database
+    db_client = MongoDBClient.get_client()
+    db_name = MongoDBClient.get_db_name()
+    db = db_client[db_name]
+    chat_summary_collection = db["chat_summaries"]
+    chat_summary = chat_summary_collection.find_one({"user_id": user_id, "chat_id": int(chat_id)})
+    desired_role = chat_summary.get("desired_role", "educational mentor")
+    print(f"Desired role: {desired_role}")
+    agent = MemeMingleAIAgent(
+        tool_names=[
+            "gutendex_textbook_search",
+            "generate_suggestions",
+            "web_search_tavily",
+            "location_search_gplaces",
+            "textbook_search",
+            "user_profile_retrieval",
+            "agent_facts",
+            "generate_document",
+            "job_search",
+            "web_search_bing",
+            "fetch_meme",
+            "user_journey_retrieval",
+            "image_generation"
+        ],
+        desired_role=desired_role  
+    )
+    return agent
+
+
 # Define the route for the main conversation
 @ai_routes.post("/ai_mentor/<user_id>/<chat_id>")
 def run_mental_health_agent(user_id, chat_id):
-    body = request.form.to_dict()
+    body = read_upload_form()
+    if body is None:
+        return jsonify({'error': UPLOAD_TOO_LARGE_ERROR}), 400
     if not body:
         return jsonify({"error": "No data provided"}), 400
 
     prompt = body.get("prompt")
     turn_id = int(body.get("turn_id", 0))
+    progressive_audio = body.get("progressive_audio", "false").lower() == "true"
 
     # Check for file in the request
     uploaded_file = request.files.get('file')
@@ -79,11 +122,12 @@ def run_mental_health_agent(user_id, chat_id):
     file_content = None
     file_mime_type = None
     if uploaded_file:
-        # Read the file content
-        file_content = uploaded_file.read()
+        # Implement file size check on the spooled upload, before anything is read
+        if upload_size(uploaded_file) > UPLOAD_MAX_BYTES:
+            return jsonify({'error': UPLOAD_TOO_LARGE_ERROR}), 400
 
-        # Detect the file type using 'filetype'
-        kind = filetype.guess(file_content)
+        # Detect the file type using 'filetype' on the first few KB
+        kind = filetype.guess(upload_head(uploaded_file))
         if kind is None:
             return jsonify({'error': 'Cannot guess the file type'}), 400
 
@@ -94,37 +138,10 @@ def run_mental_health_agent(user_id, chat_id):
         if file_mime_type not in ALLOWED_MIME_TYPES:
             return jsonify({'error': f'Unsupported file type: {file_mime_type}'}), 400
 
-        # Implement file size check
-        MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
-        if len(file_content) > MAX_FILE_SIZE:
-            return jsonify({'error': 'File size exceeds the maximum limit of 10 MB'}), 400
+        # The extractors read the spooled file themselves
+        file_content = uploaded_file.stream
 
-    # Retrieve desired_role from the database
-    db_client = MongoDBClient.get_client()
-    db_name = MongoDBClient.get_db_name()
-    db = db_client[db_name]
-    chat_summary_collection = db["chat_summaries"]
-    chat_summary = chat_summary_collection.find_one({"user_id": user_id, "chat_id": int(chat_id)})
-    desired_role = chat_summary.get("desired_role", "educational mentor")
-    print(f"Desired role: {desired_role}")
-    agent = MemeMingleAIAgent(
-        tool_names=[
-            "gutendex_textbook_search",
-            "generate_suggestions",
-            "web_search_tavily",
-            "location_search_gplaces",
-            "textbook_search",
-            "user_profile_retrieval",
-            "agent_facts",
-            "generate_document",
-            "job_search",
-            "web_search_bing",
-            "fetch_meme",
-            "user_journey_retrieval",
-            "image_generation"
-        ],
-        desired_role=desired_role  
-    )
+    agent = get_chat_agent(user_id, chat_id)
 
     try:
             
@@ -136,6 +153,7 @@ def run_mental_health_agent(user_id, chat_id):
                                 user_id=user_id,
                                 chat_id=int(chat_id),
                                 turn_id=turn_id + 1, 
+                                progressive_audio=progressive_audio,
                             )
 
         return jsonify(response), 200
@@ -184,6 +202,115 @@ def handle_voice_input():
             return jsonify({'error': 'Speech recognition failed'}), 400
         
 
+@socketio.on("voice_start")
+def handle_voice_start(data):
+    """
+    Opens a streaming recognition session for this client.
+
+    Expected payload (all optional):
+    {
+        "language": "en-US",
+        "encoding": "webm",          # or "pcm" for 16 kHz mono 16-bit chunks
+        "send_to_agent": true,       # run the chat agent on the final transcript
+        "user_id": "...", "chat_id": 1, "turn_id": 0
+    }
+
+    Emits `voice_partial` ({"text", "is_final"}) while the user speaks, `voice_final` ({"text"})
+    after `voice_stop`, and `voice_agent_response` with the agent's answer if requested.
+    """
+    data = data or {}
+    sid = request.sid
+    context = {}
+    if data.get("send_to_agent"):
+        if not data.get("user_id") or data.get("chat_id") is None:
+            return socketio.emit("error", {"message": "user_id and chat_id are required to send the transcript to the agent"}, to=sid)
+        context = {"user_id": data["user_id"], "chat_id": int(data["chat_id"]), "turn_id": int(data.get("turn_id", 0))}
+
+    try:
+        session = StreamingRecognition(
+            on_partial=lambda text: socketio.emit("voice_partial", {"text": text, "is_final": False}, to=sid),
+            on_segment=lambda text: socketio.emit("voice_partial", {"text": text, "is_final": True}, to=sid),
+            language=data.get("language"),
+            encoding=data.get("encoding", "webm"),
+            context=context,
+        )
+        session.start()
+    except Exception as e:
+        logger.error(f"Failed to start voice session: {e}")
+        return socketio.emit("error", {"message": "Failed to start voice recognition"}, to=sid)
+
+    open_session(sid, session)
+    socketio.emit("voice_started", {}, to=sid)
+
+
+@socketio.on("voice_chunk")
+def handle_voice_chunk(chunk):
+    """
+    Feeds the next slice of the recording (binary) to the client's session.
+    """
+    sid = request.sid
+    session = get_session(sid)
+    if session is None:
+        return socketio.emit("error", {"message": "No voice session; send voice_start first"}, to=sid)
+    try:
+        session.write(bytes(chunk))
+    except Exception as e:
+        logger.error(f"Voice session {sid} failed: {e}")
+        close_session(sid)
+        session.abort()
+        socketio.emit("error", {"message": str(e)}, to=sid)
+
+
+@socketio.on("voice_stop")
+def handle_voice_stop(data=None):
+    """
+    Ends the recording; the final transcript (and the agent's answer) follow in a background task.
+    """
+    sid = request.sid
+    session = close_session(sid)
+    if session is None:
+        return socketio.emit("error", {"message": "No voice session; send voice_start first"}, to=sid)
+    socketio.start_background_task(finish_voice_session, session, sid)
+
+
+def finish_voice_session(session, sid):
+    """
+    Emits the final transcript and, if the session asked for it, runs the chat agent on it.
+    """
+    try:
+        text = session.finish()
+    except Exception as e:
+        logger.error(f"Voice session {sid} failed: {e}")
+        session.abort()
+        return socketio.emit("error", {"message": "Speech recognition failed"}, to=sid)
+
+    socketio.emit("voice_final", {"text": text}, to=sid)
+    context = session.context
+    if not text or not context:
+        return
+
+    try:
+        agent = get_chat_agent(context["user_id"], context["chat_id"])
+        response = agent.run(
+            message=text,
+            with_history=True,
+            user_id=context["user_id"],
+            chat_id=context["chat_id"],
+            turn_id=context["turn_id"] + 1,
+        )
+        socketio.emit("voice_agent_response", response, to=sid)
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        socketio.emit("error", {"message": str(e)}, to=sid)
+
+
+@socketio.on("disconnect")
+def handle_voice_disconnect(reason=None):
+    session = close_session(request.sid)
+    if session is not None:
+        session.abort()
+        
+
 @ai_routes.post("/ai_mentor/text-to-speech")
 def handle_text_to_speech():
     """
@@ -229,6 +356,7 @@ def download_document(filename):
     if '..' in filename or filename.startswith('/'):
         return jsonify({'error': 'Invalid filename'}), 400
     # Serve the file from the 'generated_documents' directory
+    touch_artifact("documents", filename)
     return send_from_directory('generated_documents', filename, as_attachment=True)
 
 @ai_routes.get("/ai_mentor/download_audio/<filename>")
@@ -236,8 +364,86 @@ def download_audio(filename):
     # Security check to prevent directory traversal attacks
     if '..' in filename or filename.startswith('/'):
         return jsonify({'error': 'Invalid filename'}), 400
+
+    # Content negotiation: the formats of one utterance share a stem, so serve the
+    # format the client prefers (Accept header or ?format=) if it has been generated
+    stem, extension = os.path.splitext(filename)
+    requested_format = extension.lstrip('.').lower()
+    candidates = [requested_format] + [
+        audio_format for audio_format in AUDIO_MIME_TYPES
+        if audio_format != requested_format and os.path.isfile(os.path.join('generated_audio', f"{stem}.{audio_format}"))
+    ]
+    preferred_format = request.args.get('format')
+    if preferred_format not in candidates:
+        # Ties (e.g. "*/*") go to the first candidate, the format that was asked for
+        formats_by_mime_type = {AUDIO_MIME_TYPES.get(audio_format, 'application/octet-stream'): audio_format for audio_format in candidates}
+        best_mime_type = request.accept_mimetypes.best_match(list(formats_by_mime_type), default=None)
+        preferred_format = formats_by_mime_type.get(best_mime_type, requested_format)
+
     # Serve the file from the 'generated_audio' directory
-    return send_from_directory('generated_audio', filename, as_attachment=True, mimetype='audio/wav')
+    touch_artifact("audio", filename)
+    response = make_response(send_from_directory(
+        'generated_audio',
+        f"{stem}.{preferred_format}",
+        as_attachment=True,
+        mimetype=AUDIO_MIME_TYPES.get(preferred_format, 'audio/wav')
+    ))
+    response.headers['Vary'] = 'Accept'
+    return response
+
+@ai_routes.get("/ai_mentor/audio_playlist/<playlist_id>")
+def get_audio_playlist(playlist_id):
+    """
+    Lists the chunks of a progressive text-to-speech answer that are ready to play.
+
+    Poll until "complete" is true, or pass ?format=m3u8 for an HLS-style playlist.
+    """
+    playlist = get_playlist(playlist_id)
+    if playlist is None:
+        return jsonify({'error': 'Playlist not found'}), 404
+
+    # Read once: `complete` and the ready chunks must agree
+    complete = playlist.complete
+    urls = [audio_file_url(filename) for filename in playlist.published_filenames()]
+
+    if request.args.get("format") == "m3u8":
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-PLAYLIST-TYPE:EVENT", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for url in urls:
+            lines += ["#EXTINF:-1,", url]
+        if complete:
+            lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n", 200, {"Content-Type": "application/vnd.apple.mpegurl"}
+
+    return jsonify({
+        "playlist_id": playlist.playlist_id,
+        "total": playlist.total,
+        "complete": complete,
+        "failed": playlist.failed,
+        "chunks": urls,
+    }), 200
+
+
+@socketio.on("join_audio_playlist")
+def handle_join_audio_playlist(data):
+    """
+    Subscribes the client to the `audio_chunk` events of a progressive answer and
+    replays the chunks that were published before it joined.
+    """
+    playlist_id = (data or {}).get("playlist_id")
+    playlist = get_playlist(playlist_id) if playlist_id else None
+    if playlist is None:
+        return socketio.emit("error", {"message": "Unknown playlist_id"}, to=request.sid)
+
+    # Joining and replaying under the publish lock means no chunk is missed or sent twice
+    with playlist.publish_lock:
+        join_room(playlist_room(playlist_id))
+        if playlist.stored:
+            # Synthesized on another worker: read again now that the room is joined, so a chunk
+            # published in between is replayed (at worst twice) rather than missed
+            playlist = get_playlist(playlist_id) or playlist
+        for index, filename in enumerate(playlist.filenames[:playlist.published_count]):
+            emit_audio_chunk(playlist, index, filename, to=request.sid)
+
 
 @ai_routes.get("/ai_mentor/download_image/<filename>")
 def download_image(filename):
@@ -246,4 +452,5 @@ def download_image(filename):
         return jsonify({'error': 'Invalid filename'}), 400
     
     # Serve the file from the 'generated_images' directory
+    touch_artifact("images", filename)
     return send_from_directory('generated_images', filename, as_attachment=True)
@@ -2,12 +2,18 @@
 
 """Step 1: Import necessary modules"""
 import logging
-from flask import jsonify, Blueprint, request
+from flask import jsonify, Blueprint, request, send_from_directory
 import json
+import os
 from agents.meme_mingle_agent_avtar import MemeMingleAIAgent
 from services.azure_mongodb import MongoDBClient
 import filetype
+from utils.consts import UPLOAD_MAX_BYTES
+from utils.uploads import UPLOAD_TOO_LARGE_ERROR, read_upload_form, upload_head, upload_size
 from services.azure_form_recognizer import ALLOWED_MIME_TYPES
+from services.text_to_speech_service import AUDIO_MIME_TYPES
+from services.tts_cache import GENERATED_AUDIO_DIR
+from services.artifact_store import touch_artifact
 
 
 """Step 2: Create a Blueprint object"""
@@ -61,12 +67,16 @@ def get_mental_health_agent_welcome(user_id):
 # Define the route for the main conversation
 @ai_avtar_routes.post("/ai_mentor_avtar/<user_id>/<chat_id>")
 def run_mental_health_agent(user_id, chat_id):
-    body = request.form.to_dict()
+    body = read_upload_form()
+    if body is None:
+        return jsonify({'error': UPLOAD_TOO_LARGE_ERROR}), 400
     if not body:
         return jsonify({"error": "No data provided"}), 400
 
     prompt = body.get("prompt")
     turn_id = int(body.get("turn_id", 0))
+    # Base64 audio in the JSON is opt-in; by default clients stream avatar_audio_url
+    inline_audio = body.get("inline_audio", "false").lower() == "true"
 
     # Check for file in the request
     uploaded_file = request.files.get('file')
@@ -75,11 +85,12 @@ def run_mental_health_agent(user_id, chat_id):
     file_content = None
     file_mime_type = None
     if uploaded_file:
-        # Read the file content
-        file_content = uploaded_file.read()
+        # Implement file size check on the spooled upload, before anything is read
+        if upload_size(uploaded_file) > UPLOAD_MAX_BYTES:
+            return jsonify({'error': UPLOAD_TOO_LARGE_ERROR}), 400
 
-        # Detect the file type using 'filetype'
-        kind = filetype.guess(file_content)
+        # Detect the file type using 'filetype' on the first few KB
+        kind = filetype.guess(upload_head(uploaded_file))
         if kind is None:
             return jsonify({'error': 'Cannot guess the file type'}), 400
 
@@ -90,10 +101,8 @@ def run_mental_health_agent(user_id, chat_id):
         if file_mime_type not in ALLOWED_MIME_TYPES:
             return jsonify({'error': f'Unsupported file type: {file_mime_type}'}), 400
 
-        # Implement file size check
-        MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
-        if len(file_content) > MAX_FILE_SIZE:
-            return jsonify({'error': 'File size exceeds the maximum limit of 10 MB'}), 400
+        # The extractors read the spooled file themselves
+        file_content = uploaded_file.stream
 
     # Retrieve desired_role from the database
     db_client = MongoDBClient.get_client()
@@ -131,6 +140,7 @@ def run_mental_health_agent(user_id, chat_id):
                                 user_id=user_id,
                                 chat_id=int(chat_id),
                                 turn_id=turn_id + 1, 
+                                inline_audio=inline_audio,
                             )
 
         return jsonify(response), 200
@@ -159,4 +169,30 @@ def set_mental_health_end_state(user_id, chat_id):
     except Exception as e:
         logger.error(f"Error during finalizing chat: {e}", exc_info=True)
         return jsonify({"error": "Failed to finalize chat"}), 500
-    
\ No newline at end of file
+    
+
+
+# Define the route for streaming avatar audio
+@ai_avtar_routes.get("/ai_mentor_avtar/audio/<filename>")
+def stream_avatar_audio(filename):
+    """
+    Streams a generated audio file for inline playback, with HTTP range support.
+
+    Files are content-addressed (see services/tts_cache.py), so they can be cached by the client.
+    """
+    # Security check to prevent directory traversal attacks
+    if '..' in filename or filename.startswith('/'):
+        return jsonify({'error': 'Invalid filename'}), 400
+
+    audio_format = os.path.splitext(filename)[1].lstrip('.').lower()
+    if audio_format not in AUDIO_MIME_TYPES:
+        return jsonify({'error': 'Unsupported audio format'}), 400
+
+    touch_artifact("audio", filename)
+    return send_from_directory(
+        GENERATED_AUDIO_DIR,
+        filename,
+        mimetype=AUDIO_MIME_TYPES[audio_format],
+        conditional=True,
+        max_age=86400
+    )
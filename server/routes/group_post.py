@@ -23,6 +23,14 @@ group_posts_routes = Blueprint("group_posts", __name__)
 # 🔹 SOCKET.IO EVENT HANDLERS
 # --------------------------------
 
+def _group_room(post):
+    """
+    Returns the room of the group that owns a post, so post updates only fan out to that group.
+    Posts without a group_id only get the update echoed back to the sender.
+    """
+    group_id = post.get("group_id")
+    return f"group_{group_id}" if group_id else request.sid
+
 @socketio.on("join_group_room")
 def handle_join_group_room(data):
     """
@@ -181,7 +189,7 @@ def handle_toggle_like_post(data):
                 "post_id": post_id, 
                 "user_id": user_id,
                 "likes": likes_count
-            }, broadcast=True)
+            }, room=_group_room(post))
             
         else:
             # Initialize liked_by if it doesn't exist
@@ -229,7 +237,7 @@ def handle_toggle_like_post(data):
                 "post_id": post_id, 
                 "user_id": user_id,
                 "likes": likes_count
-            }, broadcast=True)
+            }, room=_group_room(post))
             
     except Exception as e:
         print(f"Error in toggle_like_post: {str(e)}")
@@ -316,7 +324,7 @@ def handle_comment_post(data):
             "comment": comment,
             "user_id": user_id,
             "comments": comment_count
-        }, broadcast=True)
+        }, room=_group_room(post))
 
     except Exception as e:
         import traceback
@@ -1,6 +1,6 @@
 import logging
 from flask import jsonify, Blueprint, request
-from agents.quiz_ai_agent import generate_questions
+from agents.quiz_ai_agent import generate_questions, public_question
 from models.quiz import Quiz
 from models.user_response import UserResponse, Answer
 from models.feedback import Feedback
@@ -9,10 +9,15 @@ from bson import ObjectId
 from utils.similar_answer import is_similar
 import datetime
 from services.azure_open_ai import get_azure_openai_llm
+from services.quiz_feedback import CORRECT_FEEDBACK, FEEDBACK_FALLBACK, explain_mistakes
+from services.feedback_cache import get_feedback_cache
 from services.azure_form_recognizer import ALLOWED_MIME_TYPES
 import json
 from services.db.user import get_user_profile_by_user_id
-from utils.consts import language_mapping
+from utils.consts import language_mapping, QUIZ_MAX_QUESTIONS, UPLOAD_MAX_BYTES
+from utils.uploads import UPLOAD_TOO_LARGE_ERROR, read_upload_form, upload_head, upload_size
+from utils.socketIo import socketio
+import filetype
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,18 +25,50 @@ logger = logging.getLogger(__name__)
 
 quiz_ai_routes = Blueprint("quiz_ai", __name__)
 
+def grade_answer(question: dict, user_answer: str) -> tuple[bool, int]:
+    """
+    Grades one answer: 10 points when correct, -5 otherwise.
+
+    MC answers must match the correct option; SA answers must match numerically or be similar enough.
+    """
+    user_answer = (user_answer or '').strip().lower()
+    correct_answer = question.get('correct_answer', '').strip().lower()
+
+    if question.get('question_type') == 'MC':
+        # For MCQs, exact match of the option
+        is_correct = user_answer == correct_answer
+    elif question.get('question_type') == 'SA':
+        # Handle numerical answers separately
+        try:
+            is_correct = float(user_answer) == float(correct_answer)
+        except ValueError:
+            # Non-numeric answers: use similarity check
+            is_correct = is_similar(user_answer, correct_answer)
+    else:
+        # Unknown question types neither gain nor lose points
+        return False, 0
+
+    return is_correct, 10 if is_correct else -5
+
 @quiz_ai_routes.route('/ai/quiz/<user_id>', methods=['POST'])
 def get_questions(user_id):
     """
     Endpoint to get generated questions based on a topic.
     """
-    body = request.form.to_dict()
+    body = read_upload_form()
+    if body is None:
+        return jsonify({'error': UPLOAD_TOO_LARGE_ERROR}), 400
     if not body:
         return jsonify({"error": "No data provided"}), 400
     
     topic = body.get('topic')
     sub_topic = body.get('sub_topic')
-    num_questions = int(body.get('num', 5))
+    try:
+        num_questions = int(body.get('num', 5))
+    except ValueError:
+        return jsonify({"error": "'num' must be a whole number."}), 400
+    if not 1 <= num_questions <= QUIZ_MAX_QUESTIONS:
+        return jsonify({"error": f"'num' must be between 1 and {QUIZ_MAX_QUESTIONS}."}), 400
     level = body.get('level', 'medium').lower()
     print('level:', level)
      # Validate level
@@ -45,17 +82,20 @@ def get_questions(user_id):
     file_mime_type = None
 
     if uploaded_file:
-        file_content = uploaded_file.read()
-        file_mime_type = uploaded_file.mimetype
+        # Implement file size check on the spooled upload, before anything is read
+        if upload_size(uploaded_file) > UPLOAD_MAX_BYTES:
+            return jsonify({'error': UPLOAD_TOO_LARGE_ERROR}), 400
+
+        # Sniff the type from the first few KB; plain text has no signature, so trust the client for it
+        kind = filetype.guess(upload_head(uploaded_file))
+        file_mime_type = kind.mime if kind else uploaded_file.mimetype
 
         # Validate MIME type
         if file_mime_type not in ALLOWED_MIME_TYPES:
             return jsonify({'error': f'Unsupported file type: {file_mime_type}'}), 400
 
-        # Implement file size check
-        MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
-        if len(file_content) > MAX_FILE_SIZE:
-            return jsonify({'error': 'File size exceeds the maximum limit of 10 MB'}), 400
+        # The extractors read the spooled file themselves
+        file_content = uploaded_file.stream
 
     if not topic and not uploaded_file:
         return jsonify({"error": "At least one of 'topic' or 'file' must be provided."}), 400
@@ -68,6 +108,15 @@ def get_questions(user_id):
     user_profile = json.loads(user_profile_json)
     preferred_language = user_profile.get('preferredLanguage', 'en')  # Default to English
 
+    # A client that sends its Socket.IO id gets each question as a `quiz_question` event as soon
+    # as it is generated, before the quiz is complete; the correct answers are never sent
+    socket_id = body.get('socket_id')
+    options = {}
+    if socket_id:
+        def push_question(question):
+            socketio.emit("quiz_question", {"question": public_question(question), "total": num_questions}, to=socket_id)
+        options["on_question"] = push_question
+
     result = generate_questions(
         user_id, 
         topic, 
@@ -76,7 +125,8 @@ def get_questions(user_id):
         file_mime_type, 
         num_questions, 
         level,
-        language=preferred_language
+        language=preferred_language,
+        **options
     )
 
     if "error" in result:
@@ -120,10 +170,6 @@ def submit_answers(quiz_id):
         if ans['question_id'] not in valid_question_ids:
             return jsonify({"error": f"Invalid question_id: {ans['question_id']}" }), 400
 
-    total_points = 0  # Initialize total points
-    feedback_list = []
-    llm = get_azure_openai_llm()  # Initialize LLM for generating feedback
-
     # Fetch user's preferred language
     user_profile_json = get_user_profile_by_user_id(user_id)
     if not user_profile_json:
@@ -132,7 +178,46 @@ def submit_answers(quiz_id):
     user_profile = json.loads(user_profile_json)
     preferred_language = user_profile.get('preferredLanguage', 'en')
     language_name = language_mapping.get(preferred_language, 'English')  # Default to English if code not found
-    # Start a session for transaction
+
+    # Grade every answer first; nothing here touches the database
+    questions_by_id = {q['question_id']: q for q in quiz['questions']}
+    graded = []
+    for ans in answers:
+        question = questions_by_id[ans.get('question_id')]
+        is_correct, points_awarded = grade_answer(question, ans.get('user_answer'))
+        graded.append((ans, question, is_correct, points_awarded))
+
+    # Generate the feedback for all wrong answers in batched calls, before the transaction starts
+    mistakes = [
+        {
+            "question_id": question['question_id'],
+            "question": question['question'],
+            "user_answer": ans['user_answer'],
+            "correct_answer": question['correct_answer'],
+        }
+        for ans, question, is_correct, _ in graded if not is_correct
+    ]
+    # Common mistakes and retakes reuse the feedback already written for the same wrong answer
+    feedback_cache = get_feedback_cache()
+    explanations = feedback_cache.get_many(mistakes, language_name) if mistakes else {}
+    uncached = [mistake for mistake in mistakes if mistake['question_id'] not in explanations]
+    if uncached:
+        generated = explain_mistakes(get_azure_openai_llm(), uncached, language_name)
+        feedback_cache.put_many(uncached, generated, language_name, skip=(FEEDBACK_FALLBACK,))
+        explanations.update(generated)
+
+    feedback_list = [
+        Feedback(
+            question_id=question['question_id'],
+            correct=is_correct,
+            correct_answer=question['correct_answer'],
+            user_answer=ans['user_answer'],
+            feedback=CORRECT_FEEDBACK if is_correct else explanations.get(question['question_id'], FEEDBACK_FALLBACK)
+        )
+        for ans, question, is_correct, _ in graded
+    ]
+
+    # Start a session for transaction; it only covers the reads and writes of the score
     with db_client.start_session() as session:
         try:
             with session.start_transaction():
@@ -144,91 +229,8 @@ def submit_answers(quiz_id):
 
                 is_first_submission = existing_submission is None
 
-                # Process each answer
-                for ans in answers:
-                    question_id = ans.get('question_id')
-                    user_answer = ans.get('user_answer').strip().lower()
-
-                    # Find the corresponding question
-                    question = next((q for q in quiz['questions'] if q['question_id'] == question_id), None)
-                    if question:
-                        correct_answer = question.get('correct_answer', '').strip().lower()
-                        is_correct = False
-                        points_awarded = 0  # To track points per question
-
-                        if question.get('question_type') == 'MC':
-                            # For MCQs, exact match of the option
-                            if user_answer == correct_answer.lower():
-                                is_correct = True
-                                points_awarded = 10
-                            else:
-                                points_awarded = -5
-                        elif question.get('question_type') == 'SA':
-                            # New SA logic with similarity check
-                            # Handle numerical answers separately
-                            try:
-                                user_num = float(user_answer)
-                                correct_num = float(correct_answer)
-                                if user_num == correct_num:
-                                    is_correct = True
-                                    points_awarded = 10
-                                else:
-                                    is_correct = False
-                                    points_awarded = -5
-                            except ValueError:
-                                # Non-numeric answers: use similarity check
-                                if is_similar(user_answer, correct_answer):
-                                    is_correct = True
-                                    points_awarded = 10
-                                else:
-                                    is_correct = False
-                                    points_awarded = -5
-
-                        # Calculate total points based on first submission
-                        if is_first_submission:
-                            total_points += points_awarded
-                        else:
-                            # Do not modify total_points for subsequent submissions
-                            pass
-
-                        # Generate feedback
-                        if not is_correct:
-                            # Prepare prompt for feedback generation
-                            prompt = (
-                                f"You are an educational assistant helping users (5-15 years old) understand their mistakes in quizzes.\n\n"
-                                f"Question: {question['question']} ({language_name})\n"
-                                f"User's Answer: {ans['user_answer']} ({language_name})\n"
-                                f"Correct Answer: {question['correct_answer']} ({language_name})\n\n"
-                                f"Provide constructive and detailed feedback in {language_name} that explains why the user's answer is incorrect and how to arrive at the correct answer. "
-                                f"Ensure the feedback is clear, educational, and encourages the user to understand the concept better.\n\n"
-                                f"Feedback:"
-                            )
-
-                            try:
-                                feedback_response = llm(prompt)
-                                feedback_text = feedback_response.content.strip()
-                                logger.info(f"Generated feedback: {feedback_text}")
-                            except Exception as e:
-                                logger.error(f"Failed to generate feedback: {e}")
-                                feedback_text = "No feedback available."
-
-                            feedback_item = Feedback(
-                                question_id=question_id,
-                                correct=False,
-                                correct_answer=question['correct_answer'],
-                                user_answer=ans['user_answer'],
-                                feedback=feedback_text
-                            )
-                        else:
-                            feedback_item = Feedback(
-                                question_id=question_id,
-                                correct=True,
-                                correct_answer=question['correct_answer'],
-                                user_answer=ans['user_answer'],
-                                feedback="Correct answer! Well done."
-                            )
-
-                        feedback_list.append(feedback_item)
+                # Only the first submission counts towards the score
+                total_points = sum(points for _, _, _, points in graded) if is_first_submission else 0
 
                 # Ensure that total_points does not go below zero
                 if total_points < 0:
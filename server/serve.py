@@ -0,0 +1,81 @@
+"""
+Starts several single-worker gunicorn servers on consecutive ports.
+
+Each Socket.IO client has to stay on the worker that holds its session, so instead of
+`gunicorn -w N` (which load-balances every request) this launches N independent servers
+and leaves the routing to a sticky load balancer (e.g. nginx `ip_hash`). All servers share
+SOCKETIO_MESSAGE_QUEUE, so an emit made by any of them reaches every connected client.
+
+Usage:
+    SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 python serve.py --workers 4 --port 8000
+"""
+
+""" Step 1: Import required libraries """
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+SERVER_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+""" Step 2: Define the launcher """
+def build_worker_command(port: int, threads: int, host: str = "0.0.0.0") -> list[str]:
+    """
+    Builds the gunicorn command for one worker.
+
+    Args:
+        port (int): The port the worker listens on.
+        threads (int): The number of threads serving requests and WebSocket connections.
+        host (str): The interface to bind.
+
+    Returns:
+        list: The command line.
+    """
+    return [
+        sys.executable, "-m", "gunicorn",
+        "-k", "gthread", "-w", "1", "--threads", str(threads),
+        "-b", f"{host}:{port}",
+        "wsgi:app",
+    ]
+
+
+def serve(workers: int, port: int, threads: int, host: str = "0.0.0.0") -> int:
+    """
+    Runs `workers` gunicorn servers on ports port, port+1, ... until they exit or a signal arrives.
+
+    Only the first worker is the primary one (scheduled jobs, DB pre-load).
+
+    Returns:
+        int: The highest exit code among the workers.
+    """
+    if workers > 1 and not os.getenv("SOCKETIO_MESSAGE_QUEUE"):
+        print("SOCKETIO_MESSAGE_QUEUE must be set when running more than one worker.", file=sys.stderr)
+        return 2
+
+    processes = []
+    for index in range(workers):
+        env = dict(os.environ, PRIMARY_WORKER="true" if index == 0 else "false")
+        command = build_worker_command(port + index, threads, host)
+        print(f"Starting worker {index} on {host}:{port + index}")
+        processes.append(subprocess.Popen(command, cwd=SERVER_ROOT, env=env))
+
+    def forward(signum, _frame):
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signum)
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+
+    return max(process.wait() for process in processes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run several Socket.IO-ready gunicorn workers.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", "1")))
+    parser.add_argument("--port", type=int, default=int(os.getenv("FLASK_RUN_PORT", "8000")))
+    parser.add_argument("--threads", type=int, default=100)
+    parser.add_argument("--host", default="0.0.0.0")
+    args = parser.parse_args()
+    sys.exit(serve(args.workers, args.port, args.threads, args.host))
@@ -0,0 +1,265 @@
+"""
+This module contains the store for generated files (documents, images and audio).
+
+Every file written to a `generated_*` directory is recorded in a small SQLite index next to the
+directory, with its size and its created and last-access times. Each kind of file has a byte
+quota; when a write takes a kind over its quota, the least recently used entries are deleted
+right away. Files that share a stem (e.g. tts_<hash>.mp3 and tts_<hash>.wav) form one entry and
+are evicted together.
+
+Eviction and the scheduled age-based cleanup read the index in last-access order, so they only
+touch the rows and files they delete. The index is shared by all worker processes.
+"""
+
+"""Step 1: Import necessary modules"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+from utils.consts import ARTIFACT_QUOTAS, ARTIFACT_MAX_AGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SERVER_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ARTIFACT_DIRECTORIES = {
+    "documents": os.path.join(SERVER_ROOT, 'generated_documents'),
+    "images": os.path.join(SERVER_ROOT, 'generated_images'),
+    "audio": os.path.join(SERVER_ROOT, 'generated_audio'),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    stem TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_by_access ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    stem TEXT NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_by_stem ON files (stem);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, size) VALUES (0, 0);
+"""
+
+
+def stem_of(name: str) -> str:
+    """
+    Returns the part of a filename before the first dot; files with the same stem are one entry.
+    """
+    return name.split(".", 1)[0]
+
+
+"""Step 2: Define the ArtifactStore class"""
+class ArtifactStore:
+    """
+    A directory of generated files with a byte quota and least-recently-used eviction.
+    """
+
+    def __init__(self, kind: str, directory: str, max_bytes: int, max_age_seconds: float = None, index_path: str = None):
+        """
+        Initializes the store and its index.
+
+        Args:
+            kind (str): A name for logs, e.g. "audio".
+            directory (str): Where the files live.
+            max_bytes (int): The quota for the directory.
+            max_age_seconds (float, optional): Entries not accessed for this long are removed by `cleanup`.
+            index_path (str, optional): The SQLite index. Defaults to `<directory>.index.sqlite3`, next to
+                the directory so it is never served from it.
+        """
+        self.kind = kind
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.index_path = index_path or f"{self.directory}.index.sqlite3"
+        self._local = threading.local()
+        os.makedirs(self.directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite's own locking makes the index safe across processes
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.index_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def path_for(self, name: str) -> str:
+        """
+        Returns the absolute path of a file in the store.
+        """
+        return os.path.join(self.directory, name)
+
+    def write(self, name: str, data: bytes) -> str:
+        """
+        Writes a file atomically, records it and enforces the quota.
+
+        Returns:
+            str: The absolute path of the file.
+        """
+        path = self.path_for(name)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self.record(name)
+        return path
+
+    def record(self, name: str):
+        """
+        Records a file that was written to the directory (or rewritten) and enforces the quota.
+        The entry it belongs to counts as just used, so it is not evicted by its own write.
+        """
+        try:
+            size = os.path.getsize(self.path_for(name))
+        except FileNotFoundError:
+            return
+        stem, now = stem_of(name), time.time()
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT size FROM files WHERE name = ?", (name,)).fetchone()
+            delta = size - (row[0] if row else 0)
+            connection.execute("INSERT OR REPLACE INTO files (name, stem, size) VALUES (?, ?, ?)", (name, stem, size))
+            connection.execute(
+                "INSERT INTO entries (stem, size, created_at, accessed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(stem) DO UPDATE SET size = size + ?, accessed_at = ?",
+                (stem, size, now, now, delta, now),
+            )
+            connection.execute("UPDATE totals SET size = size + ? WHERE id = 0", (delta,))
+        self.evict(keep=stem)
+
+    def touch(self, name: str):
+        """
+        Marks the entry of a file as used, e.g. when it is served or found in a cache.
+        """
+        connection = self._connect()
+        with connection:
+            connection.execute("UPDATE entries SET accessed_at = ? WHERE stem = ?", (time.time(), stem_of(name)))
+
+    def total_bytes(self) -> int:
+        """
+        Returns the recorded size of the store.
+        """
+        return self._connect().execute("SELECT size FROM totals WHERE id = 0").fetchone()[0]
+
+    def evict(self, keep: str = None, older_than: float = None) -> int:
+        """
+        Deletes least recently used entries while the store is over its quota, and entries
+        last accessed before `older_than`.
+
+        Args:
+            keep (str, optional): A stem that must not be evicted.
+            older_than (float, optional): A timestamp; older entries are removed regardless of the quota.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+        connection = self._connect()
+        if older_than is None and self.total_bytes() <= self.max_bytes:
+            return 0
+        doomed_stems, doomed_files = [], []
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            total = connection.execute("SELECT size FROM totals WHERE id = 0").fetchone()[0]
+            rows = connection.execute(
+                "SELECT stem, size, accessed_at FROM entries WHERE stem != ? ORDER BY accessed_at",
+                (keep or "",),
+            )
+            for stem, size, accessed_at in rows:
+                expired = older_than is not None and accessed_at < older_than
+                if total <= self.max_bytes and not expired:
+                    break
+                doomed_stems.append(stem)
+                total -= size
+            rows.close()
+            for stem in doomed_stems:
+                doomed_files += [name for (name,) in connection.execute("SELECT name FROM files WHERE stem = ?", (stem,))]
+                connection.execute("DELETE FROM files WHERE stem = ?", (stem,))
+                connection.execute("DELETE FROM entries WHERE stem = ?", (stem,))
+            if doomed_stems:
+                connection.execute("UPDATE totals SET size = ? WHERE id = 0", (max(total, 0),))
+
+        # Files are removed after the index commits, so other workers stop handing them out first
+        for name in doomed_files:
+            try:
+                os.remove(self.path_for(name))
+            except FileNotFoundError:
+                pass
+        if doomed_stems:
+            logger.info(f"Evicted {len(doomed_stems)} {self.kind} entries; {total} bytes in use.")
+        return len(doomed_stems)
+
+    def cleanup(self) -> int:
+        """
+        Removes entries not accessed for `max_age_seconds` and enforces the quota.
+        """
+        older_than = time.time() - self.max_age_seconds if self.max_age_seconds else None
+        return self.evict(older_than=older_than)
+
+    def reconcile(self) -> int:
+        """
+        Brings the index in line with the directory: records files written before the store
+        existed and forgets files deleted behind its back. This scans the directory, so it is
+        meant for start-up, not for every write.
+
+        Returns:
+            int: The number of files newly recorded.
+        """
+        connection = self._connect()
+        known = {name for (name,) in connection.execute("SELECT name FROM files")}
+        present, entries = {}, {}
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.endswith(".tmp"):
+                continue
+            stat = entry.stat()
+            present[entry.name] = stat.st_size
+            size, mtime = entries.get(stem_of(entry.name), (0, 0))
+            entries[stem_of(entry.name)] = (size + stat.st_size, max(mtime, stat.st_mtime))
+
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM files")
+            connection.executemany("INSERT INTO files (name, stem, size) VALUES (?, ?, ?)",
+                                   [(name, stem_of(name), size) for name, size in present.items()])
+            connection.execute("DELETE FROM entries WHERE stem NOT IN (SELECT stem FROM files)")
+            # Known entries keep their access time; new ones start at the file's modification time
+            connection.executemany(
+                "INSERT INTO entries (stem, size, created_at, accessed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(stem) DO UPDATE SET size = excluded.size",
+                [(stem, size, mtime, mtime) for stem, (size, mtime) in entries.items()],
+            )
+            connection.execute("UPDATE totals SET size = ? WHERE id = 0", (sum(present.values()),))
+        self.evict()
+        return len(set(present) - known)
+
+
+"""Step 3: Define the shared stores"""
+@lru_cache(maxsize=None)
+def get_artifact_store(kind: str) -> ArtifactStore:
+    """
+    Returns the process-wide store for "documents", "images" or "audio".
+    """
+    return ArtifactStore(kind, ARTIFACT_DIRECTORIES[kind], ARTIFACT_QUOTAS[kind], ARTIFACT_MAX_AGE_SECONDS.get(kind))
+
+
+def touch_artifact(kind: str, name: str):
+    """
+    Marks a served file as used. Never raises, so a download is not failed by bookkeeping.
+    """
+    try:
+        get_artifact_store(kind).touch(name)
+    except Exception as e:
+        logger.warning(f"Could not record access to {kind}/{name}: {e}")
@@ -1,6 +1,5 @@
 import os
 from urllib.parse import urlparse
-from azure.storage.blob import BlobServiceClient
 from werkzeug.utils import secure_filename
 from azure.core.exceptions import ResourceExistsError
 
@@ -10,6 +9,9 @@ class AzureBlobService:
     """
 
     def __init__(self, container_name=None):
+        # Imported here: the storage SDK is only needed once a route actually touches blobs
+        from azure.storage.blob import BlobServiceClient
+
         self.connection_string = os.getenv('AZURE_BLOB_CONNECTION_STRING')
         # Use the provided container_name or default to "profile-pics"
         self.container_name = container_name or os.getenv('AZURE_BLOB_CONTAINER_NAME', "profile-pics")
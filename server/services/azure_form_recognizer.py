@@ -4,19 +4,35 @@
 import io
 import os
 import logging
-from azure.ai.formrecognizer import DocumentAnalysisClient
-from azure.core.credentials import AzureKeyCredential
-
-# ---- Computer Vision for fallback OCR ----
-from azure.cognitiveservices.vision.computervision import ComputerVisionClient
-from azure.cognitiveservices.vision.computervision.models import OperationStatusCodes
-from msrest.authentication import CognitiveServicesCredentials
+import re
+import threading
 import time
-
-# Import additional libraries
-from docx import Document as DocxDocument
-import openpyxl
-from pptx import Presentation
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from services.extraction_cache import get_extraction_cache
+from services.office_text import iter_docx_text, iter_pptx_text, iter_xlsx_text, take_chars
+from services.pdf_text_layer import needs_ocr, read_pdf_text_layer
+from utils.consts import (
+    EXTRACTION_CHARS_PER_TOKEN,
+    EXTRACTION_MAX_CHARS,
+    EXTRACTION_TOKEN_BUDGET,
+    FORM_RECOGNIZER_MAX_PAGES,
+    FORM_RECOGNIZER_PAGES_PER_REQUEST,
+    OCR_MAX_CONCURRENCY,
+    OCR_POLL_TIMEOUT_SECONDS,
+    PDF_MAX_STREAM_BYTES,
+)
+
+# The Azure SDK clients and openpyxl are imported inside the functions that need them,
+# keeping app start-up fast.
+
+# A page tree node ("/Type /Pages ... /Count 12", keys in any order) and a compressed object stream
+_PAGE_TREE_PATTERN = re.compile(rb"<<[^<>]*?/Type\s*/Pages\b[^<>]*>>")
+_PAGE_COUNT_PATTERN = re.compile(rb"/Count\s+(\d+)")
+_OBJECT_STREAM_PATTERN = re.compile(rb"/Type\s*/ObjStm\b[^<>]*>>\s*stream\r?\n")
+_computer_vision_slots = threading.BoundedSemaphore(OCR_MAX_CONCURRENCY)
 
 """Step 2: Define the helper functions"""
 def get_form_recognizer_client():
@@ -25,6 +41,9 @@ def get_form_recognizer_client():
     - AZURE_FORM_RECOGNIZER_ENDPOINT
     - AZURE_FORM_RECOGNIZER_KEY
     """
+    from azure.ai.formrecognizer import DocumentAnalysisClient
+    from azure.core.credentials import AzureKeyCredential
+
     endpoint = os.getenv("AZURE_FORM_RECOGNIZER_ENDPOINT")
     key = os.getenv("AZURE_FORM_RECOGNIZER_KEY")
     if not endpoint or not key:
@@ -38,6 +57,9 @@ def get_computer_vision_client():
     - AZURE_COMPUTER_VISION_ENDPOINT
     - AZURE_COMPUTER_VISION_KEY
     """
+    from azure.cognitiveservices.vision.computervision import ComputerVisionClient
+    from msrest.authentication import CognitiveServicesCredentials
+
     endpoint = os.getenv("AZURE_COMPUTER_VISION_ENDPOINT")
     key = os.getenv("AZURE_COMPUTER_VISION_KEY")
     if not endpoint or not key:
@@ -45,12 +67,26 @@ def get_computer_vision_client():
     return ComputerVisionClient(endpoint, CognitiveServicesCredentials(key))
 
 
-def extract_text_from_file(file_content: bytes, file_mime_type: str) -> str:
+def extract_text_from_file(file_content, file_mime_type: str) -> str:
     """
-    Main entry point for text extraction. 
+    Main entry point for text extraction. Results are cached by sha256(file_content) and MIME type
+    (see services/extraction_cache.py), so a repeat upload is not sent to Azure again.
+    `file_content` may be bytes or a seekable file, such as the spooled upload of a request.
+    """
+    try:
+        return get_extraction_cache().get_or_extract(file_content, file_mime_type, extract_text_uncached)
+    except Exception as e:
+        logging.error(f"Error extracting text from file: {e}", exc_info=True)
+        return ""
+
+
+def extract_text_uncached(file_content, file_mime_type: str) -> str:
+    """
+    Extracts text without the cache.
     1) Dispatches .docx/.xlsx/.pptx to dedicated parsers.
-    2) For PDF/images, tries Form Recognizer's 'prebuilt-read' model.
-    3) Optionally, if we detect an image and want more robust OCR, fallback to Computer Vision.
+    2) For PDFs with a usable text layer, reads it locally (see services/pdf_text_layer.py).
+    3) For scanned PDFs and images, tries Form Recognizer's 'prebuilt-read' model.
+    4) Optionally, if we detect an image and want more robust OCR, fallback to Computer Vision.
     """
     try:
         if file_mime_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
@@ -73,29 +109,145 @@ def extract_text_from_file(file_content: bytes, file_mime_type: str) -> str:
             logging.info("Processing a .txt file")
             return extract_text_from_txt(file_content)
 
-        else:
-            # If it's PDF or an image, attempt Form Recognizer's prebuilt-read first
-            logging.info("Trying Form Recognizer for PDF/image")
-            extracted_text = try_form_recognizer(file_content, file_mime_type)
-            if extracted_text.strip():
-                return extracted_text
-            else:
-                # If no text came out, we can fallback to Computer Vision for images
-                if file_mime_type.startswith('image/'):
-                    logging.info("Form Recognizer returned no text; trying Computer Vision OCR fallback.")
-                    extracted_text_cv = try_computer_vision_ocr(file_content)
-                    return extracted_text_cv
-                return extracted_text  # For PDF with no text, just return empty string
+        # The PDF reader and the Azure services need the whole file
+        file_content = read_bytes(file_content)
+
+        if file_mime_type == 'application/pdf':
+            # Born-digital PDFs carry their text; only scans need OCR
+            page_texts = read_pdf_text_layer(file_content, max_chars=EXTRACTION_MAX_CHARS)
+            if not needs_ocr(page_texts):
+                logging.info(f"Read the text layer of a {len(page_texts)}-page PDF locally")
+                return "".join(_within_budget(page_texts, EXTRACTION_TOKEN_BUDGET))
+            logging.info("The PDF has no usable text layer")
+
+        # If it's a scanned PDF or an image, attempt Form Recognizer's prebuilt-read first
+        logging.info("Trying Form Recognizer for PDF/image")
+        extracted_text = try_form_recognizer(file_content, file_mime_type)
+        if extracted_text.strip():
+            return extracted_text
+        # If no text came out, we can fallback to Computer Vision for images
+        if file_mime_type.startswith('image/'):
+            logging.info("Form Recognizer returned no text; trying Computer Vision OCR fallback.")
+            return try_computer_vision_ocr(file_content)
+        return extracted_text  # For PDF with no text, just return empty string
 
     except Exception as e:
         logging.error(f"Error extracting text from file: {e}", exc_info=True)
         return ""
 
 
-def try_form_recognizer(file_content: bytes, file_mime_type: str) -> str:
+def read_bytes(file_content) -> bytes:
+    """
+    Returns the content of an upload given as bytes or as a seekable file.
+    """
+    if isinstance(file_content, (bytes, bytearray)):
+        return file_content
+    file_content.seek(0)
+    return file_content.read()
+
+
+def count_pdf_pages(file_content: bytes):
+    """
+    Counts the pages of a PDF without a PDF library, from the /Count of its page tree.
+    Page tree nodes may sit in compressed object streams (PDF 1.5+), so those are inflated too,
+    up to PDF_MAX_STREAM_BYTES each.
+
+    Returns:
+        int | None: The page count, or None if it could not be found.
+    """
+    counts = _page_tree_counts(file_content)
+    if not counts:
+        for match in _OBJECT_STREAM_PATTERN.finditer(file_content):
+            stream = file_content[match.end():file_content.find(b"endstream", match.end())]
+            try:
+                decompressor = zlib.decompressobj()
+                data = decompressor.decompress(stream, PDF_MAX_STREAM_BYTES)
+            except zlib.error:
+                continue
+            if decompressor.unconsumed_tail:
+                # Larger than any genuine object stream; not inflated any further
+                logging.warning(f"Skipping a PDF object stream larger than {PDF_MAX_STREAM_BYTES} bytes.")
+                continue
+            counts += _page_tree_counts(data)
+    # The root of the page tree holds the largest count
+    return max(counts) if counts else None
+
+
+def _page_tree_counts(data: bytes) -> list[int]:
+    return [int(count) for node in _PAGE_TREE_PATTERN.findall(data) for count in _PAGE_COUNT_PATTERN.findall(node)]
+
+
+def page_ranges(page_count: int, pages_per_request: int) -> list[str]:
+    """
+    Splits pages 1..page_count into Form Recognizer page ranges, e.g. ["1-8", "9-12"].
+    """
+    return [f"{first}-{min(first + pages_per_request - 1, page_count)}" for first in range(1, page_count + 1, pages_per_request)]
+
+
+@lru_cache(maxsize=None)
+def _get_ocr_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=OCR_MAX_CONCURRENCY, thread_name_prefix="ocr")
+
+
+def _analyze_pages(client, file_content: bytes, file_mime_type: str, pages: str = None) -> list[str]:
+    """
+    Runs 'prebuilt-read' on the whole document or on a page range.
+
+    Returns:
+        list[str]: The text of each page analyzed, in page order.
+    """
+    options = {"pages": pages} if pages else {}
+    poller = client.begin_analyze_document(
+        "prebuilt-read",
+        document=file_content,
+        content_type=file_mime_type,  # <--- Pass MIME type
+        **options
+    )
+    result = poller.result()
+    return ["".join(line.content + "\n" for line in page.lines)
+            for page in sorted(result.pages, key=lambda page: page.page_number)]
+
+
+def _analyze_range(client, file_content: bytes, file_mime_type: str, pages: str) -> list[str]:
+    # Transient service errors are common on long documents, so each range is retried once
+    try:
+        return _analyze_pages(client, file_content, file_mime_type, pages)
+    except Exception as e:
+        logging.warning(f"Form Recognizer failed on pages {pages}, retrying: {e}")
+        return _analyze_pages(client, file_content, file_mime_type, pages)
+
+
+def _completed_pages(futures):
+    """
+    Yields the page texts of each (pages, future) range in order, skipping ranges that failed.
+    """
+    for pages, future in futures:
+        try:
+            yield from future.result()
+        except Exception as e:
+            logging.error(f"Form Recognizer failed on pages {pages}; skipping them: {e}")
+
+
+def try_form_recognizer(file_content: bytes, file_mime_type: str, max_pages: int = FORM_RECOGNIZER_MAX_PAGES,
+                        token_budget: int = EXTRACTION_TOKEN_BUDGET, executor=None) -> str:
     """
     Uses Azure Form Recognizer's 'prebuilt-read' model to extract text.
     The crucial part is passing content_type=file_mime_type so it can handle images.
+
+    A PDF longer than FORM_RECOGNIZER_PAGES_PER_REQUEST pages is analyzed as several page ranges
+    at once, and the pages are put back in order. A range that fails twice is left out, so the
+    others are still returned. Once `token_budget` tokens have been collected, ranges not yet
+    started are cancelled.
+
+    Args:
+        file_content (bytes): The PDF or image.
+        file_mime_type (str): Its MIME type.
+        max_pages (int): Pages after this one are not analyzed.
+        token_budget (int, optional): Stop once about this many tokens are extracted; None for no limit.
+        executor (Executor, optional): Runs the page ranges. Defaults to a shared bounded pool.
+
+    Returns:
+        str: One line of text per line found, or "" if the service failed.
     """
     try:
         client = get_form_recognizer_client()
@@ -103,111 +255,133 @@ def try_form_recognizer(file_content: bytes, file_mime_type: str) -> str:
             logging.error("Form Recognizer client is not available. Check environment variables.")
             return ""
 
-        poller = client.begin_analyze_document(
-            "prebuilt-read",
-            document=file_content,
-            content_type=file_mime_type  # <--- Pass MIME type
-        )
-        result = poller.result()
-
-        extracted_text = ""
-        for page in result.pages:
-            for line in page.lines:
-                extracted_text += line.content + "\n"
-        return extracted_text
+        page_count = count_pdf_pages(file_content) if file_mime_type == 'application/pdf' else None
+        if not page_count or min(page_count, max_pages) <= FORM_RECOGNIZER_PAGES_PER_REQUEST:
+            # One request; the cap still applies to PDFs and TIFFs whose length is unknown
+            capped = file_mime_type in ('application/pdf', 'image/tiff') and (page_count or max_pages + 1) > max_pages
+            pages = _analyze_pages(client, file_content, file_mime_type, f"1-{max_pages}" if capped else None)
+            return "".join(_within_budget(pages, token_budget))
+
+        if page_count > max_pages:
+            logging.info(f"Analyzing the first {max_pages} of {page_count} pages.")
+        executor = executor or _get_ocr_executor()
+        futures = [(pages, executor.submit(_analyze_range, client, file_content, file_mime_type, pages))
+                   for pages in page_ranges(min(page_count, max_pages), FORM_RECOGNIZER_PAGES_PER_REQUEST)]
+        try:
+            return "".join(_within_budget(_completed_pages(futures), token_budget))
+        finally:
+            for _, future in futures:
+                future.cancel()
 
     except Exception as e:
         logging.error(f"Form Recognizer failed: {e}", exc_info=True)
         return ""
 
 
-def try_computer_vision_ocr(image_bytes: bytes) -> str:
+def _within_budget(pages, token_budget: int = None):
+    """
+    Yields page texts in order until about `token_budget` tokens have been yielded.
+    """
+    budget_chars = token_budget * EXTRACTION_CHARS_PER_TOKEN if token_budget else None
+    collected = 0
+    for page in pages:
+        yield page
+        collected += len(page)
+        if budget_chars is not None and collected >= budget_chars:
+            logging.info(f"Token budget of {token_budget} reached; skipping the remaining pages.")
+            return
+
+
+def try_computer_vision_ocr(image_bytes: bytes, timeout: float = OCR_POLL_TIMEOUT_SECONDS) -> str:
     """
     Fallback to Azure Computer Vision OCR if needed.
-    Uses the 'Read' API (v3) in a synchronous polling manner.
+    Uses the 'Read' API (v3) in a synchronous polling manner. At most OCR_MAX_CONCURRENCY reads
+    run at once per worker, and a read still running after `timeout` seconds is given up.
     """
-    extracted_text = ""
+    from azure.cognitiveservices.vision.computervision.models import OperationStatusCodes
+
+    lines = []
     try:
         cv_client = get_computer_vision_client()
         if not cv_client:
             logging.error("Computer Vision client is not available. Check environment variables.")
             return ""
 
-        # Initiate the read operation (raw=True returns the HTTP response directly)
-        read_response = cv_client.read_in_stream(io.BytesIO(image_bytes), raw=True)
-        operation_location = read_response.headers["Operation-Location"]
-        operation_id = operation_location.split("/")[-1]
-
-        # Poll for the result
-        while True:
-            read_result = cv_client.get_read_result(operation_id)
-            if read_result.status not in [OperationStatusCodes.running, OperationStatusCodes.not_started]:
-                break
-            time.sleep(1)
+        with _computer_vision_slots:
+            # Initiate the read operation (raw=True returns the HTTP response directly)
+            read_response = cv_client.read_in_stream(io.BytesIO(image_bytes), raw=True)
+            operation_location = read_response.headers["Operation-Location"]
+            operation_id = operation_location.split("/")[-1]
+
+            # Poll for the result, quickly at first since most images are read in about a second
+            deadline = time.monotonic() + timeout
+            interval = 0.25
+            while True:
+                read_result = cv_client.get_read_result(operation_id)
+                if read_result.status not in [OperationStatusCodes.running, OperationStatusCodes.not_started]:
+                    break
+                if time.monotonic() + interval > deadline:
+                    logging.error(f"Computer Vision OCR did not finish within {timeout} seconds.")
+                    return ""
+                time.sleep(interval)
+                interval = min(interval * 2, 1.0)
 
         # If the operation is successful, parse out text
         if read_result.status == OperationStatusCodes.succeeded:
             for text_result in read_result.analyze_result.read_results:
-                for line in text_result.lines:
-                    extracted_text += line.text + "\n"
+                lines += [line.text for line in text_result.lines]
 
     except Exception as e:
         logging.error(f"Computer Vision OCR failed: {e}", exc_info=True)
 
-    return extracted_text
+    return "".join(line + "\n" for line in lines)
 
 
-def extract_text_from_docx(file_content: bytes) -> str:
+def extract_text_from_docx(file_content, max_chars: int = EXTRACTION_MAX_CHARS) -> str:
     """
-    Extract text from .docx using python-docx
+    Extract text from .docx, streaming word/document.xml (see services/office_text.py)
     """
-    extracted_text = ""
     try:
-        document = DocxDocument(io.BytesIO(file_content))
-        for para in document.paragraphs:
-            extracted_text += para.text + "\n"
+        return take_chars(iter_docx_text(file_content), max_chars)
     except Exception as e:
         logging.error(f"Error extracting text from .docx file: {e}", exc_info=True)
-    return extracted_text
+        return ""
 
 
-def extract_text_from_xlsx(file_content: bytes) -> str:
+def extract_text_from_xlsx(file_content, max_chars: int = EXTRACTION_MAX_CHARS) -> str:
     """
-    Extract text from .xlsx using openpyxl
+    Extract text from .xlsx using openpyxl in read-only (streaming) mode
     """
-    extracted_text = ""
     try:
-        workbook = openpyxl.load_workbook(io.BytesIO(file_content), data_only=True)
-        for sheet in workbook.worksheets:
-            for row in sheet.iter_rows(values_only=True):
-                row_text = [str(cell) if cell is not None else "" for cell in row]
-                extracted_text += "\t".join(row_text) + "\n"
+        return take_chars(iter_xlsx_text(file_content), max_chars)
     except Exception as e:
         logging.error(f"Error extracting text from .xlsx file: {e}", exc_info=True)
-    return extracted_text
+        return ""
 
 
-def extract_text_from_pptx(file_content: bytes) -> str:
+def extract_text_from_pptx(file_content, max_chars: int = EXTRACTION_MAX_CHARS) -> str:
     """
-    Extract text from .pptx using python-pptx
+    Extract text from .pptx, streaming the slide XML in presentation order
     """
-    extracted_text = ""
     try:
-        presentation = Presentation(io.BytesIO(file_content))
-        for slide in presentation.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    extracted_text += shape.text + "\n"
+        return take_chars(iter_pptx_text(file_content), max_chars)
     except Exception as e:
         logging.error(f"Error extracting text from .pptx file: {e}", exc_info=True)
-    return extracted_text
+        return ""
 
 
-def extract_text_from_txt(file_content: bytes) -> str:
+def extract_text_from_txt(file_content, max_chars: int = EXTRACTION_MAX_CHARS) -> str:
     """
     Extract text from a simple text file
     """
-    return file_content.decode('utf-8', errors='ignore')
+    # A UTF-8 character is at most 4 bytes, so nothing past this can be within the budget
+    limit = max_chars * 4 if max_chars is not None else None
+    if isinstance(file_content, (bytes, bytearray)):
+        data = file_content[:limit]
+    else:
+        file_content.seek(0)
+        data = file_content.read(-1 if limit is None else limit)
+    return data.decode('utf-8', errors='ignore')[:max_chars]
 
 
 # Define a function to check if a file type is supported
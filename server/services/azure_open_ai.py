@@ -4,6 +4,7 @@
 import os
 from dotenv import load_dotenv
 from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+from services.embedding_cache import CacheBackedEmbeddings
 from utils.consts import CONTEXT_LENGTH_LIMIT
 
 """Step 2: Define the Azure OpenAI services"""
@@ -37,7 +38,11 @@ def get_azure_openai_llm():
 
 
 # Define the function to get the Azure OpenAI embeddings model
-def get_azure_openai_embeddings():
+def get_azure_openai_embeddings(cached: bool = True):
+    """
+    Returns the Azure OpenAI embeddings model, wrapped in the shared content-hash
+    cache unless `cached` is False.
+    """
     AOAI_ENDPOINT, AOAI_KEY, AOAI_API_VERSION, AOAI_EMBEDDINGS, _ = get_azure_openai_variables()
 
     embedding_model = AzureOpenAIEmbeddings(
@@ -50,6 +55,13 @@ def get_azure_openai_embeddings():
         chunk_size=10
     )
 
-    return embedding_model
+    if not cached:
+        return embedding_model
+
+    return CacheBackedEmbeddings(
+        embedding_model,
+        model_name=embedding_model.model,
+        batch_size=embedding_model.chunk_size,
+    )
 
 
@@ -0,0 +1,248 @@
+"""
+This module contains the per-session index of documents uploaded to the chat.
+
+An uploaded file is extracted once, split into chunks and stored for its chat session (keyed by
+session id and sha256 of the file) with a time-to-live. On every turn of that session only the
+chunks most similar to the user's message are put in the prompt, so the document stays available
+for follow-up questions without pasting the whole text into each request.
+
+Chunk texts are kept in the `session_documents` MongoDB collection, so any worker can serve the
+session; the chunk vectors are kept in a process-wide TTL cache and come from the shared
+embedding cache, so rebuilding them on another worker does not call Azure OpenAI again. A worker
+checks a session's file hashes against MongoDB at most every `DOCUMENT_INDEX_REFRESH_SECONDS`,
+so a file uploaded through another worker is picked up without a query on every turn.
+"""
+
+"""Step 1: Import necessary modules"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+from cachetools import TTLCache
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from services.azure_mongodb import MongoDBClient
+from utils.consts import (
+    DOCUMENT_CHUNK_OVERLAP,
+    DOCUMENT_CHUNK_SIZE,
+    DOCUMENT_INDEX_COLLECTION,
+    DOCUMENT_INDEX_REFRESH_SECONDS,
+    DOCUMENT_INDEX_MAX_SESSIONS,
+    DOCUMENT_INDEX_TOP_K,
+    DOCUMENT_INDEX_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+"""Step 2: Define the shared index state"""
+# session id -> {file hash: IndexedDocument}, for sessions used recently in this process
+_sessions = TTLCache(maxsize=DOCUMENT_INDEX_MAX_SESSIONS, ttl=DOCUMENT_INDEX_TTL_SECONDS)
+# Sessions checked against MongoDB recently (with or without documents), so turns do not query it
+# every time; kept briefly because a file uploaded through another worker must still be found
+_checked_sessions = TTLCache(maxsize=DOCUMENT_INDEX_MAX_SESSIONS, ttl=DOCUMENT_INDEX_REFRESH_SECONDS)
+_lock = threading.Lock()
+
+
+def clear_document_index_memory():
+    """
+    Empties the in-process tier. The MongoDB tier is left untouched.
+    """
+    with _lock:
+        _sessions.clear()
+        _checked_sessions.clear()
+
+
+class IndexedDocument:
+    """
+    The chunks of one uploaded file and, once a search needs them, their unit-length vectors.
+    """
+
+    def __init__(self, file_hash: str, chunks: list[str], created_at: datetime = None):
+        self.file_hash = file_hash
+        self.chunks = chunks
+        self.created_at = created_at or datetime.utcnow()
+        self.vectors = None
+
+    def ensure_vectors(self, embeddings):
+        if self.vectors is None:
+            vectors = np.asarray(embeddings.embed_documents(self.chunks), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            self.vectors = vectors / np.where(norms == 0, 1, norms)
+        return self.vectors
+
+
+"""Step 3: Define the SessionDocumentIndex class"""
+class SessionDocumentIndex:
+    """
+    Documents shared in chat sessions, searchable by similarity to a message.
+    """
+
+    def __init__(self, embeddings=None, collection=None, top_k: int = DOCUMENT_INDEX_TOP_K):
+        """
+        Initializes the index.
+
+        Args:
+            embeddings (Embeddings, optional): The model used for chunks and messages. Defaults to the
+                cached Azure OpenAI embeddings.
+            collection: The MongoDB collection holding the chunks. Defaults to `session_documents`.
+            top_k (int): The number of chunks returned by `search`.
+        """
+        self._embeddings = embeddings
+        self._collection = collection
+        self.top_k = top_k
+        self._splitter = RecursiveCharacterTextSplitter(
+            chunk_size=DOCUMENT_CHUNK_SIZE,
+            chunk_overlap=DOCUMENT_CHUNK_OVERLAP,
+            length_function=len,
+            is_separator_regex=False,
+        )
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            from services.azure_open_ai import get_azure_openai_embeddings
+            self._embeddings = get_azure_openai_embeddings()
+        return self._embeddings
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+            self._collection = db[DOCUMENT_INDEX_COLLECTION]
+        return self._collection
+
+    def add_document(self, session_id: str, file_hash: str, text: str) -> int:
+        """
+        Chunks a document and adds it to a session. Uploading the same file again only
+        extends its time-to-live.
+
+        Args:
+            session_id (str): The chat session, e.g. "<user_id>-<chat_id>".
+            file_hash (str): sha256 of the uploaded bytes.
+            text (str): The extracted text.
+
+        Returns:
+            int: The number of chunks the document was split into.
+        """
+        documents = self._load(session_id)
+        if file_hash not in documents:
+            chunks = [chunk for chunk in self._splitter.split_text(text) if chunk.strip()]
+            if not chunks:
+                return 0
+            documents[file_hash] = IndexedDocument(file_hash, chunks)
+            with _lock:
+                _sessions[session_id] = documents
+        self._save(session_id, documents[file_hash])
+        return len(documents[file_hash].chunks)
+
+    def search(self, session_id: str, query: str, k: int = None) -> list[str]:
+        """
+        Returns the chunks of a session's documents most similar to `query`, most similar first.
+        Sessions whose documents have at most `k` chunks in total get all of them, in order,
+        without any embedding call.
+
+        Args:
+            session_id (str): The chat session.
+            query (str): The user's message.
+            k (int, optional): The number of chunks. Defaults to `top_k`.
+
+        Returns:
+            list[str]: The chunks; [] if the session has no (unexpired) documents.
+        """
+        k = k or self.top_k
+        documents = list(self._load(session_id).values())
+        if not documents:
+            return []
+        self.touch(session_id)
+        chunks = [chunk for document in documents for chunk in document.chunks]
+        if len(chunks) <= k:
+            return chunks
+
+        vectors = np.vstack([document.ensure_vectors(self.embeddings) for document in documents])
+        query_vector = np.asarray(self.embeddings.embed_query(query or ""), dtype=np.float32)
+        scores = vectors @ (query_vector / (np.linalg.norm(query_vector) or 1))
+        best = np.argpartition(-scores, k - 1)[:k]
+        return [chunks[i] for i in best[np.argsort(-scores[best])]]
+
+    def _load(self, session_id: str) -> dict:
+        with _lock:
+            documents = _sessions.get(session_id)
+            if documents is not None:
+                # Re-inserting restarts the time-to-live of an active session
+                _sessions[session_id] = documents
+            if session_id in _checked_sessions:
+                return documents if documents is not None else {}
+            known = set(documents or {})
+
+        # Only the file hashes are read; chunks are fetched for files this worker has not seen
+        try:
+            now = datetime.utcnow()
+            stored_hashes = {stored["file_hash"] for stored in self.collection.find(
+                {"session_id": session_id, "expires_at": {"$gt": now}}, {"file_hash": 1})}
+            new_documents = [
+                IndexedDocument(stored["file_hash"], stored["chunks"], stored.get("created_at"))
+                for stored in self.collection.find({"session_id": session_id, "file_hash": {"$in": list(stored_hashes - known)}, "expires_at": {"$gt": now}})
+            ] if stored_hashes - known else []
+        except Exception as e:
+            logger.warning(f"Could not load the documents of session {session_id}: {e}")
+            return documents if documents is not None else {}
+
+        with _lock:
+            documents = _sessions.setdefault(session_id, documents if documents is not None else {})
+            # Files that expired in MongoDB are dropped; files added here meanwhile are kept
+            for file_hash in known - stored_hashes:
+                documents.pop(file_hash, None)
+            for document in new_documents:
+                documents.setdefault(document.file_hash, document)
+            _checked_sessions[session_id] = True
+        return documents
+
+    def _save(self, session_id: str, document: IndexedDocument):
+        try:
+            self.collection.update_one(
+                {"_id": f"{session_id}:{document.file_hash}"},
+                {"$set": {
+                    "session_id": session_id,
+                    "file_hash": document.file_hash,
+                    "chunks": document.chunks,
+                    "created_at": document.created_at,
+                    "expires_at": datetime.utcnow() + timedelta(seconds=DOCUMENT_INDEX_TTL_SECONDS),
+                }},
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"Could not store a document of session {session_id}: {e}")
+
+    def touch(self, session_id: str):
+        """
+        Extends the time-to-live of a session's stored documents, e.g. after a turn that used them.
+        """
+        try:
+            self.collection.update_many(
+                {"session_id": session_id},
+                {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=DOCUMENT_INDEX_TTL_SECONDS)}},
+            )
+        except Exception as e:
+            logger.warning(f"Could not extend the documents of session {session_id}: {e}")
+
+
+"""Step 4: Define the shared index"""
+@lru_cache(maxsize=None)
+def get_session_document_index() -> SessionDocumentIndex:
+    """
+    Returns the process-wide session document index.
+    """
+    return SessionDocumentIndex()
+
+
+def format_document_context(chunks: list[str]) -> str:
+    """
+    Builds the system message that carries the chunks selected for a turn.
+    """
+    if not chunks:
+        return ""
+    excerpts = "\n\n---\n\n".join(chunks)
+    return (f"The user has shared documents in this chat. These excerpts are the most relevant to their message:\n\n"
+            f"{excerpts}\n\nPlease use this content to assist the user.")
@@ -0,0 +1,197 @@
+"""
+This module contains a content-hash cache for embedding vectors.
+
+Every consumer of `get_azure_openai_embeddings()` (vector store builds, retrievers,
+document indexes) goes through `CacheBackedEmbeddings`, so a given text is embedded
+at most once per model. Vectors are looked up in a process-wide LRU first and in the
+`embedding_cache` MongoDB collection second; only the remaining misses are sent to
+Azure OpenAI, batched up to the deployment's `chunk_size`.
+"""
+
+"""Step 1: Import necessary modules"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+
+from cachetools import LRUCache
+from langchain_core.embeddings import Embeddings
+from pymongo.errors import BulkWriteError
+
+from services.azure_mongodb import MongoDBClient
+from utils.consts import EMBEDDING_CACHE_COLLECTION, EMBEDDING_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+"""Step 2: Define the shared cache state"""
+# Shared by every CacheBackedEmbeddings instance in the process. Keys include the model
+# name, so vectors from different models never collide.
+_memory_cache = LRUCache(maxsize=EMBEDDING_CACHE_MAX_ENTRIES)
+_in_flight: dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def embedding_cache_key(model: str, text: str) -> str:
+    """
+    Builds the cache key for a text embedded with a given model.
+
+    Args:
+        model (str): The embedding model or deployment name.
+        text (str): The text to embed.
+
+    Returns:
+        str: A key of the form "<model>:<sha256(text)>".
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+def clear_embedding_memory_cache():
+    """
+    Empties the in-process LRU. The MongoDB tier is left untouched.
+    """
+    with _lock:
+        _memory_cache.clear()
+
+
+"""Step 3: Define the CacheBackedEmbeddings class"""
+class CacheBackedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model with a two-tier (memory, MongoDB) content-hash cache.
+
+    Concurrent requests for the same text are coalesced: the first caller embeds it,
+    later callers wait for that result instead of issuing their own request.
+    """
+
+    def __init__(self, underlying_embeddings: Embeddings, model_name: str, batch_size: int = 16, collection=None):
+        """
+        Initializes the cache wrapper.
+
+        Args:
+            underlying_embeddings (Embeddings): The model used for cache misses.
+            model_name (str): The name used to namespace cache keys.
+            batch_size (int): The maximum number of texts sent in a single embedding request.
+            collection: The MongoDB collection backing the cache. Defaults to `embedding_cache`.
+        """
+        self.underlying_embeddings = underlying_embeddings
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size or 1)
+        self._collection = collection
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+            self._collection = db[EMBEDDING_CACHE_COLLECTION]
+        return self._collection
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds a list of texts, only calling the underlying model for cache misses.
+
+        Args:
+            texts (list[str]): The texts to embed.
+
+        Returns:
+            list[list[float]]: One vector per input text, in input order.
+        """
+        keys = [embedding_cache_key(self.model_name, text) for text in texts]
+        vectors = self._get_or_embed(dict(zip(keys, texts)))
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embeds a single query, sharing the cache with `embed_documents`.
+
+        Args:
+            text (str): The query to embed.
+
+        Returns:
+            list[float]: The embedding vector.
+        """
+        return self.embed_documents([text])[0]
+
+    def _get_or_embed(self, texts_by_key: dict[str, str]) -> dict[str, list[float]]:
+        vectors = {}
+
+        # Tier 1: in-process LRU
+        with _lock:
+            for key in texts_by_key:
+                vector = _memory_cache.get(key)
+                if vector is not None:
+                    vectors[key] = vector
+
+        missing = [key for key in texts_by_key if key not in vectors]
+        if not missing:
+            return vectors
+
+        # Tier 2: MongoDB
+        for key, vector in self._load_from_db(missing).items():
+            vectors[key] = vector
+        with _lock:
+            for key in missing:
+                if key in vectors:
+                    _memory_cache[key] = vectors[key]
+
+        missing = [key for key in missing if key not in vectors]
+        if not missing:
+            return vectors
+
+        # Claim the keys nobody else is embedding; wait on the rest
+        owned, waiting = [], {}
+        with _lock:
+            for key in missing:
+                if key in _in_flight:
+                    waiting[key] = _in_flight[key]
+                else:
+                    _in_flight[key] = Future()
+                    owned.append(key)
+
+        try:
+            for start in range(0, len(owned), self.batch_size):
+                batch = owned[start:start + self.batch_size]
+                batch_vectors = self.underlying_embeddings.embed_documents([texts_by_key[key] for key in batch])
+                new_vectors = dict(zip(batch, batch_vectors))
+                self._save_to_db(new_vectors)
+                with _lock:
+                    for key, vector in new_vectors.items():
+                        _memory_cache[key] = vector
+                        _in_flight.pop(key).set_result(vector)
+                vectors.update(new_vectors)
+        except Exception as e:
+            with _lock:
+                for key in owned:
+                    future = _in_flight.pop(key, None)
+                    if future is not None:
+                        future.set_exception(e)
+            raise
+
+        for key, future in waiting.items():
+            vectors[key] = future.result()
+
+        return vectors
+
+    def _load_from_db(self, keys: list[str]) -> dict[str, list[float]]:
+        try:
+            cursor = self.collection.find({"_id": {"$in": keys}}, {"embedding": 1})
+            return {doc["_id"]: doc["embedding"] for doc in cursor}
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed, falling back to the model: {e}")
+            return {}
+
+    def _save_to_db(self, vectors: dict[str, list[float]]):
+        if not vectors:
+            return
+        now = datetime.utcnow()
+        documents = [
+            {"_id": key, "model": self.model_name, "embedding": vector, "created_at": now}
+            for key, vector in vectors.items()
+        ]
+        try:
+            self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError:
+            # Another worker stored some of these vectors first; the duplicates are identical.
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to persist {len(vectors)} embedding(s) to the cache: {e}")
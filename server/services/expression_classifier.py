@@ -0,0 +1,222 @@
+"""
+This module picks the avatar's facial expression and animation for an answer without calling the LLM.
+
+Each mood is scored twice:
+- a small lexicon of cue words and emoji (negated cues such as "not sad" are skipped), and
+- the cosine similarity between the answer's word counts and the centroid of a few example answers.
+A plain "neutral" mood has a fixed score that the others must beat. `confidence` compares the winner with
+the runner-up, and callers can fall back to the LLM when it is below EXPRESSION_MIN_CONFIDENCE.
+"""
+
+"""Step 1: Import necessary modules"""
+import math
+import re
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+
+"""Step 2: Define the options and moods"""
+FACIAL_EXPRESSIONS = ["smile", "sad", "angry", "surprised", "funnyFace", "default"]
+ANIMATIONS = ["Talking_0", "Talking_1", "Talking_2", "Crying", "Laughing", "Rumba", "Idle", "Terrified", "Angry"]
+
+# mood -> (facial expression, animation); neutral answers rotate through the talking animations
+MOOD_OUTPUTS = {
+    "happy": ("smile", "Talking_1"),
+    "funny": ("funnyFace", "Laughing"),
+    "celebrate": ("smile", "Rumba"),
+    "sad": ("sad", "Talking_0"),
+    "grief": ("sad", "Crying"),
+    "angry": ("angry", "Angry"),
+    "surprised": ("surprised", "Talking_2"),
+    "scared": ("surprised", "Terrified"),
+    "neutral": ("default", None),
+}
+NEUTRAL_ANIMATIONS = ("Talking_0", "Talking_1", "Talking_2")
+
+_LEXICON = {
+    "happy": {
+        "glad": 1.0, "happy": 1.0, "great": 0.8, "awesome": 1.0, "wonderful": 1.0, "excellent": 1.0, "nice": 0.6,
+        "fantastic": 1.0, "love": 0.8, "enjoy": 0.8, "fun": 0.6, "excited": 1.0, "proud": 1.0, "welcome": 0.6,
+        "amazing": 1.0, "good": 0.4, "well": 0.2, "done": 0.2, "keep": 0.2, "progress": 0.5, "perfect": 0.8,
+        "thanks": 0.6, "thank": 0.6, "pleasure": 0.8, "delighted": 1.0, "cheerful": 1.0, "hope": 0.4,
+        "😊": 1.5, "🙂": 1.0, "😄": 1.5, "👍": 1.0, "🌟": 1.0, "✨": 0.8, "💪": 1.0, ":)": 1.0,
+    },
+    "funny": {
+        "haha": 2.0, "hahaha": 2.0, "lol": 2.0, "joke": 1.5, "jokes": 1.5, "funny": 1.5, "hilarious": 2.0,
+        "pun": 1.5, "laugh": 1.5, "laughing": 1.5, "meme": 1.2, "memes": 1.2, "silly": 1.0, "kidding": 1.2,
+        "giggle": 1.5, "punchline": 1.5, "😂": 2.5, "🤣": 2.5, "😆": 2.0, "😜": 1.5, "😝": 1.5, ":d": 1.5,
+    },
+    "celebrate": {
+        "congratulations": 2.0, "congrats": 2.0, "celebrate": 2.0, "celebration": 2.0, "hooray": 2.0,
+        "woohoo": 2.0, "yay": 1.5, "victory": 1.5, "passed": 1.0, "aced": 1.5, "achievement": 1.0,
+        "milestone": 1.0, "dance": 1.5, "party": 1.5, "winner": 1.5, "won": 1.0,
+        "🎉": 2.5, "🥳": 2.5, "🏆": 2.0, "🎊": 2.5, "💃": 2.0, "🕺": 2.0,
+    },
+    "sad": {
+        "sorry": 1.2, "sad": 1.5, "unfortunately": 1.2, "difficult": 0.6, "hard": 0.4, "tough": 0.8,
+        "struggling": 1.0, "struggle": 0.8, "disappointed": 1.2, "disappointing": 1.2, "lonely": 1.5,
+        "upset": 1.2, "hurt": 1.0, "miss": 0.6, "failed": 1.0, "fail": 0.8, "regret": 1.2, "stress": 0.8,
+        "stressed": 1.0, "overwhelmed": 1.2, "anxious": 1.0, "down": 0.4, "unhappy": 1.5,
+        "😢": 2.0, "😞": 2.0, "😔": 2.0, "🙁": 1.5, ":(": 1.5,
+    },
+    "grief": {
+        "heartbroken": 2.0, "devastated": 2.0, "grief": 2.0, "grieving": 2.0, "mourning": 2.0, "tragic": 1.5,
+        "tragedy": 1.5, "passed away": 2.0, "condolences": 2.0, "loss": 1.0, "cry": 1.5, "crying": 1.5,
+        "tears": 1.5, "😭": 2.5, "💔": 2.0,
+    },
+    "angry": {
+        "angry": 1.5, "furious": 2.0, "outrageous": 1.5, "unacceptable": 1.5, "annoyed": 1.2, "annoying": 1.2,
+        "frustrated": 1.2, "frustrating": 1.2, "hate": 1.2, "mad": 1.0, "rage": 1.5, "ridiculous": 1.0,
+        "stop": 0.4, "enough": 0.4, "unfair": 1.2, "😠": 2.0, "😡": 2.5, "🤬": 2.5,
+    },
+    "surprised": {
+        "wow": 1.5, "whoa": 1.5, "surprising": 1.2, "surprised": 1.2, "unbelievable": 1.2, "incredible": 1.0,
+        "really": 0.3, "guess": 0.4, "unexpected": 1.2, "shocking": 1.2, "omg": 1.5, "believe": 0.4,
+        "fact": 0.3, "did you know": 1.5, "😮": 2.0, "😲": 2.0, "🤯": 2.0, "😯": 2.0,
+    },
+    "scared": {
+        "scary": 1.5, "scared": 1.5, "afraid": 1.5, "terrified": 2.0, "terrifying": 2.0, "frightening": 1.5,
+        "horror": 1.5, "panic": 1.2, "danger": 1.0, "dangerous": 1.0, "fear": 1.2, "nightmare": 1.5,
+        "spooky": 1.5, "creepy": 1.2, "yikes": 1.5, "😱": 2.5, "😨": 2.0, "😰": 2.0,
+    },
+}
+
+_EXAMPLES = {
+    "happy": [
+        "I'm so glad to hear that, you are making great progress with your studies!",
+        "That's a wonderful idea, I'd love to help you with it.",
+        "Great job on finishing the assignment, keep up the good work!",
+    ],
+    "funny": [
+        "Haha, here's a joke for you: why did the student eat his homework? Because the teacher said it was a piece of cake!",
+        "That meme is hilarious, I can't stop laughing.",
+        "Just kidding! But seriously, that pun was terrible in the best way.",
+    ],
+    "celebrate": [
+        "Congratulations on passing your exam, let's celebrate this achievement!",
+        "You aced it! Time for a victory dance!",
+        "Hooray, you reached a huge milestone, that calls for a party!",
+    ],
+    "sad": [
+        "I'm sorry to hear that you're feeling down, exams can be really stressful.",
+        "Unfortunately that didn't go as planned, but it's okay to feel disappointed.",
+        "It sounds like you're struggling and feeling overwhelmed right now.",
+    ],
+    "grief": [
+        "I'm so sorry for your loss, my condolences to you and your family.",
+        "Losing someone you love is heartbreaking, it's okay to cry and grieve.",
+    ],
+    "angry": [
+        "That is completely unfair and unacceptable, I understand why you're angry.",
+        "It's frustrating when people treat you that way, it makes me mad too.",
+    ],
+    "surprised": [
+        "Wow, did you know that octopuses have three hearts? Incredible!",
+        "Whoa, that's a surprising result, I really didn't expect that.",
+    ],
+    "scared": [
+        "That sounds really scary, being afraid before a big exam is normal.",
+        "Yikes, that horror story is terrifying!",
+    ],
+}
+
+_NEGATIONS = {"not", "no", "never", "don't", "dont", "isn't", "isnt", "aren't", "wasn't", "without", "nothing"}
+_TOKEN_PATTERN = re.compile(r"[a-z']+|:\)|:\(|:d|[\U0001F300-\U0001FAFF☀-➿]")
+NEUTRAL_SCORE = 1.0  # what a mood must beat to be chosen over a plain talking animation
+CENTROID_WEIGHT = 3.0  # a perfect match with the example answers counts as three strong cue words
+
+
+"""Step 3: Define the scoring helpers"""
+def tokenize(text: str) -> list[str]:
+    """
+    Splits text into lowercase words, a few emoticons and emoji.
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _build_centroids() -> dict:
+    # Only words that carry mood are kept, so function words do not pull every answer towards every mood
+    cue_words = {word for words in _LEXICON.values() for word in words}
+    centroids = {}
+    for mood, examples in _EXAMPLES.items():
+        centroid = Counter()
+        for example in examples:
+            tokens = Counter(token for token in tokenize(example) if token in cue_words or len(token) > 4)
+            norm = math.sqrt(sum(count * count for count in tokens.values())) or 1.0
+            for token, count in tokens.items():
+                centroid[token] += count / norm / len(examples)
+        norm = math.sqrt(sum(value * value for value in centroid.values()))
+        centroids[mood] = {token: value / norm for token, value in centroid.items()}
+    return centroids
+
+
+def _index_by_token(weights: dict) -> dict:
+    # mood -> token -> weight becomes token -> [(mood, weight)], so each token is looked up once
+    index = {}
+    for mood, tokens in weights.items():
+        for token, weight in tokens.items():
+            index.setdefault(token, []).append((mood, weight))
+    return index
+
+
+_CUES = _index_by_token({mood: {cue: w for cue, w in cues.items() if " " not in cue} for mood, cues in _LEXICON.items()})
+_PHRASES = [(mood, phrase, weight) for mood, cues in _LEXICON.items() for phrase, weight in cues.items() if " " in phrase]
+_CENTROIDS = _index_by_token(_build_centroids())
+
+
+"""Step 4: Define the classifier"""
+@dataclass
+class ExpressionPrediction:
+    facial_expression: str
+    animation: str
+    mood: str
+    confidence: float
+
+    def to_dict(self) -> dict:
+        return {"facial_expression": self.facial_expression, "animation": self.animation}
+
+
+def classify_expression(text: str) -> ExpressionPrediction:
+    """
+    Picks a facial expression and animation for an answer.
+
+    Args:
+        text (str): The AI's answer.
+
+    Returns:
+        ExpressionPrediction: The chosen pair, the mood behind it and the confidence (0..1).
+    """
+    tokens = tokenize(text or "")
+    lowered = (text or "").lower()
+
+    lexicon_scores = dict.fromkeys(_LEXICON, 0.0)
+    for index, token in enumerate(tokens):
+        if token in _CUES and not any(previous in _NEGATIONS for previous in tokens[max(0, index - 2):index]):
+            for mood, weight in _CUES[token]:
+                lexicon_scores[mood] += weight
+    for mood, phrase, weight in _PHRASES:
+        if phrase in lowered:
+            lexicon_scores[mood] += weight
+
+    # Cosine similarity with each (unit length) centroid
+    counts = Counter(tokens)
+    norm = math.sqrt(sum(count * count for count in counts.values())) or 1.0
+    similarities = dict.fromkeys(_LEXICON, 0.0)
+    for token, count in counts.items():
+        for mood, value in _CENTROIDS.get(token, ()):
+            similarities[mood] += count * value / norm
+
+    # Long answers collect more cue words; scale so one or two cues decide a short reply and a long one alike
+    length_scale = 1.0 / math.sqrt(max(1.0, len(tokens) / 20.0))
+    scores = {mood: lexicon_scores[mood] * length_scale + CENTROID_WEIGHT * similarities[mood] for mood in _LEXICON}
+    scores["neutral"] = NEUTRAL_SCORE
+
+    # Confidence is how clearly the winner beats the runner-up (a softmax over the two)
+    mood, runner_up = sorted(scores, key=scores.get, reverse=True)[:2]
+    confidence = 1.0 / (1.0 + math.exp(scores[runner_up] - scores[mood]))
+
+    facial_expression, animation = MOOD_OUTPUTS[mood]
+    if animation is None:
+        # Stable per answer, so a re-rendered turn does not switch animation
+        animation = NEUTRAL_ANIMATIONS[zlib.crc32(lowered.encode("utf-8")) % len(NEUTRAL_ANIMATIONS)]
+    return ExpressionPrediction(facial_expression, animation, mood, round(confidence, 3))
@@ -0,0 +1,196 @@
+"""
+This module contains a content-hash cache for text extracted from uploaded files.
+
+Students upload the same syllabus or slide deck to the chat and quiz routes, often several
+times. `extract_text_from_file` keys each result by sha256(file bytes) and MIME type and looks
+it up in a process-wide LRU first and in the `extraction_cache` MongoDB collection second, so a
+repeat upload costs a hash instead of a Form Recognizer or OCR round trip.
+"""
+
+"""Step 1: Import necessary modules"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from functools import lru_cache
+
+from cachetools import LRUCache
+from pymongo.errors import DuplicateKeyError
+
+from services.azure_mongodb import MongoDBClient
+from utils.consts import (
+    EXTRACTION_CACHE_COLLECTION,
+    EXTRACTION_CACHE_MAX_CHARS,
+    EXTRACTION_CACHE_MAX_DB_CHARS,
+    EXTRACTION_CACHE_VERSION,
+)
+
+logger = logging.getLogger(__name__)
+
+"""Step 2: Define the shared cache state"""
+# Sized by the number of characters held, since one document can be much larger than another
+_memory_cache = LRUCache(maxsize=EXTRACTION_CACHE_MAX_CHARS, getsizeof=lambda text: max(1, len(text)))
+_in_flight: dict[str, Future] = {}
+_lock = threading.Lock()
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def content_sha256(file_content) -> str:
+    """
+    Returns the hex sha256 of an upload given as bytes or as a seekable file, which is read in
+    blocks and rewound.
+    """
+    if isinstance(file_content, (bytes, bytearray)):
+        return hashlib.sha256(file_content).hexdigest()
+    digest = hashlib.sha256()
+    file_content.seek(0)
+    for block in iter(lambda: file_content.read(HASH_BLOCK_BYTES), b""):
+        digest.update(block)
+    file_content.seek(0)
+    return digest.hexdigest()
+
+
+def extraction_cache_key(file_content, file_mime_type: str) -> str:
+    """
+    Builds the cache key for a file.
+
+    Args:
+        file_content (bytes | file-like): The upload.
+        file_mime_type (str): The detected MIME type; the same bytes may be read differently per type.
+
+    Returns:
+        str: A key of the form "v<version>:<mime type>:<sha256(bytes)>". The version changes when
+             the extractors do, so stale results are not served.
+    """
+    return f"v{EXTRACTION_CACHE_VERSION}:{file_mime_type}:{content_sha256(file_content)}"
+
+
+def clear_extraction_memory_cache():
+    """
+    Empties the in-process LRU. The MongoDB tier is left untouched.
+    """
+    with _lock:
+        _memory_cache.clear()
+
+
+"""Step 3: Define the ExtractionCache class"""
+class ExtractionCache:
+    """
+    A two-tier (memory, MongoDB) cache in front of a text extractor.
+
+    Concurrent uploads of the same file are coalesced: the first caller extracts it, later
+    callers wait for that result. Empty results are not cached, since they are usually a
+    failed service call rather than a file without text.
+    """
+
+    def __init__(self, collection=None):
+        """
+        Initializes the cache.
+
+        Args:
+            collection: The MongoDB collection backing the cache. Defaults to `extraction_cache`.
+        """
+        self._collection = collection
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+            self._collection = db[EXTRACTION_CACHE_COLLECTION]
+        return self._collection
+
+    def get_or_extract(self, file_content, file_mime_type: str, extract) -> str:
+        """
+        Returns the text of a file, calling `extract` only on a cache miss.
+
+        Args:
+            file_content (bytes | file-like): The upload.
+            file_mime_type (str): The detected MIME type.
+            extract (callable): Turns (file_content, file_mime_type) into text.
+
+        Returns:
+            str: The extracted text.
+        """
+        key = extraction_cache_key(file_content, file_mime_type)
+
+        # Tier 1: in-process LRU
+        with _lock:
+            text = _memory_cache.get(key)
+        if text is not None:
+            self.hits += 1
+            return text
+
+        # Tier 2: MongoDB
+        text = self._load_from_db(key)
+        if text is not None:
+            self.hits += 1
+            self._remember(key, text)
+            return text
+
+        # Claim the key, or wait for the caller already extracting this file
+        with _lock:
+            future = _in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = _in_flight[key] = Future()
+        if not owner:
+            self.hits += 1
+            return future.result()
+
+        self.misses += 1
+        try:
+            text = extract(file_content, file_mime_type)
+        except Exception as e:
+            with _lock:
+                _in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        if text and text.strip():
+            self._remember(key, text)
+            self._save_to_db(key, file_mime_type, text)
+        with _lock:
+            _in_flight.pop(key, None)
+        future.set_result(text)
+        return text
+
+    @staticmethod
+    def _remember(key: str, text: str):
+        with _lock:
+            try:
+                _memory_cache[key] = text
+            except ValueError:
+                # Larger than the whole memory tier; MongoDB still has it
+                pass
+
+    def _load_from_db(self, key: str):
+        try:
+            document = self.collection.find_one({"_id": key}, {"text": 1})
+            return document["text"] if document else None
+        except Exception as e:
+            logger.warning(f"Extraction cache lookup failed, extracting again: {e}")
+            return None
+
+    def _save_to_db(self, key: str, file_mime_type: str, text: str):
+        if len(text) > EXTRACTION_CACHE_MAX_DB_CHARS:
+            # MongoDB documents are limited to 16 MB
+            return
+        try:
+            self.collection.insert_one({"_id": key, "mime_type": file_mime_type, "text": text, "created_at": datetime.utcnow()})
+        except DuplicateKeyError:
+            # Another worker stored it first; the text is identical.
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to persist extracted text to the cache: {e}")
+
+
+"""Step 4: Define the shared cache"""
+@lru_cache(maxsize=None)
+def get_extraction_cache() -> ExtractionCache:
+    """
+    Returns the process-wide extraction cache.
+    """
+    return ExtractionCache()
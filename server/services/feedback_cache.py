@@ -0,0 +1,182 @@
+"""
+This module contains a cache for the feedback written for wrong quiz answers.
+
+Students who share or retake a quiz tend to make the same mistakes, and the feedback for a given
+wrong answer does not depend on who gave it. `submit_answers` therefore keys each explanation by
+the question (a hash of its text and correct answer, so a question reused in another quiz still
+matches), the normalized wrong answer and the feedback language. Entries are looked up in a
+process-wide TTL cache first and in the `feedback_cache` MongoDB collection second, and expire
+from both after `QUIZ_FEEDBACK_CACHE_TTL_SECONDS`.
+"""
+
+"""Step 1: Import necessary modules"""
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from cachetools import TTLCache
+from pymongo.errors import BulkWriteError
+
+from services.azure_mongodb import MongoDBClient
+from utils.consts import (
+    QUIZ_FEEDBACK_CACHE_COLLECTION,
+    QUIZ_FEEDBACK_CACHE_MAX_ENTRIES,
+    QUIZ_FEEDBACK_CACHE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+"""Step 2: Define the shared cache state"""
+_memory_cache = TTLCache(maxsize=QUIZ_FEEDBACK_CACHE_MAX_ENTRIES, ttl=QUIZ_FEEDBACK_CACHE_TTL_SECONDS)
+_lock = threading.Lock()
+_TRAILING_PUNCTUATION = " .!?;:,\"'"
+
+
+def normalize_answer(answer: str) -> str:
+    """
+    Folds the differences that do not change an answer: case, Unicode form, repeated
+    whitespace and trailing punctuation.
+    """
+    answer = unicodedata.normalize("NFKC", answer or "").casefold()
+    return re.sub(r"\s+", " ", answer).strip(_TRAILING_PUNCTUATION)
+
+
+def feedback_cache_key(question: str, correct_answer: str, user_answer: str, language_name: str) -> str:
+    """
+    Builds the cache key for the feedback on one wrong answer.
+
+    Returns:
+        str: sha256 of the question text, its correct answer, the normalized wrong answer and the language.
+    """
+    parts = [question.strip(), correct_answer.strip(), normalize_answer(user_answer), language_name]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def clear_feedback_memory_cache():
+    """
+    Empties the in-process tier. The MongoDB tier is left untouched.
+    """
+    with _lock:
+        _memory_cache.clear()
+
+
+"""Step 3: Define the FeedbackCache class"""
+class FeedbackCache:
+    """
+    A two-tier (memory, MongoDB) cache of feedback texts, with a time-to-live.
+    """
+
+    def __init__(self, collection=None):
+        """
+        Initializes the cache.
+
+        Args:
+            collection: The MongoDB collection backing the cache. Defaults to `feedback_cache`.
+        """
+        self._collection = collection
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+            self._collection = db[QUIZ_FEEDBACK_CACHE_COLLECTION]
+        return self._collection
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @staticmethod
+    def _key(mistake: dict, language_name: str) -> str:
+        return feedback_cache_key(mistake["question"], mistake["correct_answer"], mistake["user_answer"], language_name)
+
+    def get_many(self, mistakes: list[dict], language_name: str) -> dict:
+        """
+        Looks up the feedback for several wrong answers.
+
+        Args:
+            mistakes (list[dict]): One dict per wrong answer with question_id, question, user_answer
+                                   and correct_answer.
+            language_name (str): The language of the feedback.
+
+        Returns:
+            dict: question_id -> cached feedback, for the answers found in the cache.
+        """
+        keys = {mistake["question_id"]: self._key(mistake, language_name) for mistake in mistakes}
+        found = {}
+
+        # Tier 1: in-process TTL cache
+        with _lock:
+            for key in set(keys.values()):
+                if key in _memory_cache:
+                    found[key] = _memory_cache[key]
+
+        # Tier 2: MongoDB, for the keys still missing
+        missing = [key for key in set(keys.values()) if key not in found]
+        if missing:
+            try:
+                now = datetime.utcnow()
+                for document in self.collection.find({"_id": {"$in": missing}, "expires_at": {"$gt": now}}, {"feedback": 1}):
+                    found[document["_id"]] = document["feedback"]
+                    self._remember(document["_id"], document["feedback"])
+            except Exception as e:
+                logger.warning(f"Feedback cache lookup failed, generating again: {e}")
+
+        feedback = {question_id: found[key] for question_id, key in keys.items() if key in found}
+        self.hits += len(feedback)
+        self.misses += len(keys) - len(feedback)
+        logger.info(f"Feedback cache: {len(feedback)}/{len(keys)} hits (hit rate {self.hit_rate:.0%} over {self.hits + self.misses} lookups)")
+        return feedback
+
+    def put_many(self, mistakes: list[dict], feedback: dict, language_name: str, skip: tuple = ()):
+        """
+        Stores the feedback generated for several wrong answers.
+
+        Args:
+            mistakes (list[dict]): The wrong answers, as for `get_many`.
+            feedback (dict): question_id -> feedback text.
+            language_name (str): The language of the feedback.
+            skip (tuple): Texts that are not worth caching, e.g. the placeholder used when generation failed.
+        """
+        entries = {}
+        for mistake in mistakes:
+            text = feedback.get(mistake["question_id"])
+            if text and text not in skip:
+                entries[self._key(mistake, language_name)] = text
+        if not entries:
+            return
+
+        for key, text in entries.items():
+            self._remember(key, text)
+        expires_at = datetime.utcnow() + timedelta(seconds=QUIZ_FEEDBACK_CACHE_TTL_SECONDS)
+        try:
+            self.collection.insert_many(
+                [{"_id": key, "feedback": text, "expires_at": expires_at} for key, text in entries.items()],
+                ordered=False,
+            )
+        except BulkWriteError:
+            # Another worker stored some of these first (or they expired and are not removed yet)
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to persist quiz feedback to the cache: {e}")
+
+    @staticmethod
+    def _remember(key: str, text: str):
+        with _lock:
+            _memory_cache[key] = text
+
+
+"""Step 4: Define the shared cache"""
+@lru_cache(maxsize=None)
+def get_feedback_cache() -> FeedbackCache:
+    """
+    Returns the process-wide feedback cache.
+    """
+    return FeedbackCache()
@@ -0,0 +1,359 @@
+"""
+This module contains the lip-sync engines used by the avatar.
+
+Both engines return {"METADATA": {...}, "MOUTH_CUES": [...]} with Rhubarb's mouth shapes:
+    A  closed (P, B, M)          E  slightly rounded (AO, ER)
+    B  slightly open (most       F  puckered (UW, OW, W)
+       consonants, EE)           G  teeth on lip (F, V)
+    C  open (EH, AE)             H  tongue up (L)
+    D  wide open (AA)            X  idle / silence
+
+- "text": estimates the cues in-process from the spoken text and the audio duration, or from
+  word timings when they are known. It takes milliseconds and spawns no process.
+- "rhubarb": runs the Rhubarb Lip Sync binary on a WAV file.
+
+The engine is chosen with the LIPSYNC_ENGINE environment variable (default "rhubarb"); see
+utils/lipsync_benchmark.py to compare the two on your own recordings before switching.
+"""
+
+"""Step 1: Import necessary modules"""
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import wave
+
+from utils.consts import LIPSYNC_MIN_CUE_SECONDS, LIPSYNC_CHARS_PER_SECOND
+
+logger = logging.getLogger(__name__)
+
+LIPSYNC_ENGINES = ("text", "rhubarb")
+
+
+def empty_lipsync() -> dict:
+    """
+    Returns the structure sent when no lip-sync data could be generated.
+    """
+    return {"METADATA": {}, "MOUTH_CUES": {}}
+
+"""Step 2: Define the text-to-viseme rules"""
+# Longest match first. Values are (mouth shape, relative length).
+_GRAPHEME_VISEMES = {
+    # vowel digraphs
+    "ee": ("B", 1.3), "ea": ("B", 1.3), "ie": ("B", 1.2), "ey": ("B", 1.2),
+    "oo": ("F", 1.3), "ou": ("F", 1.3), "ow": ("F", 1.3), "oa": ("F", 1.3), "ew": ("F", 1.2),
+    "ar": ("D", 1.3), "ah": ("D", 1.2), "au": ("E", 1.3), "aw": ("E", 1.3),
+    "er": ("E", 1.2), "ir": ("E", 1.2), "ur": ("E", 1.2), "or": ("E", 1.3), "oi": ("E", 1.3),
+    "ai": ("C", 1.3), "ay": ("C", 1.3),
+    # consonant digraphs
+    "th": ("B", 0.7), "sh": ("B", 0.8), "ch": ("B", 0.8), "ph": ("G", 0.7), "wh": ("F", 0.7),
+    "ng": ("B", 0.6), "ck": ("B", 0.6), "qu": ("F", 0.9),
+    # vowels
+    "a": ("C", 1.0), "e": ("C", 0.9), "i": ("B", 0.9), "o": ("E", 1.0), "u": ("C", 0.9), "y": ("B", 0.7),
+    # consonants
+    "p": ("A", 0.6), "b": ("A", 0.6), "m": ("A", 0.7),
+    "f": ("G", 0.7), "v": ("G", 0.7),
+    "w": ("F", 0.7),
+    "l": ("H", 0.7),
+    "r": ("E", 0.6),
+}
+_CONSONANT = ("B", 0.6)
+_OTHER_SCRIPT = ("C", 0.9, "B", 0.6)  # letters we have no rules for: open, then close
+_PAUSES = {",": 1.5, ";": 1.5, ":": 1.5, ".": 2.5, "!": 2.5, "?": 2.5, "\n": 2.5}
+_MAX_GRAPHEME = max(len(grapheme) for grapheme in _GRAPHEME_VISEMES)
+
+
+def text_to_visemes(text: str) -> list[tuple[str, float]]:
+    """
+    Turns text into a sequence of (mouth shape, relative length) using spelling rules.
+
+    Args:
+        text (str): The spoken text.
+
+    Returns:
+        list: (shape, weight) pairs; pauses are ("X", weight).
+    """
+    visemes = []
+    text = text.lower()
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char in _PAUSES:
+            visemes.append(("X", _PAUSES[char]))
+            i += 1
+            continue
+        if char.isspace() or not char.isalnum():
+            i += 1
+            continue
+        for size in range(_MAX_GRAPHEME, 0, -1):
+            grapheme = text[i:i + size]
+            if grapheme in _GRAPHEME_VISEMES:
+                visemes.append(_GRAPHEME_VISEMES[grapheme])
+                i += size
+                break
+        else:
+            if char.isascii():
+                # Digits are read as words; other ASCII letters are plain consonants
+                visemes.extend([("C", 0.9), ("B", 0.6)] if char.isdigit() else [_CONSONANT])
+            else:
+                visemes.extend([_OTHER_SCRIPT[:2], _OTHER_SCRIPT[2:]])
+            i += 1
+    return visemes
+
+
+"""Step 3: Define the text engine"""
+def _place(visemes: list[tuple[str, float]], start: float, end: float) -> list[dict]:
+    total_weight = sum(weight for _, weight in visemes)
+    if not visemes or total_weight <= 0 or end <= start:
+        return []
+    scale = (end - start) / total_weight
+    cues, position = [], start
+    for shape, weight in visemes:
+        cues.append({"start": position, "end": position + weight * scale, "value": shape})
+        position += weight * scale
+    return cues
+
+
+def _normalize(cues: list[dict], duration: float, min_cue: float) -> list[dict]:
+    """
+    Fills gaps with X, merges repeated shapes, folds too-short cues into their neighbour and
+    rounds to Rhubarb's two decimals.
+    """
+    filled, position = [], 0.0
+    for cue in sorted(cues, key=lambda c: c["start"]):
+        if cue["start"] > position + 1e-6:
+            filled.append({"start": position, "end": cue["start"], "value": "X"})
+        filled.append(cue)
+        position = max(position, cue["end"])
+    if duration > position + 1e-6:
+        filled.append({"start": position, "end": duration, "value": "X"})
+
+    merged = []
+    for cue in filled:
+        if merged and (merged[-1]["value"] == cue["value"] or cue["end"] - cue["start"] < min_cue):
+            merged[-1]["end"] = cue["end"]
+        else:
+            merged.append(dict(cue))
+
+    rounded = []
+    for cue in merged:
+        start, end = round(cue["start"], 2), round(cue["end"], 2)
+        if end <= start:
+            continue
+        if rounded and rounded[-1]["value"] == cue["value"]:
+            rounded[-1]["end"] = end
+        else:
+            rounded.append({"start": start, "end": end, "value": cue["value"]})
+    return rounded
+
+
+def estimate_mouth_cues(text: str, duration: float, word_timings: list[dict] = None, min_cue: float = LIPSYNC_MIN_CUE_SECONDS) -> list[dict]:
+    """
+    Estimates Rhubarb-style mouth cues for spoken text.
+
+    Args:
+        text (str): The spoken text.
+        duration (float): The audio duration in seconds.
+        word_timings (list, optional): [{"text", "offset", "duration"}] in seconds, e.g. from the Azure
+            Speech word-boundary events. When given, each word's shapes are placed inside its own span.
+        min_cue (float): The shortest cue kept, in seconds.
+
+    Returns:
+        list: [{"start", "end", "value"}] covering 0..duration.
+    """
+    if duration <= 0:
+        return []
+
+    if word_timings:
+        cues = []
+        for word in word_timings:
+            start = max(0.0, float(word["offset"]))
+            end = min(duration, start + float(word["duration"]))
+            cues.extend(_place(text_to_visemes(word["text"]), start, end))
+        return _normalize(cues, duration, min_cue)
+
+    # Without timings, leave a short lead-in and the synthesizer's trailing silence idle
+    lead, tail = (0.05, 0.15) if duration > 0.5 else (0.0, 0.0)
+    return _normalize(_place(text_to_visemes(text), lead, duration - tail), duration, min_cue)
+
+
+"""Step 4: Define the audio duration readers"""
+_MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],  # MPEG-1 layer III
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],      # MPEG-2/2.5 layer III
+}
+
+
+def _mp3_duration(path: str):
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.read(10)
+        offset = 0
+        if header[:3] == b"ID3":
+            offset = 10 + ((header[6] & 0x7F) << 21 | (header[7] & 0x7F) << 14 | (header[8] & 0x7F) << 7 | (header[9] & 0x7F))
+        f.seek(offset)
+        data = f.read(4096)
+    for i in range(len(data) - 3):
+        if data[i] == 0xFF and data[i + 1] & 0xE0 == 0xE0:
+            version = 1 if (data[i + 1] >> 3) & 0x03 == 0x03 else 2
+            bitrate = _MP3_BITRATES[version][(data[i + 2] >> 4) & 0x0F]
+            if bitrate:
+                # Constant bitrate, as produced by the synthesizer
+                return (size - offset - i) * 8 / (bitrate * 1000)
+    return None
+
+
+def _ogg_duration(path: str):
+    with open(path, "rb") as f:
+        f.seek(max(0, os.path.getsize(path) - 65536))
+        data = f.read()
+    page = data.rfind(b"OggS")
+    if page < 0 or page + 14 > len(data):
+        return None
+    granule = int.from_bytes(data[page + 6:page + 14], "little")
+    # Opus always counts granules at 48 kHz
+    return granule / 48000
+
+
+def audio_duration(path: str):
+    """
+    Returns the duration of a generated audio file in seconds, or None if it cannot be read.
+    Supports WAV, constant-bitrate MP3 and Ogg Opus.
+    """
+    try:
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".wav":
+            with wave.open(path, "rb") as wav_file:
+                return wav_file.getnframes() / float(wav_file.getframerate())
+        if extension == ".mp3":
+            return _mp3_duration(path)
+        if extension == ".ogg":
+            return _ogg_duration(path)
+    except Exception as e:
+        logger.warning(f"Could not read the duration of {path}: {e}")
+    return None
+
+
+def text_lipsync(text: str, audio_path: str = None, duration: float = None, word_timings: list[dict] = None) -> dict:
+    """
+    Builds lip-sync data with the in-process text engine.
+
+    Args:
+        text (str): The spoken text.
+        audio_path (str, optional): The audio file, used for its duration.
+        duration (float, optional): The duration in seconds, if already known.
+        word_timings (list, optional): See `estimate_mouth_cues`.
+
+    Returns:
+        dict: {"METADATA": {"soundFile", "duration"}, "MOUTH_CUES": [...]}.
+    """
+    if duration is None and audio_path:
+        duration = audio_duration(audio_path)
+    if duration is None:
+        # No audio to measure; estimate from a typical speaking rate
+        duration = max(0.5, len(text) / LIPSYNC_CHARS_PER_SECOND)
+
+    return {
+        "METADATA": {"soundFile": audio_path or "", "duration": round(duration, 2)},
+        "MOUTH_CUES": estimate_mouth_cues(text, duration, word_timings),
+    }
+
+
+"""Step 5: Define the Rhubarb engine"""
+def get_rhubarb_path() -> str:
+    """
+    Returns the Rhubarb executable: RHUBARB_PATH, the bundled build for this platform, or `rhubarb` on the PATH.
+    """
+    rhubarb_path = os.getenv('RHUBARB_PATH')
+    if rhubarb_path:
+        return rhubarb_path
+
+    system = {"Windows": "Windows", "Darwin": "macOS"}.get(platform.system(), "Linux")
+    bundled = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        '..', 'rhubarb', f'Rhubarb-Lip-Sync-1.13.0-{system}', 'rhubarb'
+    )
+    if system == "Windows":
+        bundled += '.exe'
+    if os.path.isfile(bundled):
+        return bundled
+    return shutil.which("rhubarb") or bundled
+
+
+def rhubarb_lipsync(wav_file_path: str, text: str = None) -> dict:
+    """
+    Runs Rhubarb on a WAV file.
+
+    Args:
+        wav_file_path (str): The WAV file to analyse.
+        text (str, optional): The transcript, passed to Rhubarb as dialog to improve recognition.
+
+    Returns:
+        dict: {"METADATA": ..., "MOUTH_CUES": ...}, or empty data if Rhubarb failed.
+    """
+    if not os.path.isfile(wav_file_path):
+        logger.error(f"The WAV file {wav_file_path} does not exist.")
+        return empty_lipsync()
+
+    # Write to a unique temporary file, so identical utterances processed at the same time
+    # do not share an output file; the data is returned, not kept on disk
+    fd, temp_json_path = tempfile.mkstemp(suffix=".json", dir=os.path.dirname(wav_file_path))
+    os.close(fd)
+    command = [
+        get_rhubarb_path(),
+        "-f", "json",
+        "-o", temp_json_path,
+        wav_file_path,
+        "-r", "phonetic"  # Faster but less accurate; remove for better accuracy
+    ]
+    dialog_path = None
+    try:
+        if text:
+            fd, dialog_path = tempfile.mkstemp(suffix=".txt")
+            with os.fdopen(fd, "w", encoding="utf-8") as dialog_file:
+                dialog_file.write(text)
+            command += ["-d", dialog_path]
+
+        subprocess.run(command, check=True, capture_output=True)
+        logger.info(f"Rhubarb successfully processed {wav_file_path}")
+
+        with open(temp_json_path, "r") as json_file:
+            lip_sync_data = json.load(json_file)
+
+        if "metadata" not in lip_sync_data or "mouthCues" not in lip_sync_data:
+            logger.warning(f"Unexpected lip-sync data structure for {wav_file_path}. Using default structure.")
+            return empty_lipsync()
+
+        # Normalize keys to uppercase as per requirement
+        return {
+            "METADATA": lip_sync_data.get("metadata", {}),
+            "MOUTH_CUES": lip_sync_data.get("mouthCues", [])
+        }
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Rhubarb failed with error: {e}")
+    except FileNotFoundError as e:
+        logger.error(e)
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON decoding failed for {temp_json_path}: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error during lip-sync data generation: {e}")
+    finally:
+        for path in (temp_json_path, dialog_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+    return empty_lipsync()
+
+
+"""Step 6: Define the engine selection"""
+def get_lipsync_engine() -> str:
+    """
+    Returns the configured engine name (LIPSYNC_ENGINE), "rhubarb" by default.
+    """
+    engine = os.getenv("LIPSYNC_ENGINE", "rhubarb").lower()
+    if engine not in LIPSYNC_ENGINES:
+        logger.warning(f"Unknown LIPSYNC_ENGINE '{engine}', using 'rhubarb'.")
+        return "rhubarb"
+    return engine
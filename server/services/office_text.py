@@ -0,0 +1,145 @@
+"""
+This module streams the text out of Office Open XML uploads (.docx, .pptx, .xlsx).
+
+A .docx or .pptx is a zip of XML parts. Instead of building the whole document model, each part
+is decompressed and parsed incrementally (`iterparse`), text is yielded paragraph by paragraph and
+every parsed element is released right away. Workbooks are read with openpyxl's read-only mode,
+which streams rows from the sheet XML. The callers stop at a character budget, so memory stays
+bounded and the rest of a large file is never decompressed.
+"""
+
+"""Step 1: Import necessary modules"""
+import io
+import posixpath
+import re
+import zipfile
+from contextlib import closing
+from xml.etree.ElementTree import iterparse
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+RELATIONSHIP = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+_SLIDE_NUMBER = re.compile(r"slide(\d+)\.xml$")
+
+
+def _as_file(file):
+    # Accept the upload as bytes or as a (seekable) file-like object
+    if isinstance(file, (bytes, bytearray)):
+        return io.BytesIO(file)
+    file.seek(0)
+    return file
+
+
+def take_chars(pieces, max_chars: int = None) -> str:
+    """
+    Joins pieces of text until `max_chars` characters are collected, then stops reading.
+
+    Args:
+        pieces (iterable[str]): The text, in order, e.g. from one of the iterators below.
+        max_chars (int, optional): The budget; None for no limit.
+
+    Returns:
+        str: The text, at most `max_chars` long.
+    """
+    parts, total = [], 0
+    with closing(iter(pieces)) as iterator:
+        for piece in iterator:
+            parts.append(piece)
+            total += len(piece)
+            if max_chars is not None and total >= max_chars:
+                break
+    text = "".join(parts)
+    return text[:max_chars] if max_chars is not None else text
+
+
+"""Step 2: Define the .docx and .pptx iterators"""
+def _paragraphs(part, paragraph_tag: str, text_tag: str, break_tags: dict):
+    """
+    Yields the text of each paragraph of an XML part, followed by a newline.
+    """
+    # One list per open paragraph: text boxes put whole paragraphs inside a paragraph's run
+    open_paragraphs = []
+    for event, element in iterparse(part, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            if tag == paragraph_tag:
+                open_paragraphs.append([])
+        elif tag == paragraph_tag:
+            yield "".join(open_paragraphs.pop()) + "\n"
+            # Release the paragraph's subtree; only the (now empty) element stays in the tree
+            element.clear()
+        elif open_paragraphs and tag == text_tag:
+            open_paragraphs[-1].append(element.text or "")
+        elif open_paragraphs and tag in break_tags:
+            open_paragraphs[-1].append(break_tags[tag])
+
+
+def iter_docx_text(file):
+    """
+    Yields the paragraphs of a .docx (body text, including tables and text boxes) in order.
+
+    Args:
+        file (bytes | file-like): The .docx.
+    """
+    with zipfile.ZipFile(_as_file(file)) as archive, archive.open("word/document.xml") as part:
+        yield from _paragraphs(part, f"{W}p", f"{W}t", {f"{W}tab": "\t", f"{W}br": "\n", f"{W}cr": "\n"})
+
+
+def _part_name(base: str, target: str) -> str:
+    # Relationship targets are relative to the referring part's folder unless they start with "/"
+    return target[1:] if target.startswith("/") else posixpath.normpath(posixpath.join(base, target))
+
+
+def _slide_names(archive: zipfile.ZipFile) -> list[str]:
+    # The deck's order comes from presentation.xml; fall back to the slide numbers in the names
+    try:
+        with archive.open("ppt/_rels/presentation.xml.rels") as part:
+            targets = {rel.get("Id"): rel.get("Target") for _, rel in iterparse(part) if rel.tag == RELATIONSHIP}
+        with archive.open("ppt/presentation.xml") as part:
+            ids = [element.get(f"{R}id") for _, element in iterparse(part) if element.tag == f"{P}sldId"]
+        names = [_part_name("ppt", targets[rid]) for rid in ids if rid in targets]
+        if names:
+            return names
+    except KeyError:
+        pass
+    slides = [name for name in archive.namelist() if name.startswith("ppt/slides/") and _SLIDE_NUMBER.search(name)]
+    return sorted(slides, key=lambda name: int(_SLIDE_NUMBER.search(name).group(1)))
+
+
+def iter_pptx_text(file):
+    """
+    Yields the paragraphs of each slide of a .pptx (text boxes, placeholders and tables), slide by slide.
+
+    Args:
+        file (bytes | file-like): The .pptx.
+    """
+    with zipfile.ZipFile(_as_file(file)) as archive:
+        for name in _slide_names(archive):
+            try:
+                part = archive.open(name)
+            except KeyError:
+                continue
+            with part:
+                yield from _paragraphs(part, f"{A}p", f"{A}t", {f"{A}br": "\n"})
+
+
+"""Step 3: Define the .xlsx iterator"""
+def iter_xlsx_text(file):
+    """
+    Yields the rows of every sheet of an .xlsx as tab-separated lines, using openpyxl's
+    read-only mode so rows are streamed rather than loaded at once.
+
+    Args:
+        file (bytes | file-like): The .xlsx.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(_as_file(file), read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            for row in sheet.iter_rows(values_only=True):
+                yield "\t".join(str(cell) if cell is not None else "" for cell in row) + "\n"
+    finally:
+        workbook.close()
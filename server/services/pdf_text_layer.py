@@ -0,0 +1,128 @@
+"""
+This module reads the text layer of born-digital PDFs locally.
+
+Lecture notes and slides exported from Word, PowerPoint or LaTeX carry their text in the PDF,
+so it can be read in milliseconds instead of being sent to Form Recognizer. `read_pdf_text_layer`
+extracts each page's text with pypdf, and `needs_ocr` decides from the result whether the PDF is a
+scan (or uses fonts that cannot be decoded) and should go to cloud OCR.
+
+Uploads are untrusted, so every decompressed stream is capped at `PDF_MAX_STREAM_BYTES` and the
+page contents of the whole document at `PDF_MAX_DECODED_BYTES`. A PDF over either limit, or one
+that cannot be read for any other reason, goes to OCR instead.
+"""
+
+"""Step 1: Import necessary modules"""
+import io
+import logging
+
+from utils.consts import (
+    PDF_MAX_DECODED_BYTES,
+    PDF_MAX_STREAM_BYTES,
+    PDF_TEXT_MAX_EMPTY_PAGE_RATIO,
+    PDF_TEXT_MAX_UNREADABLE_RATIO,
+    PDF_TEXT_MIN_CHARS_PER_PAGE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PdfTextError(Exception):
+    """Raised when a PDF's text layer cannot (or should not) be read locally."""
+
+
+"""Step 2: Define the reader"""
+def _has_undecodable_font(page) -> bool:
+    # Composite fonts with an Identity encoding and no ToUnicode map show glyph ids, not characters
+    resources = page.get("/Resources")
+    fonts = resources.get_object().get("/Font") if resources else None
+    for font in (fonts.get_object().values() if fonts else []):
+        font = font.get_object()
+        encoding = font.get("/Encoding")
+        if font.get("/Subtype") == "/Type0" and "/ToUnicode" not in font and encoding in ("/Identity-H", "/Identity-V"):
+            return True
+    return False
+
+
+def _content_bytes(page) -> int:
+    # Decodes the page's content streams (pypdf keeps the result for extract_text) and sizes them
+    contents = page.get("/Contents")
+    contents = contents.get_object() if contents is not None else []
+    streams = contents if isinstance(contents, list) else [contents]
+    return sum(len(stream.get_object().get_data()) for stream in streams)
+
+
+def read_pdf_text_layer(file_content: bytes, max_chars: int = None) -> list[str]:
+    """
+    Reads the text of each page of a PDF without OCR.
+
+    Args:
+        file_content (bytes): The PDF.
+        max_chars (int, optional): Stop after the page on which this many characters are reached.
+
+    Returns:
+        list[str]: One string per page (one line of text per line), in page order; [] if the PDF
+                   could not be read locally, e.g. because it is encrypted, corrupt or too large
+                   once decompressed.
+    """
+    if not file_content.startswith(b"%PDF"):
+        return []
+
+    from pypdf import PdfReader, apply_configuration
+
+    try:
+        with apply_configuration(
+            zlib_maximum_output_length=PDF_MAX_STREAM_BYTES,
+            array_based_stream_maximum_output_length=PDF_MAX_STREAM_BYTES,
+        ):
+            reader = PdfReader(io.BytesIO(file_content))
+            if reader.is_encrypted:
+                return []
+            page_texts, collected, decoded = [], 0, 0
+            for page in reader.pages:
+                decoded += _content_bytes(page)
+                if decoded > PDF_MAX_DECODED_BYTES:
+                    raise PdfTextError(f"Page contents exceed {PDF_MAX_DECODED_BYTES} bytes")
+                text = page.extract_text() or ""
+                if _has_undecodable_font(page):
+                    text = "".join(char if char.isspace() else "\ufffd" for char in text)
+                page_texts.append("".join(line.rstrip() + "\n" for line in text.splitlines()))
+                collected += len(page_texts[-1])
+                if max_chars is not None and collected >= max_chars:
+                    break
+        return page_texts
+    except Exception as e:
+        # Anything unexpected (including pypdf's decompression limits) means the PDF goes to OCR instead
+        logger.info(f"Could not read the PDF text layer locally: {e}")
+        return []
+
+
+"""Step 3: Decide whether OCR is needed"""
+def _is_unreadable(char: str) -> bool:
+    # Replacement characters, control characters and private-use glyphs (symbol fonts)
+    return char == "\ufffd" or (not char.isprintable() and not char.isspace()) or "\ue000" <= char <= "\uf8ff"
+
+
+def needs_ocr(page_texts: list[str]) -> bool:
+    """
+    Decides whether a PDF's text layer is missing or unusable, so the PDF should be OCR'd.
+
+    A scanned PDF has (almost) no characters per page; a PDF whose fonts cannot be decoded shows
+    up as replacement or control characters.
+
+    Args:
+        page_texts (list[str]): The result of `read_pdf_text_layer`.
+
+    Returns:
+        bool: True if cloud OCR is needed.
+    """
+    if not page_texts:
+        return True
+    counts = [sum(not char.isspace() for char in text) for text in page_texts]
+    characters = sum(counts)
+    if characters / len(page_texts) < PDF_TEXT_MIN_CHARS_PER_PAGE:
+        return True
+    empty_pages = sum(count < PDF_TEXT_MIN_CHARS_PER_PAGE / 4 for count in counts)
+    if empty_pages / len(page_texts) > PDF_TEXT_MAX_EMPTY_PAGE_RATIO:
+        return True
+    unreadable = sum(_is_unreadable(char) for text in page_texts for char in text)
+    return unreadable / characters > PDF_TEXT_MAX_UNREADABLE_RATIO
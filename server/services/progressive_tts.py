@@ -0,0 +1,331 @@
+"""
+This module contains progressive, sentence-chunked text-to-speech.
+
+A long answer is split into sentence-sized chunks that are synthesized concurrently
+(through the TTS cache, so repeated sentences are free). Chunks are published in order
+as soon as they and all earlier chunks are ready: as `audio_chunk` Socket.IO events to
+the room `audio_<playlist_id>`, and through the playlist endpoint in routes/AI.py.
+
+The first chunk of every answer is synthesized ahead of the later chunks of answers already
+queued, so a long answer does not delay the first audio of the next one. Each playlist's
+progress is also written to the `audio_playlists` MongoDB collection, so a client polling (or
+joining) it through another worker is served as well.
+"""
+
+"""Step 1: Import necessary modules"""
+import heapq
+import itertools
+import logging
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from cachetools import TTLCache
+
+from services.azure_mongodb import MongoDBClient
+from services.text_to_speech_service import clean_text
+from services.tts_cache import get_tts_cache
+from utils.socketIo import socketio
+from utils.consts import (
+    TTS_DEFAULT_AUDIO_FORMAT,
+    TTS_CHUNK_MAX_CHARS,
+    TTS_CHUNK_MIN_CHARS,
+    TTS_PLAYLIST_COLLECTION,
+    TTS_PLAYLIST_TTL_SECONDS,
+    TTS_PROGRESSIVE_MAX_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END = re.compile(r'(?<=[.!?。！？।])\s+|\n+')
+
+"""Step 2: Define the sentence splitter"""
+def split_into_sentences(text: str, max_chars: int = TTS_CHUNK_MAX_CHARS, min_chars: int = TTS_CHUNK_MIN_CHARS) -> list[str]:
+    """
+    Splits cleaned text into chunks of whole sentences.
+
+    Short sentences are merged with the following ones until a chunk has at least `min_chars`.
+    Sentences longer than `max_chars` are split at the last space before the limit.
+
+    Args:
+        text (str): The text to split (already cleaned).
+        max_chars (int): The longest chunk that is synthesized in one request.
+        min_chars (int): The shortest chunk worth a request of its own.
+
+    Returns:
+        list[str]: The chunks, in reading order.
+    """
+    sentences = []
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            sentences.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+
+    chunks = []
+    for sentence in sentences:
+        if chunks and len(chunks[-1]) < min_chars and len(chunks[-1]) + len(sentence) + 1 <= max_chars:
+            chunks[-1] = f"{chunks[-1]} {sentence}"
+        else:
+            chunks.append(sentence)
+    return chunks
+
+
+"""Step 3: Define the AudioPlaylist class"""
+class AudioPlaylist:
+    """
+    The chunks of one progressive synthesis, filled in as they become ready.
+    """
+
+    def __init__(self, chunks: list[str]):
+        self.playlist_id = uuid.uuid4().hex
+        self.texts = chunks
+        self.filenames: list = [None] * len(chunks)
+        self.failed = False
+        # True for a snapshot loaded from MongoDB, whose chunks are synthesized by another worker
+        self.stored = False
+        self._ready = [False] * len(chunks)
+        self._published = 0
+        self._lock = threading.Lock()
+        # Held while chunks are published, so callbacks see them in order
+        self.publish_lock = threading.Lock()
+
+    @classmethod
+    def from_document(cls, document: dict) -> "AudioPlaylist":
+        """
+        Rebuilds a snapshot of a playlist from its `audio_playlists` document.
+        """
+        playlist = cls(document["texts"])
+        playlist.playlist_id = document["_id"]
+        playlist.failed = document.get("failed", False)
+        playlist.stored = True
+        for index, filename in enumerate(document.get("published", [])):
+            playlist.mark_ready(index, filename)
+        return playlist
+
+    def to_document(self) -> dict:
+        with self._lock:
+            return {"texts": self.texts, "published": self.filenames[:self._published], "failed": self.failed}
+
+    @property
+    def total(self) -> int:
+        return len(self.texts)
+
+    @property
+    def published_count(self) -> int:
+        return self._published
+
+    @property
+    def complete(self) -> bool:
+        return self._published == self.total
+
+    def published_filenames(self) -> list[str]:
+        """
+        Returns the filenames of the chunks published so far, in order.
+        """
+        with self._lock:
+            return [filename for filename in self.filenames[:self._published] if filename]
+
+    def mark_ready(self, index: int, filename) -> list[tuple[int, str]]:
+        """
+        Records a finished chunk and returns the chunks that can now be published in order.
+        """
+        with self._lock:
+            self.filenames[index] = filename
+            self._ready[index] = True
+            publishable = []
+            while self._published < self.total and self._ready[self._published]:
+                publishable.append((self._published, self.filenames[self._published]))
+                self._published += 1
+            return publishable
+
+
+"""Step 4: Define how chunks are published"""
+def audio_file_url(filename: str) -> str:
+    """
+    Returns the download URL of a generated audio file.
+    """
+    backend_base_url = os.getenv('BACKEND_BASE_URL', 'http://localhost:8000')
+    return f"{backend_base_url}/ai_mentor/download_audio/{filename}"
+
+
+def playlist_room(playlist_id: str) -> str:
+    return f"audio_{playlist_id}"
+
+
+def emit_audio_chunk(playlist: AudioPlaylist, index: int, filename, to=None):
+    """
+    Sends one chunk to the clients listening to a playlist (or to a single client with `to`).
+    """
+    socketio.emit("audio_chunk", {
+        "playlist_id": playlist.playlist_id,
+        "index": index,
+        "total": playlist.total,
+        "url": audio_file_url(filename) if filename else None,
+        "final": index == playlist.total - 1,
+    }, room=to or playlist_room(playlist.playlist_id))
+
+
+"""Step 5: Define where playlists are kept"""
+class PlaylistStore:
+    """
+    The progress of each playlist in MongoDB, for the workers that did not start it.
+    """
+
+    def __init__(self, collection=None):
+        """
+        Initializes the store.
+
+        Args:
+            collection: The MongoDB collection. Defaults to `audio_playlists`.
+        """
+        self._collection = collection
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+            self._collection = db[TTS_PLAYLIST_COLLECTION]
+        return self._collection
+
+    def save(self, playlist: AudioPlaylist):
+        """
+        Writes the chunks published so far; failures are logged, as the playlist still works on this worker.
+        """
+        try:
+            expires_at = datetime.utcnow() + timedelta(seconds=TTS_PLAYLIST_TTL_SECONDS)
+            self.collection.update_one(
+                {"_id": playlist.playlist_id},
+                {"$set": {**playlist.to_document(), "expires_at": expires_at}},
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"Could not store playlist {playlist.playlist_id}: {e}")
+
+    def load(self, playlist_id: str):
+        """
+        Returns a snapshot of a playlist, or None if it is unknown or expired.
+        """
+        try:
+            document = self.collection.find_one({"_id": playlist_id, "expires_at": {"$gt": datetime.utcnow()}})
+        except Exception as e:
+            logger.warning(f"Could not load playlist {playlist_id}: {e}")
+            return None
+        return AudioPlaylist.from_document(document) if document else None
+
+
+@lru_cache(maxsize=None)
+def get_playlist_store() -> PlaylistStore:
+    """
+    Returns the process-wide playlist store.
+    """
+    return PlaylistStore()
+
+
+_playlists = TTLCache(maxsize=1000, ttl=TTS_PLAYLIST_TTL_SECONDS)
+_playlists_lock = threading.Lock()
+
+
+def clear_playlist_memory():
+    """
+    Forgets the playlists started in this process. The MongoDB copies are left untouched.
+    """
+    with _playlists_lock:
+        _playlists.clear()
+
+
+def get_playlist(playlist_id: str):
+    """
+    Returns a playlist: the live one if it was started in this process, otherwise a snapshot of its
+    progress from MongoDB. None if it is unknown or expired.
+    """
+    with _playlists_lock:
+        playlist = _playlists.get(playlist_id)
+    return playlist or get_playlist_store().load(playlist_id)
+
+
+"""Step 6: Define the progressive synthesis"""
+# Chunks waiting for a synthesis thread, as (priority, sequence, function, args); first chunks come first
+_pending = []
+_pending_lock = threading.Lock()
+_sequence = itertools.count()
+
+
+@lru_cache(maxsize=None)
+def _get_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=TTS_PROGRESSIVE_MAX_WORKERS, thread_name_prefix="tts-chunk")
+
+
+def _submit_chunk(executor, first: bool, fn, *args):
+    # Each submission runs whichever pending chunk is most urgent, not necessarily its own
+    with _pending_lock:
+        heapq.heappush(_pending, (0 if first else 1, next(_sequence), fn, args))
+    executor.submit(_run_next_chunk)
+
+
+def _run_next_chunk():
+    with _pending_lock:
+        _, _, fn, args = heapq.heappop(_pending)
+    fn(*args)
+
+
+def start_progressive_tts(text: str, preferred_language: str = "en", style: str = "calm", audio_format: str = TTS_DEFAULT_AUDIO_FORMAT,
+                          on_chunk=emit_audio_chunk, executor=None) -> AudioPlaylist:
+    """
+    Starts synthesizing `text` sentence by sentence and returns its playlist immediately.
+
+    Args:
+        text (str): The raw answer text.
+        preferred_language (str): The language code used to pick the voice.
+        style (str): The speaking style.
+        audio_format (str): The audio format of the chunks.
+        on_chunk (callable, optional): Called as on_chunk(playlist, index, filename) for each chunk,
+            in order, as soon as it can be played. `filename` is None for a chunk that failed.
+            Defaults to emitting an `audio_chunk` Socket.IO event.
+        executor (Executor, optional): Runs the chunk syntheses. Defaults to a shared bounded pool, where
+            the first chunk of an answer goes ahead of the later chunks of others.
+
+    Returns:
+        AudioPlaylist: The playlist, registered for `get_playlist` in this process and in MongoDB.
+    """
+    playlist = AudioPlaylist(split_into_sentences(clean_text(text)))
+    with _playlists_lock:
+        _playlists[playlist.playlist_id] = playlist
+    store = get_playlist_store()
+    store.save(playlist)
+
+    executor = executor or _get_executor()
+    cache = get_tts_cache()
+
+    def synthesize_chunk(index: int, chunk: str):
+        filename = None
+        try:
+            filename = cache.get_or_synthesize(chunk, preferred_language=preferred_language, style=style, audio_format=audio_format)
+        except Exception as e:
+            logger.error(f"Progressive TTS failed for chunk {index} of {playlist.playlist_id}: {e}")
+        if filename is None:
+            playlist.failed = True
+        with playlist.publish_lock:
+            publishable = playlist.mark_ready(index, filename)
+            if publishable:
+                # Stored before the events go out, so a client that reacts to one finds it on any worker
+                store.save(playlist)
+            for ready_index, ready_filename in publishable:
+                if on_chunk:
+                    try:
+                        on_chunk(playlist, ready_index, ready_filename)
+                    except Exception as e:
+                        logger.error(f"Publishing chunk {ready_index} of {playlist.playlist_id} failed: {e}")
+
+    for index, chunk in enumerate(playlist.texts):
+        _submit_chunk(executor, index == 0, synthesize_chunk, index, chunk)
+
+    return playlist
@@ -0,0 +1,223 @@
+"""
+This module contains the bank of generated quiz questions that topic quizzes are served from.
+
+Popular combinations of (topic, sub_topic, level, language) are requested again and again, so the
+questions generated for them are kept in the `question_bank` collection, one document per question
+in a bucket keyed by those four values. A topic quiz is then sampled from its bucket, skipping the
+questions the user has already been served (recorded in `question_bank_served`), and only falls
+back to the LLM when the bucket cannot cover it. When serving leaves fewer unseen questions than
+`QUESTION_BANK_LOW_WATERMARK` for the user, the bucket is refilled by a background job, so the next
+request is served from the bank as well. A first request that cannot be served does not trigger a
+refill, so a one-off topic costs no more than the quiz generated for it.
+"""
+
+"""Step 1: Import necessary modules"""
+import logging
+import re
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from models.quiz import Question
+from services.azure_mongodb import MongoDBClient
+from utils.consts import (
+    QUESTION_BANK_COLLECTION,
+    QUESTION_BANK_LOW_WATERMARK,
+    QUESTION_BANK_MAX_PER_BUCKET,
+    QUESTION_BANK_REFILL_MAX_WORKERS,
+    QUESTION_BANK_REFILL_SIZE,
+    QUESTION_BANK_SERVED_COLLECTION,
+)
+
+logger = logging.getLogger(__name__)
+
+"""Step 2: Define the bucket keys"""
+def _normalize(text) -> str:
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def bucket_key(topic: str, sub_topic: str, level: str, language: str) -> str:
+    """
+    Builds the key of a bucket of the bank; topics that differ only in case or spacing share a bucket.
+    """
+    return "|".join([_normalize(topic), _normalize(sub_topic), level.lower(), language])
+
+
+def question_fingerprint(question: str) -> str:
+    """
+    Normalizes a question's text, so the same question is not stored twice in a bucket.
+    """
+    return re.sub(r"[^\w ]", "", _normalize(question))
+
+
+@lru_cache(maxsize=None)
+def _get_refill_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=QUESTION_BANK_REFILL_MAX_WORKERS, thread_name_prefix="question-bank")
+
+
+"""Step 3: Define the QuestionBank class"""
+class QuestionBank:
+    """
+    Generated questions grouped by (topic, sub_topic, level, language), sampled without repeats per user.
+    """
+
+    def __init__(self, collection=None, served_collection=None, executor=None):
+        """
+        Initializes the bank.
+
+        Args:
+            collection: The MongoDB collection of questions. Defaults to `question_bank`.
+            served_collection: The MongoDB collection recording what each user was served.
+                Defaults to `question_bank_served`.
+            executor (Executor, optional): Where refills run. Defaults to a small shared pool.
+        """
+        self._collection = collection
+        self._served_collection = served_collection
+        self._executor = executor
+        self._refilling = set()
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+            self._collection = db[QUESTION_BANK_COLLECTION]
+        return self._collection
+
+    @property
+    def served_collection(self):
+        if self._served_collection is None:
+            db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+            self._served_collection = db[QUESTION_BANK_SERVED_COLLECTION]
+        return self._served_collection
+
+    def add(self, bucket: str, questions: list[Question], user_id: str = None) -> int:
+        """
+        Stores generated questions in a bucket, skipping the ones it already holds.
+
+        Args:
+            bucket (str): The bucket, from `bucket_key`.
+            questions (list[Question]): The questions.
+            user_id (str, optional): A user who has already been served these questions.
+
+        Returns:
+            int: The number of questions added.
+        """
+        room = QUESTION_BANK_MAX_PER_BUCKET - self.collection.count_documents({"bucket": bucket})
+        documents = {}
+        for question in questions:
+            fingerprint = question_fingerprint(question.question)
+            if fingerprint and fingerprint not in documents:
+                document = question.dict(exclude={"question_id"})
+                documents[fingerprint] = {**document, "_id": ObjectId(), "bucket": bucket, "fingerprint": fingerprint, "created_at": datetime.utcnow()}
+
+        existing = {
+            stored["fingerprint"]: stored["_id"]
+            for stored in self.collection.find({"bucket": bucket, "fingerprint": {"$in": list(documents)}}, {"fingerprint": 1})
+        }
+        new_documents = [document for fingerprint, document in documents.items() if fingerprint not in existing][:max(room, 0)]
+        if new_documents:
+            try:
+                self.collection.insert_many(new_documents, ordered=False)
+            except BulkWriteError:
+                # A concurrent refill stored some of these first
+                pass
+        if user_id:
+            self._mark_served(user_id, bucket, list(existing.values()) + [document["_id"] for document in new_documents])
+        return len(new_documents)
+
+    def sample(self, user_id: str, bucket: str, num_questions: int, refill=None) -> list[Question]:
+        """
+        Draws questions the user has not been served yet from a bucket.
+
+        Args:
+            user_id (str): The user.
+            bucket (str): The bucket, from `bucket_key`.
+            num_questions (int): The number of questions needed.
+            refill (callable, optional): Generates `count` new questions for the bucket, as
+                refill(count) -> list[Question]. When given, it is run in the background once the
+                user has fewer than `QUESTION_BANK_LOW_WATERMARK` unseen questions left, unless this
+                is the user's first request for the bucket and it could not be served.
+
+        Returns:
+            list[Question] | None: The questions, with fresh question ids, or None if the bucket does
+            not hold enough unseen questions (nothing is marked as served then).
+        """
+        served = self._served_ids(user_id, bucket)
+        unseen_filter = {"bucket": bucket, "_id": {"$nin": served}}
+        unseen = self.collection.count_documents(unseen_filter)
+
+        questions = None
+        if unseen >= num_questions:
+            documents = list(self.collection.aggregate([{"$match": unseen_filter}, {"$sample": {"size": num_questions}}]))
+            if len(documents) == num_questions:
+                self._mark_served(user_id, bucket, [document["_id"] for document in documents])
+                questions = [
+                    Question(
+                        question_id=str(ObjectId()),
+                        question=document["question"],
+                        options=document.get("options") or [],
+                        correct_answer=document.get("correct_answer"),
+                        question_type=document["question_type"],
+                    )
+                    for document in documents
+                ]
+                unseen -= num_questions
+        logger.info(f"Question bank {bucket}: {'hit' if questions else 'miss'}, {unseen} unseen questions left for user {user_id}")
+
+        # A cold miss (nothing served from the bucket, to this user or now) is only generated by the
+        # caller, so one-off topics cost a single quiz; buckets that are actually reused get refilled
+        if refill is not None and unseen < QUESTION_BANK_LOW_WATERMARK and (questions or served):
+            self.refill_async(bucket, refill)
+        return questions
+
+    def refill_async(self, bucket: str, refill):
+        """
+        Adds `QUESTION_BANK_REFILL_SIZE` new questions to a bucket in the background, unless a
+        refill of that bucket is already running or the bucket is full.
+        """
+        with self._lock:
+            if bucket in self._refilling:
+                return
+            self._refilling.add(bucket)
+        executor = self._executor or _get_refill_executor()
+        executor.submit(self._refill, bucket, refill)
+
+    def _refill(self, bucket: str, refill):
+        try:
+            if self.collection.count_documents({"bucket": bucket}) >= QUESTION_BANK_MAX_PER_BUCKET:
+                return
+            added = self.add(bucket, refill(QUESTION_BANK_REFILL_SIZE))
+            logger.info(f"Question bank {bucket}: refilled with {added} questions")
+        except Exception as e:
+            logger.error(f"Failed to refill question bank {bucket}: {e}")
+        finally:
+            with self._lock:
+                self._refilling.discard(bucket)
+
+    def _served_ids(self, user_id: str, bucket: str) -> list:
+        record = self.served_collection.find_one({"_id": f"{user_id}:{bucket}"}, {"question_ids": 1})
+        return record.get("question_ids", []) if record else []
+
+    def _mark_served(self, user_id: str, bucket: str, question_ids: list):
+        if question_ids:
+            self.served_collection.update_one(
+                {"_id": f"{user_id}:{bucket}"},
+                {"$addToSet": {"question_ids": {"$each": question_ids}}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=True,
+            )
+
+
+"""Step 4: Define the shared bank"""
+@lru_cache(maxsize=None)
+def get_question_bank() -> QuestionBank:
+    """
+    Returns the process-wide question bank.
+    """
+    return QuestionBank()
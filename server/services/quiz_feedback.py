@@ -0,0 +1,123 @@
+"""
+This module writes the feedback shown for the wrong answers of a submitted quiz.
+
+The mistakes of a submission are explained in batches: each batch is one LLM call that returns a
+JSON object keyed by question id, and the batches run concurrently on a small shared pool. Any
+mistake a batch reply leaves out (or every mistake of the batch, if the reply is not valid JSON)
+is explained on its own, so one bad reply never leaves the whole quiz without feedback.
+"""
+
+"""Step 1: Import necessary modules"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from utils.consts import QUIZ_FEEDBACK_BATCH_SIZE, QUIZ_FEEDBACK_MAX_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+FEEDBACK_FALLBACK = "No feedback available."
+CORRECT_FEEDBACK = "Correct answer! Well done."
+
+FEEDBACK_GUIDANCE = (
+    "You are an educational assistant helping users (5-15 years old) understand their mistakes in quizzes.\n\n"
+)
+
+
+"""Step 2: Define the prompts"""
+def _single_prompt(mistake: dict, language_name: str) -> str:
+    return (
+        f"{FEEDBACK_GUIDANCE}"
+        f"Question: {mistake['question']} ({language_name})\n"
+        f"User's Answer: {mistake['user_answer']} ({language_name})\n"
+        f"Correct Answer: {mistake['correct_answer']} ({language_name})\n\n"
+        f"Provide constructive and detailed feedback in {language_name} that explains why the user's answer is incorrect and how to arrive at the correct answer. "
+        f"Ensure the feedback is clear, educational, and encourages the user to understand the concept better.\n\n"
+        f"Feedback:"
+    )
+
+
+def _batch_prompt(mistakes: list[dict], language_name: str) -> str:
+    items = [
+        {key: mistake[key] for key in ("question_id", "question", "user_answer", "correct_answer")}
+        for mistake in mistakes
+    ]
+    return (
+        f"{FEEDBACK_GUIDANCE}"
+        f"Here are the questions the user answered incorrectly, in JSON:\n"
+        f"{json.dumps(items, ensure_ascii=False, indent=2)}\n\n"
+        f"For each one, write constructive feedback in {language_name} (3 to 5 sentences) that explains why the user's answer is incorrect and how to arrive at the correct answer. "
+        f"Ensure the feedback is clear, educational, and encourages the user to understand the concept better.\n\n"
+        f"Return only a JSON object that maps each question_id to its feedback text, with no code fences or commentary."
+    )
+
+
+def _parse_feedback(text: str) -> dict:
+    # Tolerate code fences or a sentence around the object
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        parsed = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(parsed, dict):
+        return {}
+    return {str(key): value.strip() for key, value in parsed.items() if isinstance(value, str) and value.strip()}
+
+
+"""Step 3: Define the feedback generation"""
+@lru_cache(maxsize=None)
+def _get_feedback_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=QUIZ_FEEDBACK_MAX_CONCURRENCY, thread_name_prefix="quiz-feedback")
+
+
+def _explain_one(llm, mistake: dict, language_name: str) -> str:
+    try:
+        return llm.invoke(_single_prompt(mistake, language_name)).content.strip() or FEEDBACK_FALLBACK
+    except Exception as e:
+        logger.error(f"Failed to generate feedback for question {mistake['question_id']}: {e}")
+        return FEEDBACK_FALLBACK
+
+
+def _explain_batch(llm, mistakes: list[dict], language_name: str) -> dict:
+    feedback = {}
+    if len(mistakes) > 1:
+        try:
+            reply = llm.invoke(_batch_prompt(mistakes, language_name)).content
+            feedback = _parse_feedback(reply)
+        except Exception as e:
+            logger.error(f"Failed to generate feedback for {len(mistakes)} questions: {e}")
+    for mistake in mistakes:
+        if mistake["question_id"] not in feedback:
+            feedback[mistake["question_id"]] = _explain_one(llm, mistake, language_name)
+    return feedback
+
+
+def explain_mistakes(llm, mistakes: list[dict], language_name: str, executor=None) -> dict:
+    """
+    Generates the feedback for the wrong answers of a quiz submission.
+
+    Args:
+        llm: The chat model.
+        mistakes (list[dict]): One dict per wrong answer with question_id, question, user_answer
+                               and correct_answer.
+        language_name (str): The language of the feedback, e.g. "English".
+        executor (Executor, optional): Where the batches run. Defaults to the shared bounded pool.
+
+    Returns:
+        dict: question_id -> feedback text; FEEDBACK_FALLBACK where no feedback could be generated.
+    """
+    if not mistakes:
+        return {}
+    batches = [mistakes[i:i + QUIZ_FEEDBACK_BATCH_SIZE] for i in range(0, len(mistakes), QUIZ_FEEDBACK_BATCH_SIZE)]
+    if len(batches) == 1:
+        return _explain_batch(llm, batches[0], language_name)
+
+    executor = executor or _get_feedback_executor()
+    futures = [executor.submit(_explain_batch, llm, batch, language_name) for batch in batches]
+    feedback = {}
+    for future in futures:
+        feedback.update(future.result())
+    return feedback
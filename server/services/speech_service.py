@@ -1,60 +1,160 @@
 """This module contains the speech recognition service that uses the Azure Speech SDK to convert audio to text."""
 
 """Step 1: Import necessary modules"""
-import azure.cognitiveservices.speech as speechsdk
-import io
 import subprocess
 import os
+import threading
+from functools import lru_cache
 from dotenv import load_dotenv
 
+from utils.consts import STT_PCM_CHUNK_BYTES, STT_UPLOAD_CHUNK_BYTES
+
 load_dotenv()
 
 
 """Step 2: Define the speech recognition service"""
-# Define a function to check if FFmpeg is installed
+# Define a function to check if FFmpeg is installed.
+# Runs once, on the first conversion, rather than when the module is imported.
+@lru_cache(maxsize=1)
 def check_ffmpeg():
     try:
         result = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
         print("FFmpeg version:")
         print(result.stdout)
+        return True
     except Exception as e:
         print("Failed to run FFmpeg:", str(e))
+        return False
+
+# The recognizer's default push-stream format: 16 kHz, 16-bit, mono PCM without a header
+FFMPEG_PCM_COMMAND = [
+    'ffmpeg', '-hide_banner', '-loglevel', 'error',
+    '-i', 'pipe:0',
+    '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', '16000',
+    'pipe:1',
+]
+
+
+class PcmTranscoder:
+    """
+    Decodes uploaded audio (webm, ogg, wav, mp3, ...) through ffmpeg's stdin and stdout.
+
+    Nothing touches the disk, so concurrent requests cannot overwrite each other's files.
+    PCM is handed to `on_pcm` from a reader thread as soon as ffmpeg produces it, so
+    recognition can start before the whole upload has been decoded.
+    """
+
+    def __init__(self, on_pcm, command=None, chunk_size: int = STT_PCM_CHUNK_BYTES):
+        """
+        Starts ffmpeg.
+
+        Args:
+            on_pcm (callable): Called with each block of PCM bytes.
+            command (list, optional): The decoder command. Defaults to FFMPEG_PCM_COMMAND.
+            chunk_size (int): The largest block passed to `on_pcm`.
+        """
+        if command is None:
+            check_ffmpeg()
+        self._on_pcm = on_pcm
+        self._chunk_size = chunk_size
+        self._stderr = b""
+        self._error = None
+        self.pcm_bytes = 0
+        self._process = subprocess.Popen(
+            command or FFMPEG_PCM_COMMAND,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        # stdout and stderr are drained on their own threads so a full pipe never blocks ffmpeg
+        self._stdout_thread = threading.Thread(target=self._pump_stdout, daemon=True)
+        self._stderr_thread = threading.Thread(target=self._pump_stderr, daemon=True)
+        self._stdout_thread.start()
+        self._stderr_thread.start()
+
+    def _pump_stdout(self):
+        try:
+            while True:
+                data = self._process.stdout.read1(self._chunk_size)
+                if not data:
+                    break
+                self.pcm_bytes += len(data)
+                self._on_pcm(data)
+        except Exception as e:
+            self._error = e
+            self._process.kill()
+
+    def _pump_stderr(self):
+        # Keep only the tail; it is all we report
+        for line in self._process.stderr:
+            self._stderr = (self._stderr + line)[-2000:]
+
+    def write(self, data: bytes):
+        """
+        Feeds encoded audio to ffmpeg.
+
+        Raises:
+            Exception: If ffmpeg has already exited.
+        """
+        try:
+            self._process.stdin.write(data)
+        except (BrokenPipeError, ValueError) as e:
+            raise Exception(f"Failed to convert audio: {self._stderr.decode(errors='replace')}") from e
+
+    def close(self, timeout: float = 60) -> int:
+        """
+        Signals the end of the input and waits for the remaining PCM to be delivered.
+
+        Returns:
+            int: The number of PCM bytes produced.
+
+        Raises:
+            Exception: If ffmpeg failed or `on_pcm` raised.
+        """
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            self._process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        self._stdout_thread.join()
+        self._stderr_thread.join()
+
+        if self._error is not None:
+            raise self._error
+        if self._process.returncode != 0:
+            print(f"FFmpeg error: {self._stderr.decode(errors='replace')}")
+            raise Exception("Failed to convert audio")
+        return self.pcm_bytes
+
+    def abort(self):
+        """
+        Stops ffmpeg without waiting for its output.
+        """
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
 
-check_ffmpeg()
-
-# Define a function to convert audio to WAV format
-def convert_audio_to_wav(input_audio_path, output_audio_path):
-    try:
-        command = ['ffmpeg', '-i', input_audio_path, '-acodec', 'pcm_s16le', '-ac', '1', '-ar', '16000', output_audio_path]
-        result = subprocess.run(command, check=True, text=True, capture_output=True)
-        print(f"FFmpeg output: {result.stdout}")
-    except subprocess.CalledProcessError as e:
-        print(f"FFmpeg error: {e.stderr}")
-        raise Exception("Failed to convert audio") from e
 
 # Define the speech recognition function
 def speech_to_text(audio_file):
-    
-        # Save original audio to a temporary file
-    temp_input_path = 'temp_input.webm'
-    temp_output_path = 'temp_output.wav'
+    """
+    Transcribes a recorded utterance.
+
+    The upload is streamed into ffmpeg, and ffmpeg's PCM output is pushed into the recognizer
+    while it decodes, so there are no temporary files and decoding overlaps recognition.
 
+    Args:
+        audio_file: A file-like object with the recording (e.g. a werkzeug FileStorage).
+
+    Returns:
+        str: The recognized text or a status message, or None if the audio could not be processed.
+    """
+    import azure.cognitiveservices.speech as speechsdk
+
+    transcoder = None
     try:
-        with open(temp_input_path, 'wb') as f:
-            f.write(audio_file.read())
-
-            # Convert to WAV format
-        convert_audio_to_wav(temp_input_path, temp_output_path)
-
-         # Load converted audio and process
-        with open(temp_output_path, 'rb') as f:
-            audio_data = f.read()
-        # Convert the audio file received into a stream
-        audio_stream = io.BytesIO(audio_data)
-        
-        print(f"Size of audio file: {audio_stream.getbuffer().nbytes} bytes")  # Debugging the size of the file
-        audio_stream.seek(0)
-        print(f"Size of audio file: {audio_stream.getbuffer().nbytes} bytes")
         # Set up the speech config with your subscription details
         speech_key = os.environ.get("SPEECH_AI_KEY")
         service_region = os.environ.get("SERVICE_REGION")
@@ -64,19 +164,18 @@ def speech_to_text(audio_file):
         push_stream = speechsdk.audio.PushAudioInputStream()
         audio_config = speechsdk.audio.AudioConfig(stream=push_stream)
         speech_recognizer = speechsdk.SpeechRecognizer(speech_config=speech_config, audio_config=audio_config)
-           
-
-        # Read the buffer and push into the push stream
-        data = audio_stream.read(1024)
-        print(f"Writing data to stream: {len(data)} bytes")
-        while data:
-            push_stream.write(data)
-            data = audio_stream.read(1024)
-        push_stream.close()
-
 
-        print("Speak into your microphone.")
-        result = speech_recognizer.recognize_once()
+        # Recognition starts now and consumes PCM as ffmpeg produces it
+        result_future = speech_recognizer.recognize_once_async()
+        try:
+            transcoder = PcmTranscoder(on_pcm=push_stream.write)
+            for chunk in iter(lambda: audio_file.read(STT_UPLOAD_CHUNK_BYTES), b""):
+                transcoder.write(chunk)
+            pcm_bytes = transcoder.close()
+            print(f"Decoded {pcm_bytes} bytes of PCM audio")
+        finally:
+            push_stream.close()
+        result = result_future.get()
 
         # Check the result
         if result.reason == speechsdk.ResultReason.RecognizedSpeech:
@@ -100,12 +199,7 @@ def speech_to_text(audio_file):
 
 
     except Exception as e:
+        if transcoder is not None:
+            transcoder.abort()
         print(f"Error during speech recognition: {str(e)}")
         return None
-    finally:
-        # Clean up temporary files
-        if os.path.exists(temp_input_path):
-            os.remove(temp_input_path)
-        if os.path.exists(temp_output_path):
-            os.remove(temp_output_path)
-        print("Temporary files removed")
@@ -0,0 +1,169 @@
+"""
+This module contains streaming speech recognition for the Socket.IO voice channel.
+
+Audio chunks arrive while the user is still speaking (e.g. MediaRecorder webm/opus slices, or raw
+16 kHz mono PCM). They are decoded by one long-running ffmpeg process per session and pushed into
+an Azure continuous recognizer, which reports partial hypotheses and final segments as it goes.
+"""
+
+"""Step 1: Import necessary modules"""
+import logging
+import os
+import threading
+
+from services.speech_service import PcmTranscoder
+from utils.consts import STT_STREAM_FINISH_TIMEOUT_SECONDS, STT_STREAM_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+STREAM_ENCODINGS = ("webm", "pcm")
+
+"""Step 2: Define the StreamingRecognition class"""
+class StreamingRecognition:
+    """
+    One voice session: encoded chunks in, partial and final transcripts out.
+    """
+
+    def __init__(self, on_partial, on_segment, language: str = None, encoding: str = "webm", max_bytes: int = STT_STREAM_MAX_BYTES, context: dict = None):
+        """
+        Sets up the recognizer; call `start` before writing audio.
+
+        Args:
+            on_partial (callable): Called with the running hypothesis of the current segment.
+            on_segment (callable): Called with the text of each finished segment.
+            language (str, optional): A recognition locale such as "en-US". Defaults to the service default.
+            encoding (str): "webm" for anything ffmpeg can decode from a stream, or "pcm" for 16 kHz mono s16le.
+            max_bytes (int): The most audio accepted in one session.
+            context (dict, optional): What to do with the final transcript (e.g. the chat it belongs to).
+        """
+        import azure.cognitiveservices.speech as speechsdk
+
+        if encoding not in STREAM_ENCODINGS:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+        self.context = context or {}
+        self._on_partial = on_partial
+        self._on_segment = on_segment
+        self._encoding = encoding
+        self._max_bytes = max_bytes
+        self._received_bytes = 0
+        self._segments = []
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._transcoder = None
+        self.error = None
+
+        speech_config = speechsdk.SpeechConfig(subscription=os.environ.get("SPEECH_AI_KEY"), region=os.environ.get("SERVICE_REGION"))
+        if language:
+            speech_config.speech_recognition_language = language
+        self._push_stream = speechsdk.audio.PushAudioInputStream()
+        audio_config = speechsdk.audio.AudioConfig(stream=self._push_stream)
+        self._recognizer = speechsdk.SpeechRecognizer(speech_config=speech_config, audio_config=audio_config)
+
+        recognized_speech = speechsdk.ResultReason.RecognizedSpeech
+        cancellation_error = speechsdk.CancellationReason.Error
+        self._recognizer.recognizing.connect(lambda evt: self._on_partial(evt.result.text))
+        self._recognizer.recognized.connect(lambda evt: self._segment(evt.result.text) if evt.result.reason == recognized_speech else None)
+        self._recognizer.canceled.connect(lambda evt: self._canceled(evt, cancellation_error))
+        self._recognizer.session_stopped.connect(lambda evt: self._stopped.set())
+
+    def _segment(self, text: str):
+        if text:
+            self._segments.append(text)
+            self._on_segment(text)
+
+    def _canceled(self, evt, cancellation_error):
+        if evt.cancellation_details.reason == cancellation_error:
+            self.error = evt.cancellation_details.error_details
+            logger.error(f"Streaming recognition canceled: {self.error}")
+        self._stopped.set()
+
+    @property
+    def transcript(self) -> str:
+        """
+        The final segments recognized so far, joined.
+        """
+        return " ".join(self._segments)
+
+    def start(self):
+        """
+        Starts continuous recognition and, for encoded audio, the ffmpeg decoder.
+        """
+        if self._encoding != "pcm":
+            self._transcoder = PcmTranscoder(on_pcm=self._push_stream.write)
+        self._recognizer.start_continuous_recognition_async().get()
+
+    def write(self, chunk: bytes):
+        """
+        Feeds the next slice of the recording.
+
+        Raises:
+            ValueError: If the session exceeds `max_bytes`.
+        """
+        with self._lock:
+            self._received_bytes += len(chunk)
+            if self._received_bytes > self._max_bytes:
+                raise ValueError("Voice session exceeds the maximum size")
+            if self._transcoder is not None:
+                self._transcoder.write(chunk)
+            else:
+                self._push_stream.write(chunk)
+
+    def finish(self, timeout: float = STT_STREAM_FINISH_TIMEOUT_SECONDS) -> str:
+        """
+        Ends the input, waits for the last segment and stops recognition.
+
+        Returns:
+            str: The whole transcript.
+        """
+        with self._lock:
+            try:
+                if self._transcoder is not None:
+                    self._transcoder.close()
+            finally:
+                # Closing the stream makes the recognizer flush the last segment and stop the session
+                self._push_stream.close()
+        self._stopped.wait(timeout)
+        self._recognizer.stop_continuous_recognition_async().get()
+        return self.transcript
+
+    def abort(self):
+        """
+        Drops the session without waiting for results, e.g. when the client disconnects.
+        """
+        if self._transcoder is not None:
+            self._transcoder.abort()
+        self._push_stream.close()
+        try:
+            self._recognizer.stop_continuous_recognition_async()
+        except Exception as e:
+            logger.warning(f"Failed to stop streaming recognition: {e}")
+
+
+"""Step 3: Define the session registry"""
+_sessions: dict[str, StreamingRecognition] = {}
+_sessions_lock = threading.Lock()
+
+
+def open_session(session_id: str, session: StreamingRecognition):
+    """
+    Registers a session for a Socket.IO client, aborting any session it left open.
+    """
+    with _sessions_lock:
+        previous = _sessions.pop(session_id, None)
+        _sessions[session_id] = session
+    if previous is not None:
+        previous.abort()
+
+
+def get_session(session_id: str):
+    with _sessions_lock:
+        return _sessions.get(session_id)
+
+
+def close_session(session_id: str):
+    """
+    Removes and returns a client's session, or None.
+    """
+    with _sessions_lock:
+        return _sessions.pop(session_id, None)
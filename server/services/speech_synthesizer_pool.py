@@ -0,0 +1,219 @@
+"""
+This module contains a pool of reusable Azure Speech synthesizers.
+
+Creating a `SpeechSynthesizer` and opening its service connection costs a round trip
+before any audio is produced. The pool keeps idle synthesizers per voice with their
+connection already open, caps how many syntheses run at once, and can warm the common
+voices up when the server starts.
+"""
+
+"""Step 1: Import necessary modules"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from utils.consts import TTS_DEFAULT_AUDIO_FORMAT, TTS_POOL_MAX_CONCURRENCY, TTS_POOL_MAX_IDLE_PER_VOICE, TTS_WARMUP_LANGUAGES
+
+logger = logging.getLogger(__name__)
+
+"""Step 2: Define the SpeechSynthesizerPool class"""
+class SpeechSynthesizerPool:
+    """
+    A bounded pool of pre-connected speech synthesizers, keyed by voice name and output format.
+
+    A synthesizer is used by one synthesis at a time; it is returned to its voice's idle
+    list afterwards, or dropped if the synthesis failed so a broken connection is not reused.
+    """
+
+    def __init__(self, speech_key: str, service_region: str, max_concurrency: int = TTS_POOL_MAX_CONCURRENCY,
+                 max_idle_per_voice: int = TTS_POOL_MAX_IDLE_PER_VOICE, factory=None):
+        """
+        Initializes the pool.
+
+        Args:
+            speech_key (str): The Azure Speech subscription key.
+            service_region (str): The Azure Speech region.
+            max_concurrency (int): The maximum number of syntheses in progress at once.
+            max_idle_per_voice (int): The maximum number of idle synthesizers kept per voice.
+            factory (callable, optional): Builds a synthesizer for (voice_name, audio_format). Defaults to the Azure SDK.
+        """
+        self.speech_key = speech_key
+        self.service_region = service_region
+        self.max_idle_per_voice = max_idle_per_voice
+        self._factory = factory or self._create_synthesizer
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._idle: dict[tuple, list[tuple]] = {}
+        self._lock = threading.Lock()
+
+    def _create_synthesizer(self, voice_name: str, audio_format: str):
+        import azure.cognitiveservices.speech as speechsdk
+        from services.text_to_speech_service import SPEECH_OUTPUT_FORMATS
+
+        speech_config = speechsdk.SpeechConfig(subscription=self.speech_key, region=self.service_region)
+        speech_config.speech_synthesis_voice_name = voice_name
+        speech_config.set_speech_synthesis_output_format(
+            getattr(speechsdk.SpeechSynthesisOutputFormat, SPEECH_OUTPUT_FORMATS[audio_format])
+        )
+        return speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+
+    @staticmethod
+    def _open_connection(synthesizer):
+        """
+        Opens the synthesizer's service connection ahead of the first request, where the SDK supports it.
+
+        Returns:
+            The open Connection (kept alive alongside the synthesizer), or None.
+        """
+        try:
+            import azure.cognitiveservices.speech as speechsdk
+
+            connection = speechsdk.Connection.from_speech_synthesizer(synthesizer)
+            connection.open(True)
+            return connection
+        except Exception as e:
+            logger.debug(f"Speech connection pre-open unavailable: {e}")
+            return None
+
+    def _checkout(self, key: tuple) -> tuple:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        synthesizer = self._factory(*key)
+        return synthesizer, self._open_connection(synthesizer)
+
+    def _checkin(self, key: tuple, entry: tuple):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_voice:
+                idle.append(entry)
+                return
+        self._close(entry)
+
+    @staticmethod
+    def _close(entry: tuple):
+        connection = entry[1]
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def idle_count(self, voice_name: str, audio_format: str = "wav") -> int:
+        """
+        Returns the number of idle synthesizers held for a voice and format.
+        """
+        with self._lock:
+            return len(self._idle.get((voice_name, audio_format), []))
+
+    @contextmanager
+    def acquire(self, voice_name: str, audio_format: str = "wav"):
+        """
+        Borrows a synthesizer for a voice, waiting while the pool is at its concurrency limit.
+
+        The synthesizer is returned to the pool if the block exits normally and dropped if it raises.
+
+        Args:
+            voice_name (str): The Azure neural voice name, e.g. "en-US-JennyNeural".
+            audio_format (str): The output format, a key of SPEECH_OUTPUT_FORMATS.
+
+        Yields:
+            SpeechSynthesizer: A synthesizer with no audio output (audio is read from the result).
+        """
+        key = (voice_name, audio_format)
+        with self._semaphore:
+            entry = self._checkout(key)
+            try:
+                yield entry[0]
+            except BaseException:
+                self._close(entry)
+                raise
+            self._checkin(key, entry)
+
+    def speak_ssml(self, voice_name: str, ssml: str, audio_format: str = "wav"):
+        """
+        Synthesizes SSML on a pooled synthesizer.
+
+        Args:
+            voice_name (str): The voice used in the SSML.
+            ssml (str): The SSML document.
+            audio_format (str): The output format, a key of SPEECH_OUTPUT_FORMATS.
+
+        Returns:
+            SpeechSynthesisResult: The SDK result. Synthesizers whose result was not completed are discarded.
+        """
+        import azure.cognitiveservices.speech as speechsdk
+
+        key = (voice_name, audio_format)
+        with self._semaphore:
+            entry = self._checkout(key)
+            try:
+                result = entry[0].speak_ssml_async(ssml).get()
+            except BaseException:
+                self._close(entry)
+                raise
+            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+                self._checkin(key, entry)
+            else:
+                self._close(entry)
+            return result
+
+    def warm_up(self, voice_names, audio_format: str = "wav"):
+        """
+        Creates and connects one idle synthesizer for each voice that has none.
+
+        Args:
+            voice_names (iterable): The voices to prepare.
+            audio_format (str): The output format to prepare them for.
+        """
+        for voice_name in voice_names:
+            if self.idle_count(voice_name, audio_format):
+                continue
+            try:
+                with self.acquire(voice_name, audio_format):
+                    pass
+            except Exception as e:
+                logger.warning(f"Failed to warm up speech synthesizer for {voice_name}: {e}")
+
+
+"""Step 3: Define the shared pool"""
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_speech_synthesizer_pool():
+    """
+    Returns the process-wide synthesizer pool, or None when SPEECH_AI_KEY / SERVICE_REGION are not set.
+    Only a created pool is kept, so setting the variables later takes effect on the next call.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            speech_key = os.environ.get("SPEECH_AI_KEY")
+            service_region = os.environ.get("SERVICE_REGION")
+            if not speech_key or not service_region:
+                return None
+            _pool = SpeechSynthesizerPool(speech_key, service_region)
+        return _pool
+
+
+def warm_up_speech_synthesizers(languages=TTS_WARMUP_LANGUAGES):
+    """
+    Warms the pool up for the given languages in a background thread, so start-up is not delayed.
+
+    Args:
+        languages (iterable): Language codes, mapped to voices with `get_voice_name`.
+
+    Returns:
+        threading.Thread: The warm-up thread, or None when speech is not configured.
+    """
+    from services.text_to_speech_service import get_voice_name
+
+    pool = get_speech_synthesizer_pool()
+    if pool is None:
+        return None
+    voice_names = list(dict.fromkeys(get_voice_name(language) for language in languages))
+    thread = threading.Thread(target=pool.warm_up, args=(voice_names, TTS_DEFAULT_AUDIO_FORMAT), name="tts-warm-up", daemon=True)
+    thread.start()
+    return thread
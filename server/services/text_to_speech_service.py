@@ -4,17 +4,30 @@ This module contains the text-to-speech service that uses the Azure Speech SDK t
 """
 
 """Step 1: Import necessary modules"""
-import azure.cognitiveservices.speech as speechsdk
-import os
 from dotenv import load_dotenv
 import io
 import re
 import emoji
+from services.speech_synthesizer_pool import get_speech_synthesizer_pool
 
 
 load_dotenv()
 
 """Step 2: Define the text-to-speech service"""
+# Output formats requested from the synthesizer, by file extension. WAV is kept for
+# Rhubarb lip-sync; MP3 and Opus are 5-10x smaller for playback.
+SPEECH_OUTPUT_FORMATS = {
+    "wav": "Riff16Khz16BitMonoPcm",
+    "mp3": "Audio24Khz48KBitRateMonoMp3",
+    "ogg": "Ogg24Khz16BitMonoOpus",
+}
+
+AUDIO_MIME_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "ogg": "audio/ogg",
+}
+
 def get_voice_name(preferred_language):
     """
     Returns the appropriate voice name based on the preferred language.
@@ -63,30 +76,30 @@ def clean_text(text):
 
     return text.strip()
 
-def text_to_speech(text_input, preferred_language="en", style="calm"):
+def text_to_speech(text_input, preferred_language="en", style="calm", audio_format="wav"):
     """
     Converts cleaned text to speech using Azure Speech SDK with specified voice and style.
 
     Args:
         text_input (str): The text to be converted to speech.
-        voice_name (str): The name of the voice to use.
+        preferred_language (str): The language code used to pick the voice.
         style (str, optional): The speaking style (e.g., 'calm', 'cheerful').
+        audio_format (str, optional): One of SPEECH_OUTPUT_FORMATS ("wav", "mp3", "ogg").
 
     Returns:
-        bytes: The synthesized audio data in WAV format, or None if synthesis failed.
+        bytes: The synthesized audio data in the requested format, or None if synthesis failed.
     """
     try:
+        import azure.cognitiveservices.speech as speechsdk
+
         # Clean the text input
         cleaned_text = clean_text(text_input)
 
-        # Set up the speech config with your subscription details
-        speech_key = os.environ.get("SPEECH_AI_KEY")
-        service_region = os.environ.get("SERVICE_REGION")
-        if not speech_key or not service_region:
+        # Synthesizers are pooled per voice and reuse their open connection
+        pool = get_speech_synthesizer_pool()
+        if pool is None:
             print("Missing SPEECH_AI_KEY or SERVICE_REGION in environment variables.")
             return None
-        
-        speech_config = speechsdk.SpeechConfig(subscription=speech_key, region=service_region)
 
         # Select voice based on preferred language
         voice_name = get_voice_name(preferred_language)
@@ -115,11 +128,8 @@ def text_to_speech(text_input, preferred_language="en", style="calm"):
             </speak>
             """
 
-        # Create a speech synthesizer
-        synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
-
-        # Use SSML synthesis
-        result = synthesizer.speak_ssml_async(ssml).get()
+        # Use SSML synthesis on a pooled synthesizer
+        result = pool.speak_ssml(voice_name, ssml, audio_format=audio_format)
 
         # Check the result
         if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
@@ -0,0 +1,186 @@
+"""
+This module contains a content-addressed cache for synthesized speech.
+
+Audio files are named tts_<hash(cleaned_text, voice, style)>.<format>, so every turn that
+says the same thing in the same voice points at the same file in `generated_audio` and
+costs no synthesis. The formats of one utterance share a stem, which lets the download
+route pick the one the client prefers; a format can also be encoded from another one already
+on disk (e.g. MP3 from the WAV synthesized for Rhubarb) instead of being synthesized again. Files are kept in the "audio" artifact store, which caps the
+directory in bytes and evicts the least recently used utterances (all formats together) first.
+"""
+
+"""Step 1: Import necessary modules"""
+import hashlib
+import logging
+import os
+import subprocess
+import threading
+from functools import lru_cache
+
+from services.artifact_store import ArtifactStore, get_artifact_store
+from services.text_to_speech_service import clean_text, get_voice_name, text_to_speech
+from utils.consts import TTS_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+GENERATED_AUDIO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'generated_audio'))
+TTS_CACHE_PREFIX = "tts_"
+
+def ffmpeg_transcode(audio_data: bytes, audio_format: str) -> bytes:
+    """
+    Encodes audio to another format in memory, through ffmpeg's stdin and stdout.
+
+    Returns:
+        bytes: The encoded audio, or None if ffmpeg failed.
+    """
+    try:
+        result = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0', '-f', audio_format, 'pipe:1'],
+            input=audio_data, capture_output=True, timeout=60,
+        )
+    except Exception as e:
+        logger.error(f"Failed to run ffmpeg: {e}")
+        return None
+    if result.returncode != 0:
+        logger.error(f"ffmpeg could not encode {audio_format}: {result.stderr.decode(errors='replace')}")
+        return None
+    return result.stdout
+
+
+"""Step 2: Define the cache key"""
+def tts_cache_key(cleaned_text: str, voice_name: str, style: str) -> str:
+    """
+    Builds the content address of an utterance. The audio format is the file extension.
+
+    Args:
+        cleaned_text (str): The text after `clean_text`.
+        voice_name (str): The Azure neural voice name.
+        style (str): The speaking style, or "" for none.
+
+    Returns:
+        str: A sha256 hex digest.
+    """
+    material = "\x1f".join([cleaned_text, voice_name, style or ""])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+"""Step 3: Define the TTSCache class"""
+class TTSCache:
+    """
+    Synthesizes speech into content-addressed files, reusing existing files for repeated utterances.
+    """
+
+    def __init__(self, directory: str = GENERATED_AUDIO_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES, synthesize=None, store: ArtifactStore = None,
+                 transcode=None):
+        """
+        Initializes the cache.
+
+        Args:
+            directory (str): Where audio files are stored and served from.
+            max_bytes (int): The total size of cached files kept on disk.
+            synthesize (callable, optional): Turns (text, preferred_language, style, audio_format) into audio bytes.
+                Defaults to `text_to_speech`.
+            store (ArtifactStore, optional): The store that indexes and evicts the files. Defaults to a
+                store over `directory` with a `max_bytes` quota.
+            transcode (callable, optional): Turns (audio bytes, audio_format) into audio bytes in that
+                format. Defaults to `ffmpeg_transcode`.
+        """
+        self.store = store or ArtifactStore("audio", directory, max_bytes)
+        self.directory = self.store.directory
+        self._synthesize = synthesize or text_to_speech
+        self._transcode = transcode or ffmpeg_transcode
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def filename_for(self, text: str, preferred_language: str = "en", style: str = "calm", audio_format: str = "wav") -> str:
+        """
+        Returns the content-addressed filename an utterance is stored under.
+        """
+        key = tts_cache_key(clean_text(text), get_voice_name(preferred_language), style)
+        return f"{TTS_CACHE_PREFIX}{key}.{audio_format}"
+
+    def get_or_synthesize(self, text: str, preferred_language: str = "en", style: str = "calm", audio_format: str = "wav"):
+        """
+        Returns the filename of the utterance's audio, synthesizing it only on a cache miss.
+
+        Args:
+            text (str): The raw text to speak.
+            preferred_language (str): The language code used to pick the voice.
+            style (str): The speaking style.
+            audio_format (str): The audio format, a key of SPEECH_OUTPUT_FORMATS; also the file extension.
+
+        Returns:
+            str: The filename inside `directory`, or None if synthesis failed.
+        """
+        filename = self.filename_for(text, preferred_language, style, audio_format)
+        return self._get_or_create(
+            filename, lambda: self._synthesize(text, preferred_language=preferred_language, style=style, audio_format=audio_format)
+        )
+
+    def get_or_transcode(self, source_filename: str, audio_format: str):
+        """
+        Returns the filename of an utterance in `audio_format`, encoding it from a cached file of the
+        same utterance (same stem) on a miss. No synthesis is billed for the new format.
+
+        Args:
+            source_filename (str): A file returned by `get_or_synthesize`, e.g. the WAV.
+            audio_format (str): The format wanted; also the file extension.
+
+        Returns:
+            str: The filename inside `directory`, or None if the source is missing or encoding failed.
+        """
+        filename = f"{os.path.splitext(source_filename)[0]}.{audio_format}"
+
+        def transcode():
+            with open(os.path.join(self.directory, source_filename), "rb") as f:
+                return self._transcode(f.read(), audio_format)
+
+        try:
+            return self._get_or_create(filename, transcode)
+        except OSError as e:
+            logger.error(f"Failed to encode {filename} from {source_filename}: {e}")
+            return None
+
+    def _get_or_create(self, filename: str, produce):
+        file_path = os.path.join(self.directory, filename)
+
+        # Identical utterances requested at the same time are produced once
+        with self._lock:
+            key_lock = self._key_locks.setdefault(filename, threading.Lock())
+
+        with key_lock:
+            try:
+                if os.path.isfile(file_path):
+                    self.store.touch(filename)
+                    self.hits += 1
+                    return filename
+
+                self.misses += 1
+                audio_data = produce()
+                if not audio_data:
+                    return None
+
+                # Written atomically, recorded in the index, and older utterances evicted if over quota
+                self.store.write(filename, audio_data)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(filename, None)
+
+        return filename
+
+    def evict(self) -> int:
+        """
+        Deletes the least recently used cached utterances until the cache fits its quota.
+        """
+        return self.store.evict()
+
+
+"""Step 4: Define the shared cache"""
+@lru_cache(maxsize=None)
+def get_tts_cache() -> TTSCache:
+    """
+    Returns the process-wide TTS cache backed by `generated_audio`.
+    """
+    return TTSCache(store=get_artifact_store("audio"))
@@ -133,7 +133,8 @@ class TestAIRoutes:
             with_history=True,
             user_id="user123",
             chat_id=456,
-            turn_id=2
+            turn_id=2,
+            progressive_audio=False
         )
     
     @patch('routes.AI.filetype')
@@ -466,4 +467,159 @@ class TestAIRoutes:
         response = client.get('/ai_mentor/download_audio/../etc/passwd')
         
         # Update assertion to match actual behavior (404 is expected)
-        assert response.status_code == 404
\ No newline at end of file
+        assert response.status_code == 404
+
+    @patch('routes.AI.get_playlist')
+    def test_audio_playlist(self, mock_get_playlist, client):
+        """Test listing the ready chunks of a progressive answer"""
+        playlist = MagicMock(playlist_id="abc", total=3, complete=False, failed=False)
+        playlist.published_filenames.return_value = ["tts_1.wav", "tts_2.wav"]
+        mock_get_playlist.return_value = playlist
+
+        response = client.get('/ai_mentor/audio_playlist/abc')
+
+        assert response.status_code == 200
+        response_data = json.loads(response.data)
+        assert response_data["total"] == 3
+        assert response_data["complete"] is False
+        assert [url.rsplit('/', 1)[1] for url in response_data["chunks"]] == ["tts_1.wav", "tts_2.wav"]
+
+        response = client.get('/ai_mentor/audio_playlist/abc?format=m3u8')
+        body = response.data.decode()
+        assert response.mimetype == 'application/vnd.apple.mpegurl'
+        assert body.startswith("#EXTM3U")
+        assert "tts_2.wav" in body
+        assert "#EXT-X-ENDLIST" not in body
+
+    @patch('routes.AI.get_playlist', return_value=None)
+    def test_audio_playlist_not_found(self, mock_get_playlist, client):
+        """Test an unknown or expired playlist"""
+        response = client.get('/ai_mentor/audio_playlist/missing')
+
+        assert response.status_code == 404
+
+    @patch('routes.AI.send_from_directory')
+    @patch('routes.AI.os.path.isfile')
+    def test_download_audio_negotiates_compressed_format(self, mock_isfile, mock_send_from_directory, client):
+        """Test that a client accepting MP3 gets the MP3 rendition of a WAV link"""
+        mock_send_from_directory.return_value = "File response"
+        mock_isfile.side_effect = lambda path: path.endswith(('tts_abc.mp3', 'tts_abc.ogg'))
+
+        response = client.get('/ai_mentor/download_audio/tts_abc.wav', headers={'Accept': 'audio/mpeg, audio/*;q=0.5'})
+
+        mock_send_from_directory.assert_called_once_with(
+            'generated_audio',
+            'tts_abc.mp3',
+            as_attachment=True,
+            mimetype='audio/mpeg'
+        )
+        assert response.headers['Vary'] == 'Accept'
+
+        mock_send_from_directory.reset_mock()
+        client.get('/ai_mentor/download_audio/tts_abc.wav?format=ogg')
+        assert mock_send_from_directory.call_args[0][1] == 'tts_abc.ogg'
+
+        mock_send_from_directory.reset_mock()
+        client.get('/ai_mentor/download_audio/tts_abc.wav', headers={'Accept': '*/*'})
+        assert mock_send_from_directory.call_args[0][1] == 'tts_abc.wav'
+
+
+class FakeRecognition:
+    """Stands in for the Azure continuous recognizer."""
+    instances = []
+
+    def __init__(self, on_partial, on_segment, language=None, encoding="webm", context=None):
+        self.on_partial = on_partial
+        self.on_segment = on_segment
+        self.language = language
+        self.encoding = encoding
+        self.context = context or {}
+        self.chunks = []
+        self.aborted = False
+        FakeRecognition.instances.append(self)
+
+    def start(self):
+        pass
+
+    def write(self, chunk):
+        self.chunks.append(chunk)
+        self.on_partial("what is")
+
+    def finish(self):
+        self.on_segment("what is photosynthesis")
+        return "what is photosynthesis"
+
+    def abort(self):
+        self.aborted = True
+
+
+class TestVoiceStreaming:
+
+    @pytest.fixture
+    def socket_client(self, app):
+        from flask_socketio import SocketIOTestClient
+        from utils.socketIo import socketio
+        app.config['SECRET_KEY'] = 'test_secret_key'
+        socketio.init_app(app, async_mode='threading')
+        FakeRecognition.instances = []
+        with patch('routes.AI.StreamingRecognition', FakeRecognition):
+            yield SocketIOTestClient(app, socketio)
+
+    @staticmethod
+    def wait_for(socket_client, name, timeout=2.0):
+        import time
+        received = []
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            received += socket_client.get_received()
+            if any(packet['name'] == name for packet in received):
+                break
+            time.sleep(0.01)
+        return received
+
+    def test_partial_and_final_transcripts(self, socket_client):
+        """Test that chunks produce partial results and voice_stop the final transcript"""
+        socket_client.emit('voice_start', {'language': 'en-US'})
+        socket_client.emit('voice_chunk', b'\x1a\x45\xdf\xa3')
+        socket_client.emit('voice_chunk', b'\x00\x01')
+        socket_client.emit('voice_stop')
+
+        received = self.wait_for(socket_client, 'voice_final')
+        names = [packet['name'] for packet in received]
+        assert names[0] == 'voice_started'
+        assert {'name': 'voice_partial', 'args': [{'text': 'what is', 'is_final': False}], 'namespace': '/'} in received
+        assert {'name': 'voice_partial', 'args': [{'text': 'what is photosynthesis', 'is_final': True}], 'namespace': '/'} in received
+        assert received[-1]['args'][0] == {'text': 'what is photosynthesis'}
+        session = FakeRecognition.instances[0]
+        assert session.language == 'en-US'
+        assert session.chunks == [b'\x1a\x45\xdf\xa3', b'\x00\x01']
+
+    @patch('routes.AI.get_chat_agent')
+    def test_final_transcript_is_sent_to_agent(self, mock_get_chat_agent, socket_client):
+        """Test that the final transcript can go straight to the chat agent"""
+        mock_get_chat_agent.return_value.run.return_value = {"message": "Plants turn light into energy."}
+
+        socket_client.emit('voice_start', {'send_to_agent': True, 'user_id': 'user123', 'chat_id': 4, 'turn_id': 2})
+        socket_client.emit('voice_chunk', b'\x00')
+        socket_client.emit('voice_stop')
+
+        received = self.wait_for(socket_client, 'voice_agent_response')
+        assert received[-1]['args'][0] == {"message": "Plants turn light into energy."}
+        mock_get_chat_agent.assert_called_once_with('user123', 4)
+        mock_get_chat_agent.return_value.run.assert_called_once_with(
+            message='what is photosynthesis', with_history=True, user_id='user123', chat_id=4, turn_id=3
+        )
+
+    def test_chunk_without_session(self, socket_client):
+        """Test sending audio before voice_start"""
+        socket_client.emit('voice_chunk', b'\x00')
+
+        received = socket_client.get_received()
+        assert received[0]['name'] == 'error'
+
+    def test_disconnect_aborts_session(self, socket_client):
+        """Test that an open session is dropped when the client leaves"""
+        socket_client.emit('voice_start', {})
+        socket_client.disconnect()
+
+        assert FakeRecognition.instances[0].aborted
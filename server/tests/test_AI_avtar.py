@@ -0,0 +1,44 @@
+import pytest
+from unittest.mock import patch
+from flask import Flask
+from routes.AI_avtar import ai_avtar_routes
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.register_blueprint(ai_avtar_routes)
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def audio_dir(tmp_path):
+    (tmp_path / "tts_abc.mp3").write_bytes(b"ID3" + b"\x00" * 997)
+    with patch('routes.AI_avtar.GENERATED_AUDIO_DIR', str(tmp_path)):
+        yield tmp_path
+
+class TestAvatarAudioStreaming:
+
+    def test_stream_avatar_audio(self, client, audio_dir):
+        """Test that avatar audio is served inline as MP3"""
+        response = client.get('/ai_mentor_avtar/audio/tts_abc.mp3')
+
+        assert response.status_code == 200
+        assert response.mimetype == 'audio/mpeg'
+        assert 'attachment' not in response.headers.get('Content-Disposition', '')
+        assert len(response.data) == 1000
+
+    def test_stream_avatar_audio_range(self, client, audio_dir):
+        """Test that players can seek with range requests"""
+        response = client.get('/ai_mentor_avtar/audio/tts_abc.mp3', headers={'Range': 'bytes=0-99'})
+
+        assert response.status_code == 206
+        assert len(response.data) == 100
+
+    def test_stream_avatar_audio_rejects_other_files(self, client, audio_dir):
+        """Test that only audio files can be streamed"""
+        assert client.get('/ai_mentor_avtar/audio/tts_abc.json').status_code == 400
+        assert client.get('/ai_mentor_avtar/audio/missing.mp3').status_code == 404
@@ -0,0 +1,64 @@
+import os
+import time
+import pytest
+from services.artifact_store import ArtifactStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore("images", str(tmp_path / "generated_images"), max_bytes=250, max_age_seconds=3600)
+
+
+def test_writes_are_indexed_and_least_recently_used_evicted(store):
+    store.write("a.png", b"x" * 100)
+    store.write("b.png", b"x" * 100)
+    store.touch("a.png")
+    store.write("c.png", b"x" * 100)
+
+    assert sorted(os.listdir(store.directory)) == ["a.png", "c.png"]
+    assert store.total_bytes() == 200
+    assert os.path.isfile(store.index_path) and not store.index_path.startswith(store.directory + os.sep)
+
+
+def test_files_with_one_stem_are_one_entry(store):
+    store.write("tts_1.mp3", b"x" * 60)
+    store.write("tts_1.wav", b"x" * 60)
+    store.write("tts_2.mp3", b"x" * 60)
+    store.write("tts_3.mp3", b"x" * 100)
+
+    assert sorted(os.listdir(store.directory)) == ["tts_2.mp3", "tts_3.mp3"]
+    assert store.total_bytes() == 160
+
+
+def test_rewriting_a_file_counts_its_new_size(store):
+    store.write("doc.pdf", b"x" * 100)
+    store.write("doc.pdf", b"x" * 40)
+
+    assert store.total_bytes() == 40
+
+
+def test_cleanup_removes_only_expired_entries(store):
+    store.write("old.png", b"x")
+    store.write("new.png", b"x")
+    connection = store._connect()
+    with connection:
+        connection.execute("UPDATE entries SET accessed_at = ? WHERE stem = 'old'", (time.time() - 7200,))
+
+    assert store.cleanup() == 1
+    assert os.listdir(store.directory) == ["new.png"]
+
+
+def test_reconcile_indexes_existing_files_and_forgets_missing_ones(store):
+    store.write("gone.png", b"x" * 10)
+    os.remove(store.path_for("gone.png"))
+    with open(store.path_for("legacy.png"), "wb") as f:
+        f.write(b"x" * 30)
+
+    assert store.reconcile() == 1
+    assert store.total_bytes() == 30
+
+    # A second store over the same directory shares the index, as another worker would
+    other = ArtifactStore("images", store.directory, max_bytes=250)
+    other.write("fresh.png", b"x" * 230)
+    assert os.listdir(store.directory) == ["fresh.png"]
+    assert store.total_bytes() == 230
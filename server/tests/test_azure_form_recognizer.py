@@ -0,0 +1,113 @@
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from unittest.mock import patch
+from services.azure_form_recognizer import count_pdf_pages, page_ranges, try_form_recognizer
+from utils.consts import PDF_MAX_STREAM_BYTES
+
+
+def make_pdf(page_count, compressed=False):
+    """Builds just enough of a PDF for the page counter: a page tree root and its pages."""
+    tree = f"<< /Type /Pages /Kids [3 0 R] /Count {page_count} >>".encode()
+    pages = b"".join(b"<< /Type /Page /Parent 2 0 R >>" for _ in range(page_count))
+    if compressed:
+        stream = zlib.compress(b"2 0 3 40 " + tree + pages)
+        header = f"1 0 obj\n<< /Type /ObjStm /N 2 /First 8 /Filter /FlateDecode /Length {len(stream)} >>\nstream\n".encode()
+        return b"%PDF-1.7\n" + header + stream + b"\nendstream\nendobj\n"
+    return b"%PDF-1.4\n2 0 obj\n" + tree + b"\nendobj\n" + pages
+
+
+class FakeFormRecognizer:
+    """Answers begin_analyze_document with one line per requested page."""
+
+    def __init__(self, page_count, delay=0.0):
+        self.page_count = page_count
+        self.delay = delay
+        self.requested = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def begin_analyze_document(self, model_id, document, content_type, pages=None):
+        with self.lock:
+            self.requested.append(pages)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        first, last = map(int, pages.split("-")) if pages else (1, self.page_count)
+        # Later ranges finish first, so the order of the output comes from the assembly
+        time.sleep(self.delay * (self.page_count - first) / self.page_count)
+        with self.lock:
+            self.active -= 1
+        result = SimpleNamespace(pages=[
+            SimpleNamespace(page_number=number, lines=[SimpleNamespace(content=f"page {number}")])
+            for number in reversed(range(first, min(last, self.page_count) + 1))
+        ])
+        return SimpleNamespace(result=lambda: result)
+
+
+def test_count_pdf_pages_reads_the_page_tree():
+    assert count_pdf_pages(make_pdf(12)) == 12
+    assert count_pdf_pages(make_pdf(30, compressed=True)) == 30
+    assert count_pdf_pages(b"\x89PNG not a pdf") is None
+
+
+def test_count_pdf_pages_does_not_inflate_oversized_object_streams():
+    tree = zlib.compress(b"2 0 << /Type /Pages /Kids [3 0 R] /Count 7 >>" + b" " * PDF_MAX_STREAM_BYTES)
+    bomb = b"%PDF-1.7\n1 0 obj\n<< /Type /ObjStm /N 1 /First 4 /Filter /FlateDecode >>\nstream\n" + tree + b"\nendstream\nendobj\n"
+
+    assert count_pdf_pages(bomb) is None
+
+
+def test_page_ranges_cover_every_page_once():
+    assert page_ranges(20, 8) == ["1-8", "9-16", "17-20"]
+    assert page_ranges(3, 8) == ["1-3"]
+
+
+def test_large_pdf_is_analyzed_in_parallel_ranges_in_page_order():
+    client = FakeFormRecognizer(page_count=20, delay=0.05)
+    with patch("services.azure_form_recognizer.get_form_recognizer_client", return_value=client), \
+         patch("services.azure_form_recognizer.FORM_RECOGNIZER_PAGES_PER_REQUEST", 4):
+        text = try_form_recognizer(make_pdf(20), "application/pdf", token_budget=None)
+
+    assert text == "".join(f"page {number}\n" for number in range(1, 21))
+    assert sorted(client.requested) == sorted(["1-4", "5-8", "9-12", "13-16", "17-20"])
+    assert client.max_active > 1
+
+
+def test_failed_range_is_retried_and_then_skipped():
+    class FlakyFormRecognizer(FakeFormRecognizer):
+        def begin_analyze_document(self, model_id, document, content_type, pages=None):
+            if pages == "5-8":
+                with self.lock:
+                    self.requested.append(pages)
+                raise RuntimeError("service unavailable")
+            return super().begin_analyze_document(model_id, document, content_type, pages)
+
+    client = FlakyFormRecognizer(page_count=12)
+    with patch("services.azure_form_recognizer.get_form_recognizer_client", return_value=client), \
+         patch("services.azure_form_recognizer.FORM_RECOGNIZER_PAGES_PER_REQUEST", 4):
+        text = try_form_recognizer(make_pdf(12), "application/pdf", token_budget=None)
+
+    assert text.splitlines() == [f"page {number}" for number in [1, 2, 3, 4, 9, 10, 11, 12]]
+    assert client.requested.count("5-8") == 2
+
+
+def test_page_cap_and_token_budget_stop_early():
+    client = FakeFormRecognizer(page_count=40)
+    with patch("services.azure_form_recognizer.get_form_recognizer_client", return_value=client), \
+         patch("services.azure_form_recognizer.FORM_RECOGNIZER_PAGES_PER_REQUEST", 4):
+        capped = try_form_recognizer(make_pdf(40), "application/pdf", max_pages=10, token_budget=None)
+        budgeted = try_form_recognizer(make_pdf(40), "application/pdf", token_budget=5)
+
+    assert capped.splitlines()[-1] == "page 10"
+    # "page N\n" is 7 characters, so 20 characters (5 tokens) are reached on the third page
+    assert budgeted.splitlines() == ["page 1", "page 2", "page 3"]
+
+
+def test_short_document_is_one_request():
+    client = FakeFormRecognizer(page_count=2)
+    with patch("services.azure_form_recognizer.get_form_recognizer_client", return_value=client):
+        assert try_form_recognizer(b"\x89PNG", "image/png") == "page 1\npage 2\n"
+
+    assert client.requested == [None]
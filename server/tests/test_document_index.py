@@ -0,0 +1,110 @@
+import pytest
+import mongomock
+from datetime import datetime, timedelta
+from services import document_index
+from services.document_index import SessionDocumentIndex, clear_document_index_memory, format_document_context
+
+TOPICS = ["mitochondria", "photosynthesis", "osmosis", "enzymes", "ribosomes", "meiosis"]
+
+
+class KeywordEmbeddings:
+    """Embeds a text as its counts of a few topic words and records every call."""
+
+    def __init__(self):
+        self.documents = 0
+        self.queries = 0
+
+    def embed_documents(self, texts):
+        self.documents += len(texts)
+        return [[text.lower().count(topic) for topic in TOPICS] for text in texts]
+
+    def embed_query(self, text):
+        self.queries += 1
+        return [text.lower().count(topic) for topic in TOPICS]
+
+
+def lecture_notes():
+    # One paragraph per topic, each longer than a chunk's overlap so chunks stay on topic
+    return "\n\n".join(f"{topic.capitalize()} notes. " + f"{topic} " * 120 for topic in TOPICS)
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_tier():
+    clear_document_index_memory()
+    yield
+    clear_document_index_memory()
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient()["test_db"]["session_documents"]
+
+
+def test_search_returns_the_chunks_relevant_to_the_message(collection):
+    embeddings = KeywordEmbeddings()
+    index = SessionDocumentIndex(embeddings=embeddings, collection=collection, top_k=2)
+
+    assert index.add_document("u1-1", "hash-notes", lecture_notes()) >= len(TOPICS)
+    chunks = index.search("u1-1", "Can you explain osmosis again?")
+
+    assert len(chunks) == 2
+    assert "osmosis" in chunks[0]
+    assert index.search("u1-2", "osmosis") == []
+
+
+def test_documents_survive_the_memory_tier_with_a_ttl(collection):
+    SessionDocumentIndex(embeddings=KeywordEmbeddings(), collection=collection).add_document("u1-1", "hash-notes", lecture_notes())
+    clear_document_index_memory()
+    index = SessionDocumentIndex(embeddings=KeywordEmbeddings(), collection=collection, top_k=1)
+
+    assert "enzymes" in index.search("u1-1", "what do enzymes do")[0]
+
+    stored = collection.find_one({"_id": "u1-1:hash-notes"})
+    assert stored["expires_at"] > datetime.utcnow() + timedelta(hours=1)
+    collection.update_many({}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+    clear_document_index_memory()
+    assert index.search("u1-1", "what do enzymes do") == []
+
+
+def test_small_documents_are_returned_whole_without_embedding(collection):
+    embeddings = KeywordEmbeddings()
+    index = SessionDocumentIndex(embeddings=embeddings, collection=collection, top_k=4)
+    index.add_document("u1-1", "hash-short", "Quiz on Friday: chapters 3 and {4}.")
+    index.add_document("u1-1", "hash-short", "Quiz on Friday: chapters 3 and {4}.")
+
+    assert index.search("u1-1", "when is the quiz?") == ["Quiz on Friday: chapters 3 and {4}."]
+    assert (embeddings.documents, embeddings.queries) == (0, 0)
+    assert collection.count_documents({}) == 1
+    assert "{4}" in format_document_context(["Quiz on Friday: chapters 3 and {4}."])
+
+
+def test_sessions_without_documents_are_not_looked_up_on_every_turn(collection):
+    index = SessionDocumentIndex(embeddings=KeywordEmbeddings(), collection=collection)
+    lookups = []
+    find = collection.find
+    collection.find = lambda *args, **kwargs: lookups.append(args) or find(*args, **kwargs)
+
+    for _ in range(3):
+        assert index.search("u1-1", "hello") == []
+    assert len(lookups) == 1
+
+    index.add_document("u1-1", "hash-short", "Quiz on Friday.")
+    assert index.search("u1-1", "when is the quiz?") == ["Quiz on Friday."]
+
+
+def test_active_sessions_pick_up_files_uploaded_through_other_workers(collection):
+    embeddings = KeywordEmbeddings()
+    index = SessionDocumentIndex(embeddings=embeddings, collection=collection, top_k=1)
+    index.add_document("u1-1", "hash-notes", lecture_notes())
+    assert "osmosis" in index.search("u1-1", "osmosis")[0]
+    vectors_built = embeddings.documents
+
+    # Another worker stores a second file for the same session
+    SessionDocumentIndex(embeddings=KeywordEmbeddings(), collection=collection)._save(
+        "u1-1", document_index.IndexedDocument("hash-glossary", ["Glossary: chloroplast and chlorophyll."]))
+    document_index._checked_sessions.clear()  # the refresh interval passes
+
+    assert index.search("u1-1", "chloroplast", k=100)[-1] == "Glossary: chloroplast and chlorophyll."
+    # The first file's vectors were kept; only the new chunk is embedded
+    assert "meiosis" in index.search("u1-1", "meiosis")[0]
+    assert embeddings.documents == vectors_built + 1
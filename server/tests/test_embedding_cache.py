@@ -0,0 +1,98 @@
+import threading
+import time
+import pytest
+import mongomock
+from langchain_core.embeddings import Embeddings
+from services.embedding_cache import (
+    CacheBackedEmbeddings,
+    clear_embedding_memory_cache,
+    embedding_cache_key,
+)
+
+
+class FakeEmbeddings(Embeddings):
+    """Returns the text length as a one-dimensional vector and records every call."""
+
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        time.sleep(self.delay)
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_cache():
+    clear_embedding_memory_cache()
+    yield
+    clear_embedding_memory_cache()
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient()["test_db"]["embedding_cache"]
+
+
+class TestCacheBackedEmbeddings:
+
+    def test_repeated_texts_are_embedded_once(self, collection):
+        """Test that duplicates within and across calls hit the model once."""
+        fake = FakeEmbeddings()
+        embeddings = CacheBackedEmbeddings(fake, "test-model", batch_size=10, collection=collection)
+
+        assert embeddings.embed_documents(["a", "bb", "a"]) == [[1.0], [2.0], [1.0]]
+        assert embeddings.embed_query("bb") == [2.0]
+
+        assert fake.calls == [["a", "bb"]]
+
+    def test_misses_are_batched_by_chunk_size(self, collection):
+        """Test that misses are split into requests of at most batch_size texts."""
+        fake = FakeEmbeddings()
+        embeddings = CacheBackedEmbeddings(fake, "test-model", batch_size=2, collection=collection)
+
+        embeddings.embed_documents(["a", "b", "c", "d", "e"])
+
+        assert [len(call) for call in fake.calls] == [2, 2, 1]
+
+    def test_mongo_tier_survives_memory_eviction(self, collection):
+        """Test that vectors are read back from MongoDB once the LRU is empty."""
+        fake = FakeEmbeddings()
+        embeddings = CacheBackedEmbeddings(fake, "test-model", collection=collection)
+        embeddings.embed_documents(["hello"])
+
+        clear_embedding_memory_cache()
+        assert embeddings.embed_query("hello") == [5.0]
+
+        assert len(fake.calls) == 1
+        assert collection.find_one({"_id": embedding_cache_key("test-model", "hello")})["model"] == "test-model"
+
+    def test_keys_are_namespaced_by_model(self, collection):
+        """Test that the same text is re-embedded for a different model."""
+        fake = FakeEmbeddings()
+        CacheBackedEmbeddings(fake, "model-a", collection=collection).embed_query("text")
+        CacheBackedEmbeddings(fake, "model-b", collection=collection).embed_query("text")
+
+        assert len(fake.calls) == 2
+
+    def test_concurrent_requests_are_coalesced(self, collection):
+        """Test that parallel callers asking for the same text share one request."""
+        fake = FakeEmbeddings(delay=0.2)
+        embeddings = CacheBackedEmbeddings(fake, "test-model", collection=collection)
+        results = []
+
+        threads = [
+            threading.Thread(target=lambda: results.append(embeddings.embed_query("shared")))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [[6.0]] * 5
+        assert len(fake.calls) == 1
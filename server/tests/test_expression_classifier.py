@@ -0,0 +1,62 @@
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from agents.meme_mingle_agent_avtar import MemeMingleAIAgent
+from services.expression_classifier import ANIMATIONS, FACIAL_EXPRESSIONS, classify_expression
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Congratulations on passing your exam! 🎉", ("smile", "Rumba")),
+    ("Haha, here's a joke for you: why was the math book sad? It had too many problems.", ("funnyFace", "Laughing")),
+    ("I'm sorry to hear you're feeling stressed about your exams.", ("sad", "Talking_0")),
+    ("I'm so sorry for your loss, my condolences.", ("sad", "Crying")),
+    ("Wow, did you know octopuses have three hearts?", ("surprised", "Talking_2")),
+    ("That sounds scary, I would be afraid too.", ("surprised", "Terrified")),
+])
+def test_moods_map_to_expression_and_animation(text, expected):
+    prediction = classify_expression(text)
+
+    assert (prediction.facial_expression, prediction.animation) == expected
+    assert prediction.confidence >= 0.6
+
+
+def test_neutral_answer_talks_with_default_face():
+    text = "Photosynthesis converts light into chemical energy stored in glucose."
+    prediction = classify_expression(text)
+
+    assert prediction.mood == "neutral"
+    assert prediction.facial_expression == "default"
+    assert prediction.animation in ("Talking_0", "Talking_1", "Talking_2")
+    assert classify_expression(text).animation == prediction.animation
+
+
+def test_negated_cues_are_ignored():
+    assert classify_expression("Don't be sad, let's review the chapter together.").mood == "neutral"
+
+
+def test_outputs_are_valid_options_and_fast():
+    text = "Great question! " + "The mitochondria is the powerhouse of the cell. " * 30
+    started = time.perf_counter()
+    prediction = classify_expression(text)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    assert prediction.facial_expression in FACIAL_EXPRESSIONS
+    assert prediction.animation in ANIMATIONS
+    assert elapsed_ms < 5
+
+
+def test_llm_is_only_asked_when_unsure_and_enabled():
+    agent = MagicMock()
+    agent.determine_facial_expression_and_animation_with_llm.return_value = {"facial_expression": "smile", "animation": "Idle"}
+    unsure = "Great question! The mitochondria is the powerhouse of the cell."
+
+    with patch.dict("os.environ", {"EXPRESSION_LLM_FALLBACK": "true"}):
+        confident = MemeMingleAIAgent.determine_facial_expression_and_animation(agent, "Congratulations! 🎉")
+        fallback = MemeMingleAIAgent.determine_facial_expression_and_animation(agent, unsure)
+    with patch.dict("os.environ", {"EXPRESSION_LLM_FALLBACK": "false"}):
+        local = MemeMingleAIAgent.determine_facial_expression_and_animation(agent, unsure)
+
+    assert confident == {"facial_expression": "smile", "animation": "Rumba"}
+    assert fallback == {"facial_expression": "smile", "animation": "Idle"}
+    assert local == {"facial_expression": "smile", "animation": "Talking_1"}
+    agent.determine_facial_expression_and_animation_with_llm.assert_called_once_with(unsure)
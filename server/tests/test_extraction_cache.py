@@ -0,0 +1,93 @@
+import threading
+import time
+import pytest
+import mongomock
+from unittest.mock import patch
+from services.extraction_cache import ExtractionCache, clear_extraction_memory_cache, extraction_cache_key
+from services.azure_form_recognizer import extract_text_from_file
+
+
+class FakeExtractor:
+    """Returns the decoded bytes and records every call."""
+
+    def __init__(self, delay=0.0, text=None):
+        self.calls = []
+        self.delay = delay
+        self.text = text
+
+    def __call__(self, file_content, file_mime_type):
+        self.calls.append((file_content, file_mime_type))
+        time.sleep(self.delay)
+        return self.text if self.text is not None else file_content.decode()
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_cache():
+    clear_extraction_memory_cache()
+    yield
+    clear_extraction_memory_cache()
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient()["test_db"]["extraction_cache"]
+
+
+class TestExtractionCache:
+
+    def test_repeat_upload_is_extracted_once(self, collection):
+        """Test that the same bytes and MIME type hit the extractor once."""
+        extract = FakeExtractor()
+        cache = ExtractionCache(collection=collection)
+
+        assert cache.get_or_extract(b"syllabus", "application/pdf", extract) == "syllabus"
+        assert cache.get_or_extract(b"syllabus", "application/pdf", extract) == "syllabus"
+        cache.get_or_extract(b"syllabus", "text/plain", extract)
+
+        assert extract.calls == [(b"syllabus", "application/pdf"), (b"syllabus", "text/plain")]
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_mongo_tier_survives_the_memory_tier(self, collection):
+        """Test that another worker (empty memory) reuses the stored text."""
+        ExtractionCache(collection=collection).get_or_extract(b"slides", "image/png", FakeExtractor())
+        clear_extraction_memory_cache()
+        extract = FakeExtractor()
+
+        assert ExtractionCache(collection=collection).get_or_extract(b"slides", "image/png", extract) == "slides"
+        assert extract.calls == []
+        assert collection.find_one({"_id": extraction_cache_key(b"slides", "image/png")})["mime_type"] == "image/png"
+
+    def test_empty_results_are_not_cached(self, collection):
+        """Test that a failed extraction is retried on the next upload."""
+        cache = ExtractionCache(collection=collection)
+        cache.get_or_extract(b"scan", "image/png", FakeExtractor(text="  "))
+        extract = FakeExtractor()
+
+        assert cache.get_or_extract(b"scan", "image/png", extract) == "scan"
+        assert len(extract.calls) == 1
+
+    def test_concurrent_uploads_share_one_extraction(self, collection):
+        """Test that simultaneous uploads of one file wait for a single extraction."""
+        extract = FakeExtractor(delay=0.05)
+        cache = ExtractionCache(collection=collection)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_extract(b"deck", "application/pdf", extract)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["deck"] * 5
+        assert len(extract.calls) == 1
+
+    def test_extract_text_from_file_uses_the_cache(self, collection):
+        """Test that the public entry point goes through the shared cache."""
+        with patch("services.azure_form_recognizer.get_extraction_cache", return_value=ExtractionCache(collection=collection)), \
+             patch("services.azure_form_recognizer.try_form_recognizer", return_value="page text\n") as mock_form_recognizer:
+            assert extract_text_from_file(b"%PDF-1.7", "application/pdf") == "page text\n"
+            assert extract_text_from_file(b"%PDF-1.7", "application/pdf") == "page text\n"
+
+        mock_form_recognizer.assert_called_once()
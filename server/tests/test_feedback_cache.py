@@ -0,0 +1,35 @@
+import mongomock
+from datetime import datetime, timedelta
+from services.feedback_cache import FeedbackCache, clear_feedback_memory_cache, feedback_cache_key
+
+MISTAKE = {"question_id": "q1", "question": "Capital of France?", "user_answer": "Lyon", "correct_answer": "Paris"}
+
+
+def test_keys_ignore_case_spacing_and_trailing_punctuation_but_not_language():
+    key = feedback_cache_key("Capital of France?", "Paris", "Lyon", "English")
+
+    assert feedback_cache_key("Capital of France?", "Paris", "  lyon. ", "English") == key
+    assert feedback_cache_key("Capital of France?", "Paris", "Lyon", "Spanish") != key
+    assert feedback_cache_key("Capital of Spain?", "Madrid", "Lyon", "English") != key
+
+
+def test_feedback_is_shared_across_quizzes_until_it_expires():
+    clear_feedback_memory_cache()
+    collection = mongomock.MongoClient()["test_db"]["feedback_cache"]
+    FeedbackCache(collection=collection).put_many(
+        [MISTAKE, dict(MISTAKE, question_id="q2", user_answer="Nice")],
+        {"q1": "Lyon is a large city, but Paris is the capital.", "q2": "No feedback available."},
+        "English",
+        skip=("No feedback available.",),
+    )
+    clear_feedback_memory_cache()
+    cache = FeedbackCache(collection=collection)
+
+    # Another quiz asking the same question under a different id
+    assert cache.get_many([dict(MISTAKE, question_id="other-quiz-q7")], "English") == {"other-quiz-q7": "Lyon is a large city, but Paris is the capital."}
+    assert cache.get_many([dict(MISTAKE, user_answer="Nice")], "English") == {}
+    assert (cache.hits, cache.misses, cache.hit_rate) == (1, 1, 0.5)
+
+    collection.update_many({}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+    clear_feedback_memory_cache()
+    assert cache.get_many([MISTAKE], "English") == {}
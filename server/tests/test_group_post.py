@@ -4,12 +4,15 @@ import pytest
 import json
 from unittest.mock import patch, MagicMock
 from flask import Flask
-from flask_socketio import SocketIOTestClient
+from flask_socketio import SocketIO, SocketIOTestClient
 from bson import ObjectId
+import time
+import uuid
 from routes.group_post import group_posts_routes
 from utils.socketIo import socketio
 from models.group_post import GroupPost
 from pydantic import ValidationError
+from utils.socketio_queue import LocalPubSubManager
 
 # Fix for the Socket.IO test - need to ensure proper connections
 @pytest.fixture
@@ -130,6 +133,36 @@ class TestGroupPostSocketEvents:
         assert received[0]['args'][0]['post_id'] == '507f1f77bcf86cd799439011'
         assert received[0]['args'][0]['comment'] == 'This is a test comment'
 
+    @patch('routes.group_post.MongoDBClient')
+    def test_toggle_like_post_only_reaches_group_room(self, mock_mongodb, app):
+        """Like events go to the post's group room, not to every connected client"""
+        mock_db = MagicMock()
+        mock_client = MagicMock()
+        mock_mongodb.get_client.return_value = mock_client
+        mock_mongodb.get_db_name.return_value = "test_db"
+        mock_client.__getitem__.return_value = mock_db
+        mock_collection = MagicMock()
+        mock_db.__getitem__.return_value = mock_collection
+        mock_collection.find_one.side_effect = [
+            {'_id': 'post123', 'group_id': 'group456', 'liked_by': [], 'likes': 0},
+            {'_id': 'post123', 'group_id': 'group456', 'liked_by': ['user789'], 'likes': 1},
+        ]
+        mock_collection.update_one.return_value.modified_count = 1
+
+        member = SocketIOTestClient(app, socketio)
+        outsider = SocketIOTestClient(app, socketio)
+        member.emit('join_group_room', {'group_id': 'group456', 'user_id': 'user789'})
+        outsider.emit('join_group_room', {'group_id': 'other_group', 'user_id': 'user000'})
+        member.get_received()
+        outsider.get_received()
+
+        member.emit('toggle_like_post', {'post_id': 'post123', 'user_id': 'user789'})
+
+        received = member.get_received()
+        assert [r['name'] for r in received] == ['post_liked']
+        assert received[0]['args'][0] == {'post_id': 'post123', 'user_id': 'user789', 'likes': 1}
+        assert outsider.get_received() == []
+
     def test_comment_post_missing_data(self, socket_client):
         """Test commenting on a post with missing data"""
         socket_client.emit('comment_post', {})
@@ -300,4 +333,61 @@ class TestGroupPostHTTPRoutes:
         assert response.status_code == 500
         response_data = json.loads(response.data)
         assert 'error' in response_data
-        assert 'Database error' in response_data['error']
\ No newline at end of file
+        assert 'Database error' in response_data['error']
+
+
+class TestGroupPostMultiWorker:
+
+    @pytest.fixture
+    def worker_apps(self):
+        """Two Socket.IO servers (stand-ins for two workers) sharing one message queue"""
+        channel = f"test-{uuid.uuid4().hex}"
+
+        app_a = Flask("worker_a")
+        app_a.config['TESTING'] = True
+        app_a.register_blueprint(group_posts_routes)
+        socketio.init_app(app_a, async_mode='threading', client_manager=LocalPubSubManager(channel=channel))
+
+        app_b = Flask("worker_b")
+        socketio_b = SocketIO(app_b, async_mode='threading', client_manager=LocalPubSubManager(channel=channel))
+
+        yield app_a, socketio_b
+
+        # Later fixtures re-use the global socketio; don't leak the queue into them
+        socketio.server_options.pop('client_manager', None)
+
+    @patch('routes.group_post.User')
+    @patch('routes.group_post.MongoDBClient')
+    def test_new_post_reaches_client_on_other_worker(self, mock_mongodb, mock_user, worker_apps):
+        """A post created on worker A is delivered to a client connected to worker B"""
+        app_a, socketio_b = worker_apps
+        mock_user.find_by_id.return_value = {'_id': 'user123', 'name': 'Test User'}
+
+        # The SocketIO test client refuses to run with a message queue, so register a
+        # client in worker B's group room directly and capture what B sends to it
+        manager_b = socketio_b.server.manager
+        manager_b.initialize()
+        sid = manager_b.connect('eio-client-b', '/')
+        manager_b.enter_room(sid, '/', 'group_group456')
+        sent = []
+        socketio_b.server._send_eio_packet = lambda eio_sid, pkt: sent.append((eio_sid, pkt.data))
+
+        response = app_a.test_client().post(
+            '/group_posts',
+            data=json.dumps({'user_id': 'user123', 'group_id': 'group456', 'content': 'Hello from worker A'}),
+            content_type='application/json'
+        )
+        assert response.status_code == 201
+
+        # Delivery goes through the queue's listener thread, so give it a moment
+        deadline = time.time() + 2
+        while not sent and time.time() < deadline:
+            time.sleep(0.05)
+
+        assert len(sent) == 1
+        eio_sid, payload = sent[0]
+        assert eio_sid == 'eio-client-b'
+        event, post = json.loads(payload[payload.index('['):])
+        assert event == 'new_group_post'
+        assert post['content'] == 'Hello from worker A'
+        assert post['group_id'] == 'group456'
@@ -0,0 +1,71 @@
+import wave
+import pytest
+from unittest.mock import patch
+from services.lipsync import audio_duration, estimate_mouth_cues, get_lipsync_engine, text_lipsync, text_to_visemes
+from utils.lipsync_benchmark import frame_agreement
+
+
+def write_wav(path, seconds, rate=16000):
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(b"\x00\x00" * int(rate * seconds))
+
+
+def test_visemes_follow_spelling():
+    shapes = [shape for shape, _ in text_to_visemes("Mom, food!")]
+
+    assert shapes == ["A", "E", "A", "X", "G", "F", "B", "X"]
+
+
+def test_cues_cover_the_audio_without_gaps():
+    cues = estimate_mouth_cues("Hello there, how are you today?", 2.0)
+
+    assert cues[0]["start"] == 0 and cues[0]["value"] == "X"
+    assert cues[-1]["end"] == 2.0 and cues[-1]["value"] == "X"
+    for previous, cue in zip(cues, cues[1:]):
+        assert previous["end"] == cue["start"]
+        assert previous["value"] != cue["value"]
+    assert {"B", "C", "F", "H"} <= {cue["value"] for cue in cues}
+
+
+def test_word_timings_place_shapes_inside_words():
+    cues = estimate_mouth_cues("", 1.0, word_timings=[{"text": "map", "offset": 0.5, "duration": 0.3}])
+
+    assert cues[0] == {"start": 0.0, "end": 0.5, "value": "X"}
+    assert cues[-1] == {"start": 0.8, "end": 1.0, "value": "X"}
+
+
+def test_text_lipsync_reads_wav_duration(tmp_path):
+    wav_path = tmp_path / "speech.wav"
+    write_wav(wav_path, 1.5)
+
+    data = text_lipsync("Good morning", str(wav_path))
+
+    assert audio_duration(str(wav_path)) == pytest.approx(1.5)
+    assert data["METADATA"] == {"soundFile": str(wav_path), "duration": 1.5}
+    assert data["MOUTH_CUES"][-1]["end"] == 1.5
+
+
+def test_mp3_duration_from_constant_bitrate(tmp_path):
+    mp3_path = tmp_path / "speech.mp3"
+    # MPEG-2 layer III, 48 kbit/s frame header, followed by 6000 bytes of frames
+    mp3_path.write_bytes(b"\xff\xf3\x64\xc4" + b"\x00" * 5996)
+
+    assert audio_duration(str(mp3_path)) == pytest.approx(1.0)
+
+
+def test_unknown_engine_falls_back_to_rhubarb():
+    with patch.dict("os.environ", {"LIPSYNC_ENGINE": "Text"}):
+        assert get_lipsync_engine() == "text"
+    with patch.dict("os.environ", {"LIPSYNC_ENGINE": "wav2lip"}):
+        assert get_lipsync_engine() == "rhubarb"
+
+
+def test_frame_agreement():
+    expected = [{"start": 0.0, "end": 0.5, "value": "A"}, {"start": 0.5, "end": 1.0, "value": "C"}]
+    actual = [{"start": 0.0, "end": 0.25, "value": "A"}, {"start": 0.25, "end": 1.0, "value": "C"}]
+
+    assert frame_agreement(expected, expected, 1.0) == 1.0
+    assert frame_agreement(expected, actual, 1.0) == pytest.approx(0.75)
@@ -0,0 +1,49 @@
+import io
+import openpyxl
+from docx import Document
+from pptx import Presentation
+from services.azure_form_recognizer import extract_text_from_docx, extract_text_from_pptx, extract_text_from_xlsx, extract_text_from_txt
+from services.office_text import iter_xlsx_text, take_chars
+
+
+def saved(document) -> bytes:
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def test_docx_paragraphs_and_tables_are_streamed_in_order():
+    document = Document()
+    document.add_paragraph("Cell biology\tweek 3")
+    document.add_table(rows=1, cols=1).cell(0, 0).text = "Mitochondria"
+    document.add_paragraph("Read chapter 4")
+
+    assert extract_text_from_docx(saved(document)) == "Cell biology\tweek 3\nMitochondria\nRead chapter 4\n"
+
+
+def test_pptx_slides_follow_the_deck_order():
+    deck = Presentation()
+    for title in ["Intro", "Osmosis", "Summary"]:
+        slide = deck.slides.add_slide(deck.slide_layouts[1])
+        slide.shapes.title.text = title
+        slide.placeholders[1].text = f"{title} point\nsecond point"
+    # Move the last slide to the front, as reordering in PowerPoint does
+    slide_ids = deck.slides._sldIdLst
+    slide_ids.insert(0, slide_ids[-1])
+
+    lines = extract_text_from_pptx(saved(deck)).splitlines()
+
+    assert lines[:3] == ["Summary", "Summary point", "second point"]
+    assert lines[3] == "Intro"
+
+
+def test_extraction_stops_at_the_character_budget():
+    workbook = openpyxl.Workbook()
+    for row in range(1000):
+        workbook.active.append([row, "value", None])
+    data = saved(workbook)
+    rows = iter_xlsx_text(io.BytesIO(data))
+
+    assert extract_text_from_xlsx(data, max_chars=None).splitlines()[999] == "999\tvalue\t"
+    assert take_chars(rows, max_chars=25) == "0\tvalue\t\n1\tvalue\t\n2\tvalue"
+    assert extract_text_from_txt("naïve ".encode() * 100, max_chars=8) == "naïve na"
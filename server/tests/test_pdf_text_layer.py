@@ -0,0 +1,93 @@
+import zlib
+from unittest.mock import patch
+from services.azure_form_recognizer import extract_text_uncached
+from services.pdf_text_layer import needs_ocr, read_pdf_text_layer
+from utils.consts import PDF_MAX_STREAM_BYTES
+
+LECTURE_LINES = [
+    "Photosynthesis converts light energy into chemical energy.",
+    "Chlorophyll absorbs mostly blue and red light (not green).",
+    "The Calvin cycle fixes carbon dioxide into sugars.",
+]
+
+TO_UNICODE = b"""/CIDInit /ProcSet findresource begin 12 dict begin begincmap
+1 begincodespacerange <0000> <FFFF> endcodespacerange
+2 beginbfchar <0003> <0020> <0010> <00E9> endbfchar
+1 beginbfrange <0024> <003D> <0041> endbfrange
+endcmap CMapName currentdict /CMap defineresource pop end end"""
+
+
+def build_pdf(page_contents, font=b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>", to_unicode=None):
+    """Writes a PDF with one Flate-compressed content stream per page, all sharing font /F1."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, font]
+    if to_unicode is not None:
+        stream = zlib.compress(to_unicode)
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    kids = []
+    for content in page_contents:
+        stream = zlib.compress(content)
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /Contents %d 0 R >>" % len(objects))
+        kids.append(b"%d 0 R" % len(objects))
+    # Resources are inherited from the page tree root
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d /Resources << /Font << /F1 3 0 R >> >> >>" % len(kids)
+    pdf, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % (number + 1) + body + b"\nendobj\n"
+    xref = b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1) + b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    return pdf + xref + b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(pdf))
+
+
+def text_page(lines):
+    shown = b"".join(b"(%s) Tj 0 -14 Td\n" % line.replace("(", "\\(").replace(")", "\\)").encode() for line in lines)
+    return b"BT /F1 12 Tf 72 720 Td\n" + shown + b"ET"
+
+
+def test_reads_the_text_layer_in_page_order():
+    pdf = build_pdf([text_page(LECTURE_LINES[:2]), text_page(LECTURE_LINES[2:])])
+
+    pages = read_pdf_text_layer(pdf)
+
+    assert pages == ["\n".join(LECTURE_LINES[:2]) + "\n", LECTURE_LINES[2] + "\n"]
+    assert not needs_ocr(pages)
+
+
+def test_decodes_composite_fonts_through_to_unicode():
+    font = b"<< /Type /Font /Subtype /Type0 /BaseFont /Calibri /Encoding /Identity-H /ToUnicode 4 0 R >>"
+    # "CAF" + e-acute + " " + "ABC", as glyph ids, with a kerning gap that is not a word break
+    content = b"BT /F1 12 Tf [<0026002400290010> 50 <0003> -20 <002400250026>] TJ ET"
+    pdf = build_pdf([content], font=font, to_unicode=TO_UNICODE)
+
+    assert read_pdf_text_layer(pdf) == ["CAFé ABC\n"]
+
+
+def test_scans_and_undecodable_fonts_need_ocr():
+    scan = build_pdf([b"q 612 0 0 792 0 0 cm /Im1 Do Q"] * 3)
+    no_map = build_pdf([b"BT /F1 12 Tf <" + b"0024" * 100 + b"> Tj ET"], font=b"<< /Type /Font /Subtype /Type0 /Encoding /Identity-H >>")
+
+    assert read_pdf_text_layer(scan) == ["", "", ""]
+    assert needs_ocr(read_pdf_text_layer(scan))
+    assert needs_ocr(read_pdf_text_layer(no_map))
+    assert needs_ocr(read_pdf_text_layer(b"%PDF-1.7 truncated"))
+
+
+def test_born_digital_pdf_skips_form_recognizer():
+    pdf = build_pdf([text_page(LECTURE_LINES)])
+
+    with patch("services.azure_form_recognizer.try_form_recognizer") as mock_form_recognizer:
+        assert extract_text_uncached(pdf, "application/pdf") == "\n".join(LECTURE_LINES) + "\n"
+    mock_form_recognizer.assert_not_called()
+
+    with patch("services.azure_form_recognizer.try_form_recognizer", return_value="scanned\n") as mock_form_recognizer:
+        assert extract_text_uncached(build_pdf([b"q /Im1 Do Q"]), "application/pdf") == "scanned\n"
+    mock_form_recognizer.assert_called_once()
+
+
+def test_decompression_bombs_are_not_inflated():
+    # A few KB of Flate data that would inflate far past the per-stream limit
+    bomb = build_pdf([text_page(LECTURE_LINES) + b"\n%" + b" " * (PDF_MAX_STREAM_BYTES + 1)])
+    assert len(bomb) < 64 * 1024
+
+    assert read_pdf_text_layer(bomb) == []
+    assert needs_ocr(read_pdf_text_layer(bomb))
@@ -0,0 +1,110 @@
+import time
+import threading
+import mongomock
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from services.progressive_tts import PlaylistStore, clear_playlist_memory, get_playlist, split_into_sentences, start_progressive_tts
+from services.tts_cache import TTSCache
+
+
+@pytest.fixture(autouse=True)
+def playlist_store():
+    store = PlaylistStore(collection=mongomock.MongoClient()["test_db"]["audio_playlists"])
+    with patch("services.progressive_tts.get_playlist_store", return_value=store):
+        yield store
+    clear_playlist_memory()
+
+
+def test_split_merges_short_sentences_and_breaks_long_ones():
+    text = "Hi! Great question. " + "word " * 80 + "\nDone."
+
+    chunks = split_into_sentences(text, max_chars=100, min_chars=20)
+
+    assert chunks[0] == "Hi! Great question."
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_split_empty_text():
+    assert split_into_sentences("") == []
+
+
+@pytest.fixture
+def slow_cache(tmp_path):
+    # Later chunks finish first, to check that chunks are still published in order
+    def synthesize(text, **kwargs):
+        time.sleep(0.01 * (5 - int(text.split()[1])))
+        return text.encode()
+
+    cache = TTSCache(directory=str(tmp_path), max_bytes=10_000, synthesize=synthesize)
+    with patch("services.progressive_tts.get_tts_cache", return_value=cache):
+        yield cache
+
+
+def test_chunks_are_published_in_order(slow_cache):
+    published = []
+    done = threading.Event()
+
+    def on_chunk(playlist, index, filename):
+        published.append((index, filename))
+        if index == playlist.total - 1:
+            done.set()
+
+    text = " ".join(f"Sentence {i} is long enough to be a chunk of its own." for i in range(5))
+    playlist = start_progressive_tts(text, on_chunk=on_chunk)
+
+    assert done.wait(2)
+    assert [index for index, _ in published] == [0, 1, 2, 3, 4]
+    assert playlist.complete and not playlist.failed
+    assert playlist.published_filenames() == [filename for _, filename in published]
+    assert get_playlist(playlist.playlist_id) is playlist
+
+
+def test_failed_chunk_is_published_without_audio(tmp_path):
+    cache = TTSCache(directory=str(tmp_path), max_bytes=10_000,
+                     synthesize=lambda text, **kwargs: None if "broken" in text else b"audio")
+    published = []
+    done = threading.Event()
+
+    def on_chunk(playlist, index, filename):
+        published.append(filename)
+        if index == playlist.total - 1:
+            done.set()
+
+    with patch("services.progressive_tts.get_tts_cache", return_value=cache):
+        playlist = start_progressive_tts("This first sentence is perfectly fine to speak out loud. This broken one cannot be spoken at all.", on_chunk=on_chunk)
+
+    assert done.wait(2)
+    assert published[0] is not None and published[1] is None
+    assert playlist.failed
+    assert len(playlist.published_filenames()) == 1
+
+
+def test_playlists_are_served_by_workers_that_did_not_start_them(slow_cache):
+    done = threading.Event()
+    text = " ".join(f"Sentence {i} is long enough to be a chunk of its own." for i in range(3))
+    playlist = start_progressive_tts(text, on_chunk=lambda playlist, index, filename: index == 2 and done.set())
+    assert done.wait(2)
+
+    clear_playlist_memory()  # as seen from another worker
+    stored = get_playlist(playlist.playlist_id)
+
+    assert stored is not playlist and stored.stored
+    assert stored.complete and stored.total == 3
+    assert stored.published_filenames() == playlist.published_filenames()
+    assert get_playlist("unknown") is None
+
+
+def test_first_chunks_go_ahead_of_queued_chunks_of_other_answers(tmp_path):
+    synthesized = []
+    cache = TTSCache(directory=str(tmp_path), max_bytes=10_000, synthesize=lambda text, **kwargs: synthesized.append(text) or text.encode())
+    release = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=1) as executor, patch("services.progressive_tts.get_tts_cache", return_value=cache):
+        executor.submit(release.wait)
+        start_progressive_tts(" ".join(f"Long answer sentence {i} is long enough to be a chunk." for i in range(4)), on_chunk=None, executor=executor)
+        start_progressive_tts("Short answer sentence that comes in second but is first.", on_chunk=None, executor=executor)
+        release.set()
+
+    assert synthesized[:2] == ["Long answer sentence 0 is long enough to be a chunk.", "Short answer sentence that comes in second but is first."]
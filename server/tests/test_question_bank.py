@@ -0,0 +1,76 @@
+import mongomock
+from types import SimpleNamespace
+from unittest.mock import patch
+from bson import ObjectId
+from agents.quiz_ai_agent import generate_questions
+from models.quiz import Question
+from services.question_bank import QuestionBank, bucket_key
+
+
+class InlineExecutor:
+    """Runs submitted work right away, so background refills finish before the assertions."""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+def make_bank():
+    db = mongomock.MongoClient()["test_db"]
+    return QuestionBank(collection=db["question_bank"], served_collection=db["question_bank_served"], executor=InlineExecutor())
+
+
+def questions(start, count):
+    return [Question(question_id=str(ObjectId()), question=f"What is {i} + {i}?", correct_answer=str(2 * i), question_type="SA") for i in range(start, start + count)]
+
+
+def test_users_are_never_served_the_same_question_twice_and_low_buckets_are_refilled():
+    bank = make_bank()
+    bucket = bucket_key("  Arithmetic ", None, "Easy", "en")
+    assert bucket == bucket_key("arithmetic", "", "easy", "en")
+    assert bank.add(bucket, questions(0, 6) + questions(0, 2)) == 6
+
+    first = bank.sample("u1", bucket, 3)
+    second = bank.sample("u1", bucket, 3)
+    refills = []
+    third = bank.sample("u1", bucket, 3, refill=lambda count: refills.append(count) or questions(4, 4))
+
+    assert {q.question for q in first}.isdisjoint(q.question for q in second)
+    assert third is None
+    assert refills == [20]  # u1 has used the bucket before, so running out triggers a refill
+    assert bank.sample("u3", bucket + "-new", 3, refill=lambda count: refills.append(count) or []) is None
+    assert refills == [20]  # a cold miss does not
+    assert bank.collection.count_documents({"bucket": bucket}) == 8  # two of the four refilled questions were new
+    assert len(bank.sample("u2", bucket, 8)) == 8
+    assert [q.question for q in bank.sample("u1", bucket, 2)] != []
+
+
+class CountingLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def stream(self, prompt):
+        self.prompts.append(prompt)
+        yield SimpleNamespace(content="\n".join(f"SA[%%]Which planet is number {i}?[&&]{i}" for i in range(1, 6)))
+
+
+def test_popular_topics_are_served_from_the_bank_without_generation():
+    bank, llm = make_bank(), CountingLLM()
+
+    with patch("agents.quiz_ai_agent.get_question_bank", return_value=bank), \
+            patch("agents.quiz_ai_agent.get_azure_openai_llm", return_value=llm), \
+            patch("agents.quiz_ai_agent.MongoDBClient") as mock_mongodb:
+        mock_mongodb.get_client.return_value = mongomock.MongoClient()
+        mock_mongodb.get_db_name.return_value = "test_db"
+        generated = generate_questions("u1", topic="Planets", num_questions=5, level="easy")
+        # A new topic costs one call for its quiz, and no refill
+        assert len(llm.prompts) == 1
+        assert bank.collection.count_documents({}) == 5
+
+        served = generate_questions("u2", topic="planets", num_questions=5, level="easy")
+
+    assert len(generated["questions"]) == 5
+    assert sorted(q["question"] for q in served["questions"]) == sorted(q["question"] for q in generated["questions"])
+    assert served["quiz_id"] != generated["quiz_id"]
+    # Serving the reused topic emptied the bucket for u2, so 20 questions are refilled in two calls
+    assert len(llm.prompts) == 3
+    assert all("questions about planets" in prompt for prompt in llm.prompts[1:])
@@ -5,7 +5,10 @@ from unittest.mock import patch, MagicMock
 from flask import Flask
 from bson import ObjectId
 import datetime
+import mongomock
+from models.quiz import Question
 from routes.quiz_ai import quiz_ai_routes
+from services.feedback_cache import FeedbackCache, clear_feedback_memory_cache
 
 # Constant valid ObjectId strings for testing
 VALID_QUIZ_ID = "507f1f77bcf86cd799439011"  # 24-char hex string
@@ -185,6 +188,83 @@ class TestGetQuestions:
         assert "error" in response_data
         assert "File size exceeds" in response_data["error"]
 
+    @patch('routes.quiz_ai.get_user_profile_by_user_id')
+    @patch('routes.quiz_ai.generate_questions')
+    def test_get_questions_passes_the_spooled_upload_with_its_sniffed_type(self, mock_generate_questions, mock_get_profile, client):
+        """Test that the upload reaches generation as a file, typed from its content."""
+        mock_get_profile.return_value = json.dumps({"_id": "user123", "preferredLanguage": "en"})
+        received = {}
+
+        def fake_generate_questions(user_id, topic, sub_topic, file_content, file_mime_type, *args, **kwargs):
+            received.update(is_bytes=isinstance(file_content, bytes), content=file_content.read(), mime=file_mime_type)
+            return {"quiz_id": "quiz123", "questions": []}
+
+        mock_generate_questions.side_effect = fake_generate_questions
+        pdf_content = b"%PDF-1.4\n" + b"0" * 20000
+
+        response = client.post(
+            '/ai/quiz/user123',
+            data={"topic": "Biology", "file": (io.BytesIO(pdf_content), "notes.bin", "application/octet-stream")},
+            content_type='multipart/form-data'
+        )
+
+        assert response.status_code == 200
+        assert received == {"is_bytes": False, "content": pdf_content, "mime": "application/pdf"}
+
+    @patch('routes.quiz_ai.socketio')
+    @patch('routes.quiz_ai.get_user_profile_by_user_id')
+    @patch('routes.quiz_ai.generate_questions')
+    def test_get_questions_pushes_questions_without_answers_to_the_socket(self, mock_generate_questions, mock_get_profile, mock_socketio, client):
+        """Test that each generated question is pushed to the client's socket, without its answer."""
+        mock_get_profile.return_value = json.dumps({"_id": "user123", "preferredLanguage": "en"})
+        question = Question(question_id="q1", question="What is 2+2?", options=["3", "4", "5", "6"], correct_answer="4", question_type="MC")
+
+        def fake_generate_questions(*args, on_question=None, **kwargs):
+            on_question(question)
+            return {"quiz_id": "quiz123", "questions": []}
+
+        mock_generate_questions.side_effect = fake_generate_questions
+
+        response = client.post(
+            '/ai/quiz/user123',
+            data={"topic": "Mathematics", "num": "1", "socket_id": "sid-1"},
+            content_type='multipart/form-data'
+        )
+
+        assert response.status_code == 200
+        mock_socketio.emit.assert_called_once_with("quiz_question", {
+            "question": {"question_id": "q1", "question": "What is 2+2?", "question_type": "MC", "options": ["3", "4", "5", "6"]},
+            "total": 1,
+        }, to="sid-1")
+
+    @patch('routes.quiz_ai.generate_questions')
+    def test_get_questions_rejects_too_many_questions(self, mock_generate_questions, client):
+        """Test that the number of questions is bounded before anything is generated."""
+        for num in ["10000", "0", "many"]:
+            response = client.post(
+                '/ai/quiz/user123',
+                data={"topic": "Mathematics", "num": num},
+                content_type='multipart/form-data'
+            )
+
+            assert response.status_code == 400
+            assert "'num' must be" in json.loads(response.data)["error"]
+        mock_generate_questions.assert_not_called()
+
+    @patch('routes.quiz_ai.generate_questions')
+    def test_get_questions_rejects_large_body_from_content_length(self, mock_generate_questions, client):
+        """Test that an oversized request is refused from its Content-Length, before the form is read."""
+        response = client.post(
+            '/ai/quiz/user123',
+            data=b"--x\r\n",
+            content_type='multipart/form-data; boundary=x',
+            environ_overrides={"CONTENT_LENGTH": str(11 * 1024 * 1024)}
+        )
+
+        assert response.status_code == 400
+        assert "File size exceeds" in json.loads(response.data)["error"]
+        mock_generate_questions.assert_not_called()
+
     def test_get_questions_no_topic_or_file(self, client):
         """Test getting questions with neither topic nor file."""
         # Create test data with no topic
@@ -336,6 +416,76 @@ class TestSubmitAnswers:
         # Verify transaction was used
         mock_session.start_transaction.assert_called_once()
 
+    @patch('routes.quiz_ai.get_feedback_cache')
+    @patch('routes.quiz_ai.get_user_profile_by_user_id')
+    @patch('routes.quiz_ai.get_azure_openai_llm')
+    @patch('routes.quiz_ai.MongoDBClient')
+    def test_submit_answers_explains_mistakes_in_one_call_before_the_transaction(self, mock_mongodb, mock_llm, mock_get_profile, mock_feedback_cache, client):
+        """Test that wrong answers get feedback from one batched call made outside the transaction, reused on a retake."""
+        clear_feedback_memory_cache()
+        mock_feedback_cache.return_value = FeedbackCache(collection=mongomock.MongoClient()["test_db"]["feedback_cache"])
+        mock_get_profile.return_value = json.dumps({"_id": VALID_USER_ID, "preferredLanguage": "en"})
+
+        calls = []
+        mock_session = MagicMock()
+
+        def invoke(prompt):
+            calls.append(mock_session.start_transaction.called)
+            return MagicMock(content='```json\n{"q1": "2+2 is 4.", "q2": "Paris is the capital."}\n```')
+
+        mock_llm.return_value.invoke.side_effect = invoke
+
+        mock_db = MagicMock()
+        mock_client = MagicMock()
+        mock_mongodb.get_client.return_value = mock_client
+        mock_mongodb.get_db_name.return_value = "test_db"
+        mock_client.start_session.return_value.__enter__.return_value = mock_session
+        mock_client.__getitem__.return_value = mock_db
+        mock_db.quizzes.find_one.return_value = {
+            "_id": ObjectId(VALID_QUIZ_ID),
+            "user_id": VALID_USER_ID,
+            "questions": [
+                {"question_id": "q1", "question": "What is 2+2?", "question_type": "MC", "correct_answer": "4"},
+                {"question_id": "q2", "question": "What is the capital of France?", "question_type": "SA", "correct_answer": "Paris"},
+                {"question_id": "q3", "question": "What is 3+3?", "question_type": "SA", "correct_answer": "6"}
+            ]
+        }
+        mock_db.user_responses.find_one.return_value = None
+        mock_db.user_responses.insert_one.return_value.inserted_id = ObjectId(VALID_RESPONSE_ID)
+        mock_db.users.update_one.return_value.modified_count = 1
+        mock_db.users.find_one.return_value = {"_id": ObjectId(VALID_USER_ID), "total_score": 0}
+
+        def submit(answers):
+            return client.post(
+                f'/ai/quiz/{VALID_QUIZ_ID}/submit',
+                data=json.dumps({"user_id": VALID_USER_ID, "answers": answers}),
+                content_type='application/json'
+            )
+
+        response = submit([
+            {"question_id": "q1", "user_answer": "5"},
+            {"question_id": "q2", "user_answer": "Lyon"},
+            {"question_id": "q3", "user_answer": "6.0"}
+        ])
+
+        assert response.status_code == 200
+        response_data = json.loads(response.data)
+        assert calls == [False]
+        assert [f["feedback"] for f in response_data["feedback"]] == ["2+2 is 4.", "Paris is the capital.", "Correct answer! Well done."]
+        assert response_data["score"] == 0  # -5 -5 +10
+        mock_session.start_transaction.assert_called_once()
+
+        # A retake with the same mistakes (up to case and spacing) is answered from the cache
+        retake = submit([
+            {"question_id": "q1", "user_answer": " 5 "},
+            {"question_id": "q2", "user_answer": "LYON"},
+            {"question_id": "q3", "user_answer": "6"}
+        ])
+
+        assert [f["feedback"] for f in json.loads(retake.data)["feedback"]][:2] == ["2+2 is 4.", "Paris is the capital."]
+        assert len(calls) == 1
+        clear_feedback_memory_cache()
+
     def test_submit_answers_missing_user_id(self, client):
         """Test submitting answers with missing user_id."""
         # Test data with missing user_id
@@ -0,0 +1,65 @@
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from agents.quiz_ai_agent import generate_question_list, iter_streamed_questions
+
+
+def distinct(text):
+    # Unrelated-looking question texts, so only the deliberate duplicates are near-identical
+    return hashlib.sha256(text.encode()).hexdigest()[:24]
+
+
+class ShardedLLM:
+    """Streams the requested number of questions in small chunks; every set starts with the same question."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def stream(self, prompt):
+        self.prompts.append(prompt)
+        count = int(re.search(r"Generate (\d+)", prompt).group(1))
+        part = re.search(r"set (\d+) of", prompt)
+        part = part.group(1) if part else "1"
+        lines = ["SA[%%]What is the boiling point of water at sea level?[&&]100 C"]
+        lines += [f"SA[%%]{distinct(f'{part}-{i}')}?[&&]{i}" for i in range(1, count)]
+        text = "\n".join(lines)
+        for start in range(0, len(text), 7):
+            yield SimpleNamespace(content=text[start:start + 7])
+
+
+def test_questions_are_parsed_as_soon_as_their_line_is_streamed():
+    llm = ShardedLLM()
+    stream = iter_streamed_questions(llm, "Generate 3 easy level questions in English.")
+
+    first = next(stream)
+
+    assert first.question == "What is the boiling point of water at sea level?"
+    assert first.correct_answer == "100 C"
+    assert len(list(stream)) == 2
+
+
+def test_large_quizzes_are_generated_by_concurrent_calls_without_duplicates():
+    llm = ShardedLLM()
+    pushed = []
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        questions = generate_question_list(llm, 25, "easy", "English", topic="Water", on_question=pushed.append, executor=executor)
+
+    assert sorted(int(re.search(r"Generate (\d+)", prompt).group(1)) for prompt in llm.prompts) == [9, 9, 10]
+    assert len(questions) == 25
+    assert sum(q.question.startswith("What is the boiling point") for q in questions) == 1
+    assert pushed == questions
+
+
+def test_long_documents_are_divided_between_the_calls():
+    llm = ShardedLLM()
+    paragraphs = [f"Paragraph {i}: " + "water boils and freezes. " * 40 for i in range(30)]
+    document = "\n".join(paragraphs)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        generate_question_list(llm, 25, "easy", "English", extracted_text=document, executor=executor)
+
+    sections = [prompt.split("\n\n")[1] for prompt in llm.prompts]
+    assert sum(len(section) for section in sections) <= len(document)
+    assert sorted(paragraph for section in sections for paragraph in section.split("\n")) == sorted(paragraphs)
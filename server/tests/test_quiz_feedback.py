@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from services.quiz_feedback import FEEDBACK_FALLBACK, explain_mistakes
+
+
+class ScriptedLLM:
+    """Answers batch prompts with `batch_reply` and single prompts with a fixed text, recording prompts."""
+
+    def __init__(self, batch_reply):
+        self.batch_reply = batch_reply
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if "Return only a JSON object" in prompt:
+            return SimpleNamespace(content=self.batch_reply(prompt))
+        if "What is q3?" in prompt:
+            raise RuntimeError("rate limited")
+        return SimpleNamespace(content="  One by one.  ")
+
+
+def mistakes(count):
+    return [
+        {"question_id": f"q{i}", "question": f"What is q{i}?", "user_answer": "no", "correct_answer": "yes"}
+        for i in range(count)
+    ]
+
+
+def test_missing_or_invalid_batch_replies_fall_back_to_single_calls():
+    llm = ScriptedLLM(lambda prompt: 'Sure! {"q0": "Batched.", "q1": 3}')
+
+    feedback = explain_mistakes(llm, mistakes(4), "English")
+
+    assert feedback == {"q0": "Batched.", "q1": "One by one.", "q2": "One by one.", "q3": FEEDBACK_FALLBACK}
+    assert len(llm.prompts) == 4  # one batch, then q1, q2 and q3 on their own
+
+
+def test_long_quizzes_are_split_into_concurrent_batches():
+    llm = ScriptedLLM(lambda prompt: "{" + ", ".join(
+        f'"q{i}": "Batched {i}."' for i in range(20) if f'"q{i}"' in prompt
+    ) + "}")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        feedback = explain_mistakes(llm, mistakes(20)[4:], "English", executor=executor)
+
+    assert feedback == {f"q{i}": f"Batched {i}." for i in range(4, 20)}
+    assert len(llm.prompts) == 2
@@ -0,0 +1,102 @@
+import io
+import sys
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+import azure.cognitiveservices.speech as speechsdk
+from services.speech_service import PcmTranscoder, speech_to_text
+
+# Stands in for ffmpeg: echoes stdin to stdout, or fails with a message on stderr
+ECHO = [sys.executable, "-c", "import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer)"]
+FAIL = [sys.executable, "-c", "import sys; sys.stdin.buffer.read(); sys.stderr.write('Invalid data found'); sys.exit(1)"]
+
+
+def test_transcoder_streams_output_to_callback():
+    received = []
+    transcoder = PcmTranscoder(on_pcm=received.append, command=ECHO, chunk_size=1000)
+    for _ in range(10):
+        transcoder.write(b"\x01\x02" * 500)
+
+    assert transcoder.close() == 10000
+    assert b"".join(received) == b"\x01\x02" * 5000
+    assert max(len(block) for block in received) <= 1000
+
+
+def test_transcoder_reports_decoder_errors():
+    transcoder = PcmTranscoder(on_pcm=lambda data: None, command=FAIL)
+    transcoder.write(b"not audio")
+
+    with pytest.raises(Exception, match="Failed to convert audio"):
+        transcoder.close()
+
+
+def test_concurrent_transcoders_do_not_mix_audio():
+    outputs = {}
+
+    def run(index):
+        received = []
+        transcoder = PcmTranscoder(on_pcm=received.append, command=ECHO)
+        transcoder.write(bytes([index]) * 50000)
+        transcoder.close()
+        outputs[index] = b"".join(received)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert outputs == {index: bytes([index]) * 50000 for index in range(6)}
+
+
+def test_speech_to_text_pushes_decoded_audio_without_temp_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SPEECH_AI_KEY", "key")
+    monkeypatch.setenv("SERVICE_REGION", "eastus")
+    push_stream = MagicMock()
+    recognizer = MagicMock()
+    recognizer.recognize_once_async.return_value.get.return_value = MagicMock(
+        reason=speechsdk.ResultReason.RecognizedSpeech, text="hello there"
+    )
+
+    with patch("services.speech_service.FFMPEG_PCM_COMMAND", ECHO), \
+         patch("services.speech_service.check_ffmpeg"), \
+         patch.object(speechsdk.audio, "PushAudioInputStream", return_value=push_stream), \
+         patch.object(speechsdk.audio, "AudioConfig"), \
+         patch.object(speechsdk, "SpeechRecognizer", return_value=recognizer):
+        text = speech_to_text(io.BytesIO(b"pcm" * 1000))
+
+    assert text == "hello there"
+    assert b"".join(call.args[0] for call in push_stream.write.call_args_list) == b"pcm" * 1000
+    push_stream.close.assert_called_once()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_streaming_recognition_collects_segments(monkeypatch):
+    from services.speech_stream import StreamingRecognition
+    monkeypatch.setenv("SPEECH_AI_KEY", "key")
+    monkeypatch.setenv("SERVICE_REGION", "eastus")
+    push_stream, recognizer = MagicMock(), MagicMock()
+    partials, segments = [], []
+
+    with patch.object(speechsdk.audio, "PushAudioInputStream", return_value=push_stream), \
+         patch.object(speechsdk.audio, "AudioConfig"), \
+         patch.object(speechsdk, "SpeechRecognizer", return_value=recognizer):
+        session = StreamingRecognition(partials.append, segments.append, encoding="pcm", max_bytes=10)
+    recognizing = recognizer.recognizing.connect.call_args[0][0]
+    recognized = recognizer.recognized.connect.call_args[0][0]
+    session_stopped = recognizer.session_stopped.connect.call_args[0][0]
+
+    session.start()
+    session.write(b"\x00" * 6)
+    recognizing(MagicMock(result=MagicMock(text="hello")))
+    recognized(MagicMock(result=MagicMock(text="hello world", reason=speechsdk.ResultReason.RecognizedSpeech)))
+    with pytest.raises(ValueError):
+        session.write(b"\x00" * 6)
+    session_stopped(MagicMock())
+
+    assert session.finish(timeout=1) == "hello world"
+    assert partials == ["hello"] and segments == ["hello world"]
+    push_stream.write.assert_called_once_with(b"\x00" * 6)
+    push_stream.close.assert_called_once()
+    recognizer.stop_continuous_recognition_async.assert_called_once()
@@ -0,0 +1,108 @@
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+import azure.cognitiveservices.speech as speechsdk
+from services.speech_synthesizer_pool import SpeechSynthesizerPool, get_speech_synthesizer_pool
+from services.text_to_speech_service import text_to_speech
+
+
+def make_synthesizer(reason=speechsdk.ResultReason.SynthesizingAudioCompleted):
+    synthesizer = MagicMock()
+    synthesizer.speak_ssml_async.return_value.get.return_value = MagicMock(reason=reason, audio_data=b"RIFF")
+    return synthesizer
+
+
+@pytest.fixture
+def pool():
+    created = []
+
+    def factory(voice_name, audio_format):
+        synthesizer = make_synthesizer()
+        created.append((voice_name, synthesizer))
+        return synthesizer
+
+    with patch.object(SpeechSynthesizerPool, "_open_connection", return_value=None):
+        pool = SpeechSynthesizerPool("key", "region", max_concurrency=2, max_idle_per_voice=2, factory=factory)
+        pool.created = created
+        yield pool
+
+
+def test_synthesizers_are_reused_per_voice(pool):
+    pool.speak_ssml("en-US-JennyNeural", "<speak/>")
+    pool.speak_ssml("en-US-JennyNeural", "<speak/>")
+    pool.speak_ssml("es-ES-ElviraNeural", "<speak/>")
+
+    assert [voice for voice, _ in pool.created] == ["en-US-JennyNeural", "es-ES-ElviraNeural"]
+    assert pool.idle_count("en-US-JennyNeural") == 1
+
+
+def test_failed_synthesis_discards_synthesizer(pool):
+    with pool.acquire("en-US-JennyNeural") as synthesizer:
+        synthesizer.speak_ssml_async.return_value.get.return_value.reason = speechsdk.ResultReason.Canceled
+
+    result = pool.speak_ssml("en-US-JennyNeural", "<speak/>")
+
+    assert result.reason == speechsdk.ResultReason.Canceled
+    assert pool.idle_count("en-US-JennyNeural") == 0
+
+
+def test_concurrency_is_bounded(pool):
+    active, peak = 0, 0
+    lock = threading.Lock()
+
+    def slow_speak(_ssml):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        return MagicMock(get=MagicMock(return_value=MagicMock(reason=speechsdk.ResultReason.SynthesizingAudioCompleted)))
+
+    def factory(voice_name, audio_format):
+        synthesizer = MagicMock()
+        synthesizer.speak_ssml_async.side_effect = slow_speak
+        return synthesizer
+
+    pool._factory = factory
+    threads = [threading.Thread(target=pool.speak_ssml, args=("en-US-JennyNeural", "<speak/>")) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == 2
+    assert pool.idle_count("en-US-JennyNeural") == 2
+
+
+def test_warm_up_prepares_one_synthesizer_per_voice(pool):
+    pool.warm_up(["en-US-JennyNeural", "fr-FR-DeniseNeural"])
+    pool.warm_up(["en-US-JennyNeural"])
+
+    assert len(pool.created) == 2
+    assert pool.idle_count("en-US-JennyNeural") == 1
+    assert pool.idle_count("fr-FR-DeniseNeural") == 1
+
+
+def test_text_to_speech_uses_pool(pool):
+    with patch("services.text_to_speech_service.get_speech_synthesizer_pool", return_value=pool):
+        audio = text_to_speech("Hello **world**", preferred_language="fr")
+
+    assert audio == b"RIFF"
+    voice, synthesizer = pool.created[0]
+    assert voice == "fr-FR-DeniseNeural"
+    ssml = synthesizer.speak_ssml_async.call_args[0][0]
+    assert '<voice name="fr-FR-DeniseNeural">' in ssml
+    assert "Hello world" in ssml
+
+
+def test_missing_configuration_is_not_cached():
+    with patch("services.speech_synthesizer_pool._pool", None):
+        with patch.dict("os.environ", {"SPEECH_AI_KEY": "", "SERVICE_REGION": ""}):
+            assert get_speech_synthesizer_pool() is None
+        with patch.dict("os.environ", {"SPEECH_AI_KEY": "key", "SERVICE_REGION": "region"}):
+            pool = get_speech_synthesizer_pool()
+            assert isinstance(pool, SpeechSynthesizerPool)
+            assert get_speech_synthesizer_pool() is pool
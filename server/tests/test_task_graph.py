@@ -0,0 +1,71 @@
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from utils.task_graph import run_task_graph
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+def test_dependencies_receive_results(executor):
+    results, timings = run_task_graph({
+        "text": (lambda: "hello", ()),
+        "upper": (lambda text: text.upper(), ("text",)),
+        "joined": (lambda text, upper: f"{text} {upper}", ("text", "upper")),
+    }, executor=executor)
+
+    assert results == {"text": "hello", "upper": "HELLO", "joined": "hello HELLO"}
+    assert set(timings) == {"text", "upper", "joined", "total"}
+
+
+def test_independent_tasks_run_concurrently(executor):
+    barrier = threading.Barrier(3, timeout=2)
+
+    def stage():
+        barrier.wait()
+        return True
+
+    started = time.perf_counter()
+    results, timings = run_task_graph({
+        "expression": (stage, ()),
+        "mp3": (stage, ()),
+        "wav": (stage, ()),
+        "lip_sync": (lambda wav: wav, ("wav",)),
+    }, executor=executor)
+
+    assert all(results.values())
+    assert time.perf_counter() - started < 2
+
+
+def test_failure_is_raised_after_running_tasks_finish(executor):
+    finished = []
+
+    def slow():
+        time.sleep(0.05)
+        finished.append("slow")
+
+    def broken():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        run_task_graph({
+            "slow": (slow, ()),
+            "broken": (broken, ()),
+            "after": (lambda broken: finished.append("after"), ("broken",)),
+        }, executor=executor)
+
+    assert finished == ["slow"]
+
+
+def test_invalid_graphs_are_rejected(executor):
+    with pytest.raises(ValueError, match="unknown"):
+        run_task_graph({"a": (lambda missing: None, ("missing",))}, executor=executor)
+    with pytest.raises(ValueError, match="cycle"):
+        run_task_graph({
+            "a": (lambda b: None, ("b",)),
+            "b": (lambda a: None, ("a",)),
+        }, executor=executor)
@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from services.tts_cache import TTSCache, tts_cache_key
+
+
+@pytest.fixture
+def synthesize():
+    return MagicMock(side_effect=lambda text, preferred_language, style, audio_format: f"audio:{text}".encode())
+
+
+@pytest.fixture
+def cache(tmp_path, synthesize):
+    return TTSCache(directory=str(tmp_path), max_bytes=1024, synthesize=synthesize)
+
+
+def test_repeated_utterance_is_synthesized_once(cache, synthesize):
+    first = cache.get_or_synthesize("Hello **there**!")
+    second = cache.get_or_synthesize("Hello there!")
+
+    assert first == second
+    assert first.startswith("tts_") and first.endswith(".wav")
+    assert synthesize.call_count == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    with open(os.path.join(cache.directory, first), "rb") as f:
+        assert f.read() == b"audio:Hello **there**!"
+
+
+def test_filename_covers_voice_style_and_format(cache):
+    base = cache.filename_for("Hi", "en", "calm", "wav")
+
+    assert cache.filename_for("Hi", "fr", "calm", "wav") != base
+    assert cache.filename_for("Hi", "en", "cheerful", "wav") != base
+    assert cache.filename_for("Hi", "en", "calm", "mp3") != base
+    assert base == f"tts_{tts_cache_key('Hi', 'en-US-JennyNeural', 'calm')}.wav"
+
+
+def test_failed_synthesis_is_not_cached(cache, synthesize):
+    synthesize.side_effect = None
+    synthesize.return_value = None
+
+    assert cache.get_or_synthesize("Hello") is None
+    assert os.listdir(cache.directory) == []
+
+
+def test_least_recently_used_files_are_evicted_with_their_derivatives(tmp_path):
+    cache = TTSCache(directory=str(tmp_path), max_bytes=250, synthesize=lambda text, **kwargs: b"x" * 100)
+
+    oldest = cache.get_or_synthesize("one")
+    stem = os.path.splitext(oldest)[0]
+    with open(os.path.join(cache.directory, f"{stem}.json"), "w") as f:
+        f.write("{}")
+    cache.store.record(f"{stem}.json")
+
+    kept = cache.get_or_synthesize("two")
+    cache.get_or_synthesize("three")
+
+    assert sorted(os.listdir(cache.directory)) == sorted([kept, cache.filename_for("three")])
+
+
+def test_concurrent_identical_requests_share_one_synthesis(tmp_path):
+    calls = []
+
+    def slow_synthesize(text, **kwargs):
+        calls.append(text)
+        time.sleep(0.05)
+        return b"audio"
+
+    cache = TTSCache(directory=str(tmp_path), max_bytes=1024, synthesize=slow_synthesize)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_synthesize("Welcome back!"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(set(results)) == 1
+
+
+def test_other_formats_are_encoded_from_the_cached_file_without_synthesis(tmp_path, synthesize):
+    transcode = MagicMock(side_effect=lambda audio_data, audio_format: audio_data + f":{audio_format}".encode())
+    cache = TTSCache(directory=str(tmp_path), max_bytes=1024, synthesize=synthesize, transcode=transcode)
+
+    wav = cache.get_or_synthesize("Hello there!", audio_format="wav")
+    mp3 = cache.get_or_transcode(wav, "mp3")
+
+    assert mp3 == cache.filename_for("Hello there!", audio_format="mp3")
+    assert cache.get_or_transcode(wav, "mp3") == mp3
+    assert (synthesize.call_count, transcode.call_count) == (1, 1)
+    with open(os.path.join(cache.directory, mp3), "rb") as f:
+        assert f.read() == b"audio:Hello there!:mp3"
+    assert cache.get_or_transcode("tts_missing.wav", "mp3") is None
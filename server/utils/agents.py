@@ -3,27 +3,28 @@
 import os
 import random
 import requests
-from langchain_google_community import GoogleSearchAPIWrapper
-from langchain_community.utilities import BingSearchAPIWrapper
-from langchain_community.tools import YouTubeSearchTool
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.textanalytics import TextAnalyticsClient
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from docx import Document as DocxDocument
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
+from functools import lru_cache
 from uuid import uuid4
-import os
-from PIL import Image, ImageDraw, ImageFont
 import uuid
 import time
 
-# Initialize Azure Text Analytics Client
-text_analytics_key = os.getenv("AZURE_TEXT_ANALYTICS_KEY")
-text_analytics_endpoint = os.getenv("AZURE_TEXT_ANALYTICS_ENDPOINT")
-text_analytics_client = TextAnalyticsClient(endpoint=text_analytics_endpoint, credential=AzureKeyCredential(text_analytics_key))
+from services.artifact_store import get_artifact_store
+
+# Search wrappers, the Text Analytics client and the document writers (reportlab,
+# python-docx) are imported inside the functions that use them, so importing this
+# module (and therefore the agent toolbox) stays cheap.
+
+@lru_cache(maxsize=1)
+def get_text_analytics_client():
+    """
+    Returns the Azure Text Analytics client, created on first use.
+    """
+    from azure.core.credentials import AzureKeyCredential
+    from azure.ai.textanalytics import TextAnalyticsClient
+
+    text_analytics_key = os.getenv("AZURE_TEXT_ANALYTICS_KEY")
+    text_analytics_endpoint = os.getenv("AZURE_TEXT_ANALYTICS_ENDPOINT")
+    return TextAnalyticsClient(endpoint=text_analytics_endpoint, credential=AzureKeyCredential(text_analytics_key))
 
 
 """Step 2: Define the agent functions"""
@@ -40,6 +41,8 @@ def get_google_search_results(query: str):
     """
 
     try:
+        from langchain_google_community import GoogleSearchAPIWrapper
+
         google_search_wrapper = GoogleSearchAPIWrapper(k=3)
         search_results = google_search_wrapper.run(query)
         print("Search results obtained:", search_results)
@@ -67,6 +70,8 @@ def get_youtube_search_results(query: str):
         list: A list of search results with titles, descriptions, and video links.
     """
     try:
+        from langchain_community.tools import YouTubeSearchTool
+
         youtube_search_tool = YouTubeSearchTool()
         search_results = youtube_search_tool.run(query)
         print("Search results obtained:", search_results)
@@ -93,6 +98,8 @@ def get_bing_search_results(query: str):
         list: A list of search results with titles and links.
     """
     try:
+        from langchain_community.utilities import BingSearchAPIWrapper
+
         # Initialize with correct endpoint
         bing_search_wrapper = BingSearchAPIWrapper(
             bing_search_url="https://api.bing.microsoft.com/v7.0/search"
@@ -122,6 +129,8 @@ def generate_suggestions(mood: str, user_input: str):
     Returns:
         list: A list of suggested activities or coping mechanisms.
     """
+    text_analytics_client = get_text_analytics_client()
+
     # Analyze sentiment
     sentiment_response = text_analytics_client.analyze_sentiment(documents=[{"id": "1", "text": user_input}])
     sentiment = sentiment_response[0].sentiment
@@ -260,12 +269,15 @@ def generate_document(content: str, format: str = 'pdf'):
     """
     # Generate a unique filename
     filename = f"{uuid4()}.{format}"
-    file_path = os.path.join("generated_documents", filename)
-
-    # Ensure the directory exists
-    os.makedirs("generated_documents", exist_ok=True)
+    store = get_artifact_store("documents")
+    file_path = store.path_for(filename)
 
     if format == 'pdf':
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.units import inch
+
         doc = SimpleDocTemplate(file_path, pagesize=letter)
         styles = getSampleStyleSheet()
         flowables = []
@@ -289,6 +301,7 @@ def generate_document(content: str, format: str = 'pdf'):
 
         doc.build(flowables)
     elif format == 'docx':
+        from docx import Document as DocxDocument
 
         doc = DocxDocument()
         lines = content.split('\n')
@@ -304,7 +317,10 @@ def generate_document(content: str, format: str = 'pdf'):
         doc.save(file_path)
     else:
         return "Unsupported format. Please choose 'pdf' or 'docx'."
-    
+
+    # Index the file so the documents quota can evict old ones
+    store.record(filename)
+
     backend_base_url = os.getenv('BACKEND_BASE_URL', 'http://localhost:8000')  # Ensure this environment variable is set
     # Return the URL to download the file
     download_url = f"{backend_base_url}/ai_mentor/download_document/{filename}"
@@ -519,12 +535,7 @@ def generate_ai_image(prompt: str, size: str = "512x512") -> str:
         img_resp = requests.get(image_url, timeout=30)
         img_resp.raise_for_status()
         filename = f"{uuid.uuid4()}.png"
-        output_dir = "generated_images"
-        os.makedirs(output_dir, exist_ok=True)
-        file_path = os.path.join(output_dir, filename)
-
-        with open(file_path, "wb") as f:
-            f.write(img_resp.content)
+        get_artifact_store("images").write(filename, img_resp.content)
 
         # Return a local URL to your Flask route
         backend_base_url = os.getenv("BACKEND_BASE_URL", "http://localhost:8000")
@@ -6,6 +6,81 @@ APP_NAME = "MemeMingle"
 PROCESSING_STEP = 1 # The chat turn upon which the app would update the database
 CONTEXT_LENGTH_LIMIT=4096 
 
+EMBEDDING_CACHE_COLLECTION = "embedding_cache" # MongoDB tier of the embedding cache
+EMBEDDING_CACHE_MAX_ENTRIES = 10000 # Vectors kept in the in-process LRU
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024 # Largest file accepted by the chat and quiz routes
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024 # Room for the other form fields and multipart headers in an upload request
+UPLOAD_SNIFF_BYTES = 8192 # Bytes read from the start of an upload to detect its type
+EXTRACTION_CACHE_COLLECTION = "extraction_cache" # MongoDB tier of the extracted-text cache
+EXTRACTION_CACHE_MAX_CHARS = 50_000_000 # Characters of extracted text kept in the in-process LRU
+EXTRACTION_CACHE_MAX_DB_CHARS = 4_000_000 # Longer texts are only cached in memory (MongoDB documents are capped at 16 MB)
+EXTRACTION_CACHE_VERSION = 4 # Bump when the extractors change so cached results are re-extracted
+EXTRACTION_TOKEN_BUDGET = 100_000 # Extraction of a long document stops once this many tokens are collected
+EXTRACTION_CHARS_PER_TOKEN = 4 # Rough characters per token, used to check the budget without a tokenizer
+EXTRACTION_MAX_CHARS = EXTRACTION_TOKEN_BUDGET * EXTRACTION_CHARS_PER_TOKEN # Office and text files are read up to this many characters
+FORM_RECOGNIZER_MAX_PAGES = 300 # Pages of a PDF/TIFF sent to Form Recognizer; later pages are ignored
+FORM_RECOGNIZER_PAGES_PER_REQUEST = 8 # Page range analyzed by one Form Recognizer request
+OCR_MAX_CONCURRENCY = 4 # Form Recognizer page ranges and Computer Vision reads running at once per worker
+OCR_POLL_TIMEOUT_SECONDS = 120 # Longest wait for one Computer Vision read operation
+DOCUMENT_INDEX_COLLECTION = "session_documents" # Chunks of the files shared in each chat session
+DOCUMENT_INDEX_TTL_SECONDS = 6 * 3600 # A session's documents are dropped after this long without a turn
+DOCUMENT_INDEX_MAX_SESSIONS = 500 # Sessions whose chunk vectors are kept in memory per worker
+DOCUMENT_INDEX_REFRESH_SECONDS = 60 # A session's documents are checked against MongoDB again after this long (uploads through other workers)
+DOCUMENT_INDEX_TOP_K = 4 # Chunks of the session's documents added to the prompt on each turn
+DOCUMENT_CHUNK_SIZE = 1000 # Characters per document chunk
+DOCUMENT_CHUNK_OVERLAP = 100 # Characters shared by consecutive chunks
+PDF_TEXT_MIN_CHARS_PER_PAGE = 60 # A PDF's own text layer with fewer characters per page (on average) is treated as a scan
+PDF_TEXT_MAX_EMPTY_PAGE_RATIO = 0.5 # ...as is one where more than this share of the pages have next to no text
+PDF_TEXT_MAX_UNREADABLE_RATIO = 0.1 # ...or where this share of the characters could not be decoded
+PDF_MAX_STREAM_BYTES = EXTRACTION_MAX_CHARS * 8 # Largest decompressed stream of an uploaded PDF; larger ones (e.g. zip bombs) are not read
+PDF_MAX_DECODED_BYTES = PDF_MAX_STREAM_BYTES * 4 # Page content decompressed per PDF when reading its text layer locally
+
+TTS_POOL_MAX_CONCURRENCY = 8 # Speech syntheses running at once per worker
+TTS_POOL_MAX_IDLE_PER_VOICE = 4 # Pre-connected synthesizers kept per voice
+TTS_WARMUP_LANGUAGES = ("en",) # Voices connected when the server starts
+TTS_DEFAULT_AUDIO_FORMAT = "mp3" # Format of the speech returned with chat turns ("wav", "mp3" or "ogg")
+TTS_CACHE_MAX_BYTES = 512 * 1024 * 1024 # Content-addressed speech files kept in generated_audio
+TTS_CHUNK_MAX_CHARS = 300 # Longest sentence chunk synthesized in one request in progressive mode
+TTS_CHUNK_MIN_CHARS = 40 # Shorter sentences are merged with the next one
+TTS_PROGRESSIVE_MAX_WORKERS = 4 # Chunks synthesized at once per worker
+TTS_PLAYLIST_TTL_SECONDS = 3600 # How long a progressive playlist can be fetched
+TTS_PLAYLIST_COLLECTION = "audio_playlists" # Progress of each progressive playlist, so any worker can serve it
+LIPSYNC_MIN_CUE_SECONDS = 0.04 # Shorter estimated mouth shapes are merged into the previous one
+LIPSYNC_CHARS_PER_SECOND = 14 # Speaking rate assumed when no audio duration is known
+STT_UPLOAD_CHUNK_BYTES = 64 * 1024 # Upload bytes written to ffmpeg at a time
+STT_PCM_CHUNK_BYTES = 6400 # Largest PCM block pushed to the recognizer (200 ms at 16 kHz mono)
+STT_STREAM_MAX_BYTES = 20 * 1024 * 1024 # Most audio accepted in one streamed voice session
+STT_STREAM_FINISH_TIMEOUT_SECONDS = 10 # Wait for the last segment after the client stops recording
+EXPRESSION_MIN_CONFIDENCE = 0.6 # Below this the avatar expression classifier defers to the LLM (if EXPRESSION_LLM_FALLBACK=true)
+
+ARTIFACT_QUOTAS = { # Bytes kept per kind of generated file before the least recently used are evicted
+    "documents": 256 * 1024 * 1024,
+    "images": 512 * 1024 * 1024,
+    "audio": TTS_CACHE_MAX_BYTES,
+}
+ARTIFACT_MAX_AGE_SECONDS = { # Files not downloaded or reused for this long are removed by the nightly cleanup
+    "documents": 86400,
+    "images": 86400,
+    "audio": 7 * 86400,
+}
+TASK_GRAPH_MAX_WORKERS = 16 # Threads shared by per-turn post-processing graphs (e.g. avatar audio, lip-sync, expression)
+QUIZ_FEEDBACK_BATCH_SIZE = 8 # Wrong answers explained by one LLM call when a quiz is submitted
+QUIZ_FEEDBACK_MAX_CONCURRENCY = 4 # Feedback calls running at once per worker
+QUIZ_FEEDBACK_CACHE_COLLECTION = "feedback_cache" # Feedback reused for the same wrong answer to the same question
+QUIZ_FEEDBACK_CACHE_TTL_SECONDS = 30 * 86400 # Cached feedback is written again after this long
+QUIZ_FEEDBACK_CACHE_MAX_ENTRIES = 5000 # Feedback texts kept in memory per worker
+QUESTION_BANK_COLLECTION = "question_bank" # Generated questions reused for topic quizzes, by topic, sub-topic, level and language
+QUESTION_BANK_SERVED_COLLECTION = "question_bank_served" # Bank questions each user has already been given
+QUESTION_BANK_MAX_PER_BUCKET = 200 # Questions kept for one topic, sub-topic, level and language
+QUESTION_BANK_LOW_WATERMARK = 20 # A bucket is refilled once a user has fewer unseen questions left in it
+QUESTION_BANK_REFILL_SIZE = 20 # Questions generated by one background refill
+QUESTION_BANK_REFILL_MAX_WORKERS = 2 # Background refills running at once per worker
+QUIZ_MAX_QUESTIONS = 50 # Largest quiz a request may ask for; bounds the generation calls per request
+QUIZ_GENERATION_QUESTIONS_PER_CALL = 10 # Larger quizzes are generated by several concurrent LLM calls
+QUIZ_GENERATION_MAX_CONCURRENCY = 4 # Quiz generation calls running at once per worker
+QUIZ_GENERATION_SHARED_TEXT_CHARS = 8000 # Uploaded text up to this length goes to every generation call; longer text is divided between the calls
+QUIZ_DUPLICATE_SIMILARITY = 90 # Generated questions at least this similar (0-100) to an accepted one are dropped
+
 """STEP 2: Define the system message for the agent."""
 SYSTEM_MESSAGE = """
 You are {role}. Your purpose is to support users through their educational journey by offering personalized learning experiences, career guidance, and mentorship.
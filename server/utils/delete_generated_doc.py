@@ -1,41 +1,40 @@
-""" This module contains a job that deletes files older than a certain number of days from a directory. """
+""" This module contains the nightly cleanup job for generated files. """
 """ Step 1: Import necessary modules """
-import os
-import time
 import logging
 
+from services.artifact_store import ARTIFACT_DIRECTORIES, get_artifact_store
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def delete_old_files_job():
-    directories = [
-        os.path.join(os.path.dirname(__file__), '..', 'generated_documents'),
-        os.path.join(os.path.dirname(__file__), '..', 'generated_audio')
-    ]
-    days = 1  # Files older than 1 day will be deleted
-    now = time.time()
-    cutoff = now - (days * 86400)  # Number of seconds in 'days' days
+    """
+    Removes generated documents, images and audio that have not been used for their kind's
+    maximum age (ARTIFACT_MAX_AGE_SECONDS) and enforces the byte quotas.
 
+    The artifact index is read in last-access order, so the job only visits the files it deletes.
+    """
     total_files_deleted = 0
-
-    for directory in directories:
-        if not os.path.exists(directory):
-            logging.warning(f"Directory {directory} does not exist.")
+    for kind in ARTIFACT_DIRECTORIES:
+        try:
+            files_deleted = get_artifact_store(kind).cleanup()
+        except Exception as e:
+            logging.error(f"Error cleaning up generated {kind}: {e}")
             continue
+        total_files_deleted += files_deleted
+        logging.info(f"Deleted {files_deleted} unused {kind} entries.")
 
-        files_deleted = 0
-        for filename in os.listdir(directory):
-            file_path = os.path.join(directory, filename)
-            if os.path.isfile(file_path):
-                file_modified_time = os.path.getmtime(file_path)
-                if file_modified_time < cutoff:
-                    try:
-                        os.remove(file_path)
-                        files_deleted += 1
-                    except Exception as e:
-                        logging.error(f"Error deleting file {file_path}: {e}")
+    logging.info(f"Total entries deleted: {total_files_deleted}")
 
-        total_files_deleted += files_deleted
-        logging.info(f"Deleted {files_deleted} files older than {days} day(s) from {directory}.")
 
-    logging.info(f"Total files deleted: {total_files_deleted}")
\ No newline at end of file
+def reconcile_artifact_stores():
+    """
+    Indexes files that were generated before the artifact index existed, or that it lost track of.
+    Scans each directory once; run it at start-up on the primary worker.
+    """
+    for kind in ARTIFACT_DIRECTORIES:
+        try:
+            added = get_artifact_store(kind).reconcile()
+            logging.info(f"Indexed {added} existing {kind} files.")
+        except Exception as e:
+            logging.error(f"Error indexing generated {kind}: {e}")
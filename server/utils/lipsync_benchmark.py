@@ -0,0 +1,105 @@
+""" This module compares the text lip-sync engine with Rhubarb on recorded samples (python -m utils.lipsync_benchmark). """
+""" Step 1: Import necessary modules """
+import argparse
+import os
+import sys
+import time
+
+SERVER_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if SERVER_ROOT not in sys.path:
+    sys.path.insert(0, SERVER_ROOT)
+
+from services.lipsync import rhubarb_lipsync, text_lipsync
+
+FRAME_SECONDS = 0.01
+
+""" Step 2: Define the comparison helpers """
+def cues_to_frames(cues: list[dict], duration: float) -> list[str]:
+    """
+    Samples mouth cues every 10 ms.
+
+    Args:
+        cues (list): [{"start", "end", "value"}].
+        duration (float): The length to sample, in seconds.
+
+    Returns:
+        list: One mouth shape per frame; "X" where no cue covers the frame.
+    """
+    frames = ["X"] * int(round(duration / FRAME_SECONDS))
+    for cue in cues or []:
+        for frame in range(int(round(cue["start"] / FRAME_SECONDS)), min(len(frames), int(round(cue["end"] / FRAME_SECONDS)))):
+            frames[frame] = cue["value"]
+    return frames
+
+
+def frame_agreement(expected: list[dict], actual: list[dict], duration: float) -> float:
+    """
+    Returns the share of 10 ms frames on which two cue lists show the same mouth shape.
+    """
+    expected_frames = cues_to_frames(expected, duration)
+    actual_frames = cues_to_frames(actual, duration)
+    if not expected_frames:
+        return 1.0
+    return sum(e == a for e, a in zip(expected_frames, actual_frames)) / len(expected_frames)
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+""" Step 3: Define the benchmark """
+def benchmark(wav_paths: list[str]) -> int:
+    """
+    Runs both engines on each WAV file and prints their latency and how often they agree.
+    The transcript of sample.wav is read from sample.txt next to it.
+
+    Args:
+        wav_paths (list): The WAV files to compare on.
+
+    Returns:
+        int: 0 on success, 1 if no sample could be compared.
+    """
+    rows = []
+    for wav_path in wav_paths:
+        transcript_path = os.path.splitext(wav_path)[0] + ".txt"
+        if not os.path.isfile(transcript_path):
+            print(f"Skipping {wav_path}: no transcript at {transcript_path}")
+            continue
+        with open(transcript_path, encoding="utf-8") as f:
+            text = f.read().strip()
+
+        text_data, text_ms = _timed(text_lipsync, text, wav_path)
+        rhubarb_data, rhubarb_ms = _timed(rhubarb_lipsync, wav_path)
+        duration = text_data["METADATA"]["duration"]
+        if not rhubarb_data["MOUTH_CUES"]:
+            print(f"Skipping {wav_path}: Rhubarb produced no cues")
+            continue
+        rows.append({
+            "sample": os.path.basename(wav_path),
+            "duration": duration,
+            "text_ms": text_ms,
+            "rhubarb_ms": rhubarb_ms,
+            "agreement": frame_agreement(rhubarb_data["MOUTH_CUES"], text_data["MOUTH_CUES"], duration),
+        })
+
+    if not rows:
+        return 1
+
+    print(f"{'sample':<32} {'audio s':>8} {'text ms':>9} {'rhubarb ms':>11} {'agreement':>10}")
+    for row in rows:
+        print(f"{row['sample']:<32} {row['duration']:>8.2f} {row['text_ms']:>9.1f} {row['rhubarb_ms']:>11.1f} {row['agreement']:>10.0%}")
+    count = len(rows)
+    print(
+        f"{'mean':<32} {sum(r['duration'] for r in rows) / count:>8.2f} "
+        f"{sum(r['text_ms'] for r in rows) / count:>9.1f} {sum(r['rhubarb_ms'] for r in rows) / count:>11.1f} "
+        f"{sum(r['agreement'] for r in rows) / count:>10.0%}"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the text lip-sync engine with Rhubarb.")
+    parser.add_argument("wav_files", nargs="+", help="WAV samples, each with a .txt transcript next to it")
+    sys.exit(benchmark(parser.parse_args().wav_files))
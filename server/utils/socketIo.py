@@ -1,5 +1,24 @@
 # Import required modules
+import os
 from flask_socketio import SocketIO
+from utils.socketio_queue import create_client_manager
 
-# Set up Flask-SocketIO with proper configurations
-socketio = SocketIO(cors_allowed_origins="*", async_mode="threading")
+# Set up Flask-SocketIO with proper configurations.
+# SOCKETIO_ASYNC_MODE defaults to threading, which works both with `python app.py`
+# and with gunicorn's gthread worker (see wsgi.py).
+socketio = SocketIO(cors_allowed_origins="*", async_mode=os.getenv("SOCKETIO_ASYNC_MODE", "threading"))
+
+
+def get_socketio_options():
+    """
+    Returns the extra init_app options for Socket.IO.
+
+    When SOCKETIO_MESSAGE_QUEUE is set (e.g. redis://localhost:6379/0, or memory:// for a
+    single-process stand-in), every worker joins the same queue so that emits reach
+    clients connected to any worker.
+    """
+    url = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+    if not url:
+        return {}
+    channel = os.getenv("SOCKETIO_CHANNEL", "flask-socketio")
+    return {"client_manager": create_client_manager(url, channel=channel)}
@@ -0,0 +1,69 @@
+"""
+Message-queue backends that let several Socket.IO servers (worker processes) share clients.
+
+An emit made in one worker is published on the queue and re-emitted by every other worker
+to the clients connected to it, so room broadcasts reach users regardless of which worker
+holds their connection.
+"""
+
+""" Step 1: Import required libraries """
+import pickle
+import queue
+import threading
+import socketio
+
+""" Step 2: Define the in-memory pub/sub backend """
+# channel name -> subscriber queues, one per LocalPubSubManager
+_local_channels: dict[str, list[queue.Queue]] = {}
+_local_channels_lock = threading.Lock()
+
+
+class LocalPubSubManager(socketio.PubSubManager):
+    """
+    An in-process stand-in for the Redis manager.
+
+    Every Socket.IO server created with the same channel in this process receives the
+    messages published by the others. Messages are pickled on the way through, as they
+    would be by a real broker. Use it for tests and single-machine development only.
+    """
+    name = 'local'
+
+    def __init__(self, url='memory://', channel='flask-socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.url = url
+        self._queue = queue.Queue()
+        if not write_only:
+            with _local_channels_lock:
+                _local_channels.setdefault(channel, []).append(self._queue)
+
+    def _publish(self, data):
+        payload = pickle.dumps(data)
+        with _local_channels_lock:
+            subscribers = list(_local_channels.get(self.channel, []))
+        for subscriber in subscribers:
+            subscriber.put(payload)
+
+    def _listen(self):
+        while True:
+            yield self._queue.get()
+
+
+""" Step 3: Define the factory used by the app """
+def create_client_manager(url: str, channel: str = 'flask-socketio', write_only: bool = False):
+    """
+    Creates the Socket.IO client manager for a message queue URL.
+
+    Args:
+        url (str): "memory://" for the in-process queue, "redis://..." / "rediss://..." for Redis
+                   (requires the `redis` package), anything else is handed to Kombu.
+        channel (str): The pub/sub channel shared by all workers.
+        write_only (bool): True for processes that only emit (e.g. background jobs).
+
+    Returns:
+        socketio.PubSubManager: The manager to pass as `client_manager`.
+    """
+    if url.startswith('memory://'):
+        return LocalPubSubManager(url, channel=channel, write_only=write_only)
+    if url.startswith(('redis://', 'rediss://')):
+        return socketio.RedisManager(url, channel=channel, write_only=write_only)
+    return socketio.KombuManager(url, channel=channel, write_only=write_only)
@@ -0,0 +1,76 @@
+""" This module reports how long each module takes to import when the app starts. """
+""" Step 1: Import necessary modules """
+import os
+import subprocess
+import sys
+import time
+
+SERVER_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+""" Step 2: Define the profiling helpers """
+def parse_importtime(output: str) -> list[dict]:
+    """
+    Parses the stderr written by `python -X importtime`.
+
+    Args:
+        output (str): The raw importtime output.
+
+    Returns:
+        list: One dict per imported module with "module", "self_us", "cumulative_us" and "depth".
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            entries.append({
+                "module": name.strip(),
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": (len(name) - len(name.lstrip())) // 2,
+            })
+        except ValueError:
+            continue
+    return entries
+
+
+def profile_startup(module: str = "app", top: int = 30) -> int:
+    """
+    Imports `module` in a fresh interpreter with `-X importtime` and prints the slowest imports.
+
+    Args:
+        module (str): The module to import, relative to the server directory.
+        top (int): How many modules to list.
+
+    Returns:
+        int: The exit code of the child interpreter.
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SERVER_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    wall_seconds = time.perf_counter() - started
+
+    entries = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        print("\n".join(errors[-20:]))
+
+    print(f"Imported '{module}' in {wall_seconds:.2f}s wall time ({len(entries)} modules).")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for entry in sorted(entries, key=lambda e: e["cumulative_us"], reverse=True)[:top]:
+        print(f"{entry['cumulative_us'] / 1000:>14.1f} {entry['self_us'] / 1000:>9.1f}  {entry['module']}")
+
+    # Our own modules, so regressions in the app's import graph are easy to spot
+    local_packages = ("agents", "routes", "services", "utils", "models", "config")
+    local = [e for e in entries if e["module"].split(".")[0] in local_packages]
+    if local:
+        print("\nApp modules:")
+        for entry in sorted(local, key=lambda e: e["cumulative_us"], reverse=True):
+            print(f"{entry['cumulative_us'] / 1000:>14.1f} {entry['self_us'] / 1000:>9.1f}  {entry['module']}")
+
+    return result.returncode
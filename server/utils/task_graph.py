@@ -0,0 +1,80 @@
+""" This module runs small dependency graphs of tasks on a thread pool and times each task. """
+""" Step 1: Import necessary modules """
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+
+from utils.consts import TASK_GRAPH_MAX_WORKERS
+
+""" Step 2: Define the shared pool """
+@lru_cache(maxsize=None)
+def get_task_graph_executor() -> ThreadPoolExecutor:
+    """
+    Returns the bounded pool shared by all task graphs in the process.
+    Tasks must not submit work to this pool themselves, or they could wait on each other forever.
+    """
+    return ThreadPoolExecutor(max_workers=TASK_GRAPH_MAX_WORKERS, thread_name_prefix="task-graph")
+
+
+""" Step 3: Define the runner """
+def run_task_graph(tasks: dict, executor=None) -> tuple[dict, dict]:
+    """
+    Runs every task as soon as the tasks it depends on have finished.
+
+    Args:
+        tasks (dict): name -> (func, dependencies). `func` is called with one keyword argument per
+                      dependency, holding that dependency's result.
+        executor (Executor, optional): Where tasks run. Defaults to the shared bounded pool.
+
+    Returns:
+        tuple: (results, timings) where results maps task name -> return value and timings maps
+               task name -> milliseconds spent in the task, plus "total" for the whole graph.
+
+    Raises:
+        ValueError: If a dependency is unknown or the graph has a cycle.
+        Exception: The first exception raised by a task, once the running tasks have finished.
+    """
+    for name, (_, dependencies) in tasks.items():
+        for dependency in dependencies:
+            if dependency not in tasks:
+                raise ValueError(f"Task '{name}' depends on unknown task '{dependency}'")
+
+    executor = executor or get_task_graph_executor()
+    started = time.perf_counter()
+    results, timings = {}, {}
+    pending = dict(tasks)
+    running = {}
+    error = None
+
+    def timed(name, func, kwargs):
+        task_started = time.perf_counter()
+        try:
+            return func(**kwargs)
+        finally:
+            timings[name] = round((time.perf_counter() - task_started) * 1000, 1)
+
+    while pending or running:
+        if error is None:
+            for name, (func, dependencies) in list(pending.items()):
+                if all(dependency in results for dependency in dependencies):
+                    kwargs = {dependency: results[dependency] for dependency in dependencies}
+                    running[executor.submit(timed, name, func, kwargs)] = name
+                    del pending[name]
+            if pending and not running:
+                raise ValueError(f"Task graph has a cycle: {sorted(pending)}")
+        elif not running:
+            break
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                error = error or e
+
+    if error is not None:
+        raise error
+
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    return results, timings
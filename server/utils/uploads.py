@@ -0,0 +1,53 @@
+""" This module contains helpers for reading file uploads without copying them into memory. """
+""" Step 1: Import necessary modules """
+import os
+
+from flask import request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from utils.consts import UPLOAD_FORM_OVERHEAD_BYTES, UPLOAD_MAX_BYTES, UPLOAD_SNIFF_BYTES
+
+UPLOAD_TOO_LARGE_ERROR = f"File size exceeds the maximum limit of {UPLOAD_MAX_BYTES // (1024 * 1024)} MB"
+
+
+""" Step 2: Define the helpers """
+def read_upload_form(max_bytes: int = UPLOAD_MAX_BYTES):
+    """
+    Parses a multipart form with the request body capped at `max_bytes` plus room for the other fields.
+
+    Werkzeug spools each file part to a temporary file as it arrives (in memory only while small).
+    With the cap set, a body whose Content-Length is too large is refused before anything is
+    read, and a body without one is cut off as soon as its running byte count passes the cap.
+
+    Args:
+        max_bytes (int): The largest upload accepted.
+
+    Returns:
+        dict | None: The form fields, or None if the body is too large.
+    """
+    request.max_content_length = max_bytes + UPLOAD_FORM_OVERHEAD_BYTES
+    try:
+        return request.form.to_dict()
+    except RequestEntityTooLarge:
+        return None
+
+
+def upload_size(uploaded_file) -> int:
+    """
+    Returns the size of a spooled upload without reading it.
+    """
+    stream = uploaded_file.stream
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(0)
+    return size
+
+
+def upload_head(uploaded_file, size: int = UPLOAD_SNIFF_BYTES) -> bytes:
+    """
+    Returns the first bytes of an upload, enough for `filetype.guess`, and rewinds it.
+    """
+    stream = uploaded_file.stream
+    stream.seek(0)
+    head = stream.read(size)
+    stream.seek(0)
+    return head
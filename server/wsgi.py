@@ -0,0 +1,22 @@
+"""
+Production WSGI entry point.
+
+Run a single worker with:
+    gunicorn -k gthread -w 1 --threads 100 -b 0.0.0.0:8000 wsgi:app
+
+Gunicorn cannot keep a Socket.IO client on the same worker, so scale out with serve.py
+(one gunicorn per port behind a sticky load balancer) or with more container replicas,
+and set SOCKETIO_MESSAGE_QUEUE so that emits reach clients on every worker.
+"""
+
+""" Step 1: Import the app """
+from app import app, is_primary_worker
+from services.db.agent_facts import load_agent_facts_to_db
+from services.speech_synthesizer_pool import warm_up_speech_synthesizers
+
+""" Step 2: DB pre-load, done once per deployment by the primary worker """
+if is_primary_worker():
+    load_agent_facts_to_db()
+
+""" Step 3: Connect the common text-to-speech voices in the background """
+warm_up_speech_synthesizers()